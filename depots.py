@@ -0,0 +1,284 @@
+"""
+This module contains the support for several depots. Every package is
+delivered from the depot nearest to its destination, and every depot has its
+own instance of a scheduler, which sees the destinations relative to its depot
+as if it were at the origin, so any scheduler can be used unchanged.
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+
+from scheduler import DRONE_MAX_WEIGHT, Delivery, Scheduler
+
+
+# Destinations compared with all the depots at once.
+CHUNK_SIZE = 1 << 16
+
+
+def parse_depots(text):
+    """
+    Parses a list of depots given as 'x,y;x,y'.
+    """
+    depots = []
+    for token in text.split(';'):
+        x, y = token.split(',')
+        depots.append((int(x), int(y)))
+    return depots
+
+
+def nearest_depots(depots, destinations):
+    """
+    Returns the index of the nearest depot to every given destination. Ties
+    go to the first depot.
+    """
+    depots = numpy.asarray(depots, dtype=float).reshape(-1, 2)
+    destinations = numpy.asarray(destinations, dtype=float).reshape(-1, 2)
+    nearest = numpy.zeros(len(destinations), dtype=numpy.intp)
+    for start in range(0, len(destinations), CHUNK_SIZE):
+        chunk = destinations[start:start + CHUNK_SIZE]
+        offsets = chunk[:, numpy.newaxis, :] - depots[numpy.newaxis, :, :]
+        nearest[start:start + CHUNK_SIZE] = numpy.argmin(
+            (offsets ** 2).sum(axis=2), axis=1)
+    return nearest
+
+
+def partition(depots, deliveries):
+    """
+    Splits the given deliveries by their nearest depot.
+
+    Returns a list per depot with its deliveries, whose destinations are
+    relative to the depot.
+    """
+    parts = [[] for _ in depots]
+    if not deliveries:
+        return parts
+    nearest = nearest_depots(
+        depots, [delivery.destination for delivery in deliveries])
+    for delivery, i in zip(deliveries, nearest.tolist()):
+        parts[i].append(_translate(delivery, depots[i], -1))
+    return parts
+
+
+def check_fleet(depots, deliveries, weights, drones, cyclists):
+    """
+    Checks that the vehicles based at the depots in turn can carry the
+    packages of the given deliveries from their nearest depot: a depot needs
+    a cyclist for the packages too heavy for a drone, and any vehicle for the
+    rest.
+
+    Raises ValueError otherwise.
+    """
+    if not deliveries:
+        return
+    nearest = nearest_depots(
+        depots, [delivery.destination for delivery in deliveries])
+    for delivery, i in zip(deliveries, nearest.tolist()):
+        if i < cyclists:
+            continue
+        if i >= drones:
+            raise ValueError(
+                'No vehicle is based at the depot {},{}, use at least {} '
+                'drones or cyclists'.format(depots[i][0], depots[i][1], i + 1))
+        if any(weights[product] > DRONE_MAX_WEIGHT
+               for product in delivery.packages):
+            raise ValueError(
+                'No cyclist is based at the depot {},{} for its packages over '
+                '{} kg, use at least {} cyclists'.format(
+                    depots[i][0], depots[i][1], DRONE_MAX_WEIGHT, i + 1))
+
+
+def _translate(delivery, depot, sign):
+    """
+    Returns the given delivery with its destination moved by the given depot,
+    to the depot frame with `sign` -1 and back with 1.
+    """
+    x, y = delivery.destination
+    return Delivery(
+        delivery.packages, (x + sign * depot[0], y + sign * depot[1]))
+
+
+def _build(job):
+    """
+    Builds the scheduler of a depot, in a worker process.
+    """
+    scheduler_class, deliveries, weights, kwargs = job
+    return scheduler_class(deliveries, weights, **kwargs)
+
+
+class DepotScheduler(Scheduler):
+    """
+    Scheduler giving the routes of the scheduler of a depot in the world
+    frame. The destinations of the deliveries it is given are moved to the
+    frame of the depot and the ones of its routes back.
+    """
+
+    def __init__(self, scheduler, depot):
+        super(DepotScheduler, self).__init__(scheduler.name)
+        self.__scheduler = scheduler
+        self.__depot = depot
+
+    @property
+    def scheduler(self):
+        """
+        Returns the scheduler working in the frame of the depot.
+        """
+        return self.__scheduler
+
+    @property
+    def depots(self):
+        """
+        Returns the depot of the scheduler.
+        """
+        return (self.__depot, )
+
+    def set_fleet(self, drones, cyclists):
+        """
+        Tells the scheduler the number of drones and cyclists of the depot.
+        """
+        self.__scheduler.set_fleet(drones, cyclists)
+
+    def get_route_for_drone(self):
+        """
+        Returns route for drone.
+        """
+        return self.__translate_route(self.__scheduler.get_route_for_drone())
+
+    def get_route_for_cyclist(self):
+        """
+        Returns route for cyclist.
+        """
+        return self.__translate_route(
+            self.__scheduler.get_route_for_cyclist())
+
+    def get_routes_for_drones(self, n):
+        """
+        Returns routes for up to `n` drones.
+        """
+        return [self.__translate_route(route)
+                for route in self.__scheduler.get_routes_for_drones(n)]
+
+    def get_routes_for_cyclists(self, n):
+        """
+        Returns routes for up to `n` cyclists.
+        """
+        return [self.__translate_route(route)
+                for route in self.__scheduler.get_routes_for_cyclists(n)]
+
+    def add_deliveries(self, deliveries, weights=None):
+        """
+        Adds deliveries that arrived after the scheduler was created.
+        """
+        self.__scheduler.add_deliveries([
+            _translate(delivery, self.__depot, -1)
+            for delivery in deliveries], weights)
+
+    def cancel(self, delivery):
+        """
+        Cancels the pending packages of the given delivery.
+        """
+        return self.__scheduler.cancel(_translate(delivery, self.__depot, -1))
+
+    def __translate_route(self, route):
+        """
+        Returns the given route in the world frame.
+        """
+        if not route:
+            return route
+        x, y = self.__depot
+        return deque(((dx + x, dy + y), packages)
+                     for (dx, dy), packages in route)
+
+
+class MultiDepotScheduler(Scheduler):
+    """
+    Scheduler for several depots. Every delivery is given to the scheduler of
+    the depot nearest to its destination, and the engine asks the scheduler
+    of the depot where each vehicle is based for its routes.
+
+    Called directly, the routes of the first depot that has one are given.
+    """
+
+    def __init__(self, schedulers, depots):
+        """
+        Constructs the scheduler with the given scheduler of every depot,
+        which work in the frame of their depot.
+        """
+        names = sorted(set(scheduler.name for scheduler in schedulers))
+        super(MultiDepotScheduler, self).__init__('{} ({} depots)'.format(
+            '/'.join(names), len(depots)))
+        self.__depots = tuple(tuple(depot) for depot in depots)
+        self.__schedulers = tuple(
+            DepotScheduler(scheduler, depot)
+            for scheduler, depot in zip(schedulers, self.__depots))
+
+    @classmethod
+    def build(cls, scheduler_class, deliveries, weights, depots,
+              processes=1, **kwargs):
+        """
+        Splits the deliveries by their nearest depot and builds an instance of
+        the given scheduler class for every depot, passing it `kwargs`. With
+        more than one process the instances are built in parallel in worker
+        processes.
+        """
+        jobs = [(scheduler_class, part, weights, kwargs)
+                for part in partition(depots, deliveries)]
+        if processes > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(
+                    max_workers=min(processes, len(jobs))) as executor:
+                schedulers = list(executor.map(_build, jobs))
+        else:
+            schedulers = [_build(job) for job in jobs]
+        return cls(schedulers, depots)
+
+    @property
+    def depots(self):
+        """
+        Returns the depots.
+        """
+        return self.__depots
+
+    def for_depot(self, depot):
+        """
+        Returns the scheduler of the depot with the given index.
+        """
+        return self.__schedulers[depot]
+
+    def get_route_for_drone(self):
+        """
+        Returns a drone route from the first depot that has one.
+        """
+        for scheduler in self.__schedulers:
+            route = scheduler.get_route_for_drone()
+            if route:
+                return route
+        return None
+
+    def get_route_for_cyclist(self):
+        """
+        Returns a cyclist route from the first depot that has one.
+        """
+        for scheduler in self.__schedulers:
+            route = scheduler.get_route_for_cyclist()
+            if route:
+                return route
+        return None
+
+    def add_deliveries(self, deliveries, weights=None):
+        """
+        Adds deliveries that arrived after the scheduler was created to the
+        schedulers of their nearest depots.
+        """
+        parts = partition(self.__depots, deliveries)
+        for scheduler, part in zip(self.__schedulers, parts):
+            if part:
+                scheduler.scheduler.add_deliveries(part, weights)
+
+    def cancel(self, delivery):
+        """
+        Cancels the pending packages of the given delivery in the scheduler
+        of its nearest depot.
+        """
+        depot = int(nearest_depots(self.__depots, delivery.destination)[0])
+        return self.__schedulers[depot].cancel(delivery)
@@ -0,0 +1,880 @@
+"""
+This module contains the headless simulation engine. It advances the fleet of
+drones and cyclists following the routes generated by a scheduler without any
+kind of drawing, so it can be used to score schedulers on big inputs.
+"""
+
+from array import array
+from collections import deque, namedtuple
+from heapq import heappop, heappush
+from math import ceil, inf, sqrt
+
+import numpy
+
+from instrumentation import (
+    IDLE_VEHICLE_TICKS, NULL_PROFILER, PACKAGES_DELIVERED, ROUTES_ISSUED,
+    ProfiledScheduler)
+from scheduler import CYCLIST_SPEED, DRONE_SPEED
+
+# Point comparison.
+RELATIVE_TOLERANCE = 0
+ABSOLUTE_TOLERANCE = 0.5
+
+# Margin under which a closed-form drone leg is double-checked by stepping.
+EPSILON = 1e-9
+
+# Event kinds, in the order they are handled within a tick.
+WAKE_UP, DEPOT, ARRIVAL = 0, 1, 2
+
+
+Result = namedtuple('Result', 'ticks kms completed vehicles')
+VehicleStats = namedtuple('VehicleStats', 'id type kms routes packages')
+
+
+class Engine(object):
+    """
+    Class responsible to move the fleet of drones and cyclists tick by tick.
+    Vehicles are kept in numpy structured arrays and the whole fleet of each
+    type is advanced at once with array operations. The scheduler is only
+    called for the vehicles that are idle at the depot.
+
+    Deliveries arriving during the day are given in `arrivals` as pairs of
+    tick and delivery sorted by tick. They are pulled lazily, so it can be an
+    iterator over an input stream, and handed to the scheduler at the start
+    of their tick.
+
+    A `Profiler` can be given in `profiler` to record the time spent in every
+    phase of a tick and in every scheduler call, and to count the routes
+    issued, the ticks vehicles spend idle at the depot and the packages
+    delivered.
+
+    Vehicles start and end their routes at the depots of the scheduler, the
+    origin unless it is a `MultiDepotScheduler`. The vehicles of every fleet
+    are based at the depots in turn, and are given the routes of the
+    scheduler of their depot.
+
+    An `EventLog` can be given in `log` to record the deliveries, the routes,
+    the stops and the returns to the depot of the run, which can be scored or
+    replayed afterwards.
+    """
+
+    def __init__(self, deliveries, drones, cyclists, scheduler, arrivals=(),
+                 profiler=None, log=None):
+        """
+        Constructs the engine.
+        """
+        if profiler is not None:
+            scheduler = ProfiledScheduler(scheduler, profiler)
+        self.__depots = tuple(tuple(depot) for depot in scheduler.depots)
+        self._profiler = profiler or NULL_PROFILER
+        self._log = log
+        if log is not None:
+            log.begin(drones, cyclists, scheduler.name, self.__depots)
+            log.add_deliveries(0, deliveries)
+        # Destination and packages left of every delivery, by its id, which
+        # is its position in the order the deliveries were added.
+        self.__destinations = []
+        self.__remaining = array('l')
+        self.__outstanding = 0
+        # Deliveries waiting for a product at a destination, in the order
+        # they were added, as pairs of their id and how many they wait for.
+        self.__waiting = {}
+        self.__track_deliveries(deliveries)
+        self.__drones = self._create_vehicles_array(drones, self.__depots)
+        self.__cyclists = self._create_vehicles_array(
+            cyclists, self.__depots)
+        self.__drones_routes = [None] * len(drones)
+        self.__cyclists_routes = [None] * len(cyclists)
+        self.__scheduler = scheduler
+        # Scheduler of every depot.
+        self.__schedulers = tuple(
+            scheduler.for_depot(depot) for depot in range(len(self.__depots)))
+        for depot, depot_scheduler in enumerate(self.__schedulers):
+            depot_scheduler.set_fleet(
+                int((self.__drones['depot'] == depot).sum()),
+                int((self.__cyclists['depot'] == depot).sum()))
+        self._frame = 0
+        self._tick = 0
+        self._total_kms = 0
+        self.__active = True
+        self.__arrivals = iter(arrivals)
+        self.__next_arrival = next(self.__arrivals, None)
+
+    def __track_deliveries(self, deliveries):
+        """
+        Gives an id to every given delivery and counts its packages as
+        outstanding.
+        """
+        for delivery in deliveries:
+            id_ = len(self.__destinations)
+            destination = delivery.destination
+            self.__destinations.append(destination)
+            self.__remaining.append(len(delivery.packages))
+            self.__outstanding += len(delivery.packages)
+            counts = {}
+            for product in delivery.packages:
+                counts[product] = counts.get(product, 0) + 1
+            for product, count in counts.items():
+                self.__waiting.setdefault(
+                    (destination, product), deque()).append([id_, count])
+
+    @staticmethod
+    def _create_vehicles_array(vehicles, depots=((0, 0), )):
+        """
+        Creates a numpy array with data about the given vehicles to simulate
+        their behaviour. The vehicles are based at the given depots in turn
+        and start at them.
+        """
+        array = numpy.zeros(
+            len(vehicles), dtype=[
+                ('position', float, 2),
+                ('destination', float, 2),
+                ('delta', float, 2),
+                ('home', float, 2),
+                ('depot', int),
+                ('id', str, 6),
+                ('kms', float),
+                ('routes', int),
+                ('packages', int),
+            ]
+        )
+        array['id'] = vehicles
+        array['depot'] = numpy.arange(len(vehicles)) % len(depots)
+        array['home'] = numpy.asarray(depots, dtype=float)[array['depot']]
+        array['position'] = array['destination'] = array['home']
+        return array
+
+    @property
+    def drones(self):
+        """
+        Returns the array with the state of the drones.
+        """
+        return self.__drones
+
+    @property
+    def cyclists(self):
+        """
+        Returns the array with the state of the cyclists.
+        """
+        return self.__cyclists
+
+    @property
+    def scheduler(self):
+        """
+        Returns the scheduler providing the routes.
+        """
+        return self.__scheduler
+
+    @property
+    def profiler(self):
+        """
+        Returns the profiler recording the engine, which records nothing if
+        none was given.
+        """
+        return self._profiler
+
+    @property
+    def depots(self):
+        """
+        Returns the depots the vehicles are based at.
+        """
+        return self.__depots
+
+    @property
+    def frame(self):
+        """
+        Returns the tick being simulated, or the next one between steps.
+        """
+        return self._frame
+
+    @property
+    def destinations(self):
+        """
+        Returns the destination of every delivery, indexed by its id.
+        """
+        return self.__destinations
+
+    @property
+    def outstanding(self):
+        """
+        Returns the number of packages not delivered nor cancelled yet.
+        """
+        return self.__outstanding
+
+    @property
+    def _next_arrival_tick(self):
+        """
+        Returns the tick of the next delivery to arrive, or None if no more
+        deliveries arrive.
+        """
+        if self.__next_arrival is None:
+            return None
+        return self.__next_arrival[0]
+
+    @property
+    def tick(self):
+        """
+        Returns the tick in which the last package was delivered so far.
+        """
+        return self._tick
+
+    @property
+    def total_kms(self):
+        """
+        Returns the total kms traveled by the fleet.
+        """
+        return self._total_kms
+
+    @property
+    def is_completed(self):
+        """
+        Returns whether all deliveries have been completed.
+        """
+        return not self.__outstanding
+
+    @property
+    def is_active(self):
+        """
+        Returns whether something happened in the last tick. An inactive
+        engine has either finished or got stuck, as further ticks won't change
+        its state.
+        """
+        return self.__active
+
+    def step(self):
+        """
+        Advances the world one tick.
+
+        Returns the ids of the deliveries completed in this tick.
+        """
+        self._receive_deliveries(self._frame)
+        if not self.is_completed:
+            self._tick = self._frame
+        completed = []
+        profiler = self._profiler
+        with profiler.phase('drones'):
+            drones_active = self.__update_drones(completed)
+        with profiler.phase('cyclists'):
+            cyclists_active = self.__update_cyclists(completed)
+        self.__active = (drones_active or cyclists_active or
+                         self.__next_arrival is not None)
+        profiler.end_tick(self._frame)
+        self._frame += 1
+        return completed
+
+    def add_deliveries(self, deliveries):
+        """
+        Adds deliveries to the ones being delivered and hands them to the
+        scheduler.
+        """
+        self.__scheduler.add_deliveries(deliveries)
+        if self._log is not None:
+            self._log.add_deliveries(self._frame, deliveries)
+        self.__track_deliveries(deliveries)
+
+    def cancel(self, delivery):
+        """
+        Cancels the packages of the given delivery that have not been given
+        to any vehicle yet. If other deliveries wait for the same products at
+        the same destination the packages are taken from the last one added.
+
+        Returns the products of the cancelled packages.
+        """
+        products = self.__scheduler.cancel(delivery)
+        for product in products:
+            self.__take_package(delivery.destination, product, -1)
+        return products
+
+    def _receive_deliveries(self, frame):
+        """
+        Adds the deliveries arriving up to the given tick.
+
+        Returns whether any delivery arrived.
+        """
+        deliveries = []
+        while (self.__next_arrival is not None and
+               self.__next_arrival[0] <= frame):
+            deliveries.append(self.__next_arrival[1])
+            self.__next_arrival = next(self.__arrivals, None)
+        if deliveries:
+            self.add_deliveries(deliveries)
+        return bool(deliveries)
+
+    def run(self, max_ticks=None):
+        """
+        Runs the simulation until all deliveries are completed and the whole
+        fleet is back at the depot, or until nothing else can happen.
+
+        Returns the result of the simulation.
+        """
+        while max_ticks is None or self._frame < max_ticks:
+            self.step()
+            if not self.__active:
+                break
+        return self._end_log(self.result())
+
+    def result(self):
+        """
+        Returns the result of the simulation so far.
+        """
+        vehicles = []
+        for array, type_ in ((self.__drones, 'drone'),
+                             (self.__cyclists, 'cyclist')):
+            for vehicle in array:
+                vehicles.append(VehicleStats(
+                    str(vehicle['id']), type_, float(vehicle['kms']),
+                    int(vehicle['routes']), int(vehicle['packages'])))
+        return Result(
+            self._tick, self._total_kms, self.is_completed, vehicles)
+
+    def _end_log(self, result):
+        """
+        Records the end of the run with the given result in the log, if any.
+
+        Returns the result.
+        """
+        if self._log is not None:
+            self._log.end(
+                result.ticks, result.kms, result.completed,
+                self.__drones['kms'].tolist(),
+                self.__cyclists['kms'].tolist())
+        return result
+
+    def _request_routes(self, fleet, indices):
+        """
+        Asks for routes for the vehicles of the given fleet with the given
+        indices, at the depot in the same tick. The scheduler of a depot is
+        asked for the routes of all its vehicles in one batch call when there
+        are several of them.
+
+        Returns the route of every vehicle, None for the ones left without.
+        """
+        vehicles = (self.__drones, self.__cyclists)[fleet]
+        depots = vehicles['depot'][indices]
+        routes = [None] * len(indices)
+        for depot in numpy.unique(depots).tolist():
+            positions = numpy.flatnonzero(depots == depot).tolist()
+            scheduler = self.__schedulers[depot]
+            if len(positions) == 1:
+                given = [(scheduler.get_route_for_drone,
+                          scheduler.get_route_for_cyclist)[fleet]()]
+            else:
+                given = (scheduler.get_routes_for_drones,
+                         scheduler.get_routes_for_cyclists)[fleet](
+                             len(positions))
+            for k, route in zip(positions, given):
+                routes[k] = route
+        return routes
+
+    def __log_dispatch(self, fleet, i, route):
+        """
+        Records in the log, if any, the return to the depot of the vehicle `i`
+        of the given fleet if it was on a route, and the new route it was
+        given, if any.
+        """
+        if self._log is None:
+            return
+        vehicles = (self.__drones, self.__cyclists)[fleet]
+        routes = (self.__drones_routes, self.__cyclists_routes)[fleet]
+        if routes[i] is not None and not routes[i]:
+            self._log.home(self._frame, fleet, i, vehicles['kms'][i])
+            routes[i] = None
+        if route:
+            self._log.route(self._frame, fleet, i, route)
+
+    def _hand_over_at_depot(self, fleet, i, route, completed):
+        """
+        Delivers at once the stops at the depot of the route just given to
+        the vehicle `i` of the given fleet, as there is no leg to travel to
+        them. Arriving at them later would look like coming back home.
+
+        Returns the stops left in the route.
+        """
+        vehicles = (self.__drones, self.__cyclists)[fleet]
+        x, y = vehicles['home'][i].tolist()
+        left = deque()
+        for stop in route:
+            destination, packages = stop
+            if (abs(destination[0] - x) > ABSOLUTE_TOLERANCE or
+                    abs(destination[1] - y) > ABSOLUTE_TOLERANCE):
+                left.append(stop)
+                continue
+            vehicles['packages'][i] += len(packages)
+            if self._log is not None:
+                self._log.stop(self._frame, fleet, i, destination, packages)
+            self._deliver_packages(destination, packages, completed)
+        return left
+
+    @staticmethod
+    def __classify(vehicles):
+        """
+        Classifies all the given vehicles at once.
+
+        Returns three boolean masks: the vehicles at the depot, the vehicles
+        which have arrived at their destination and the vehicles on the move.
+        """
+        destinations = vehicles['destination']
+        arrived = Engine.__are_close(vehicles['position'], destinations)
+        at_depot = arrived & Engine.__are_close(
+            destinations, vehicles['home'])
+        return at_depot, arrived ^ at_depot, ~arrived
+
+    @staticmethod
+    def __are_close(points1, points2):
+        """
+        Returns which points in the first array are close to the points in the
+        second one. Coordinates are compared column by column, which is much
+        faster than reducing the short last axis of the fleet arrays.
+        """
+        offsets = points1 - points2
+        numpy.abs(offsets, out=offsets)
+        if RELATIVE_TOLERANCE:
+            offsets -= RELATIVE_TOLERANCE * numpy.abs(points2)
+        close = offsets <= ABSOLUTE_TOLERANCE
+        return close[:, 0] & close[:, 1]
+
+    def __update_drones(self, completed):
+        """
+        Updates drones.
+
+        There are three possible situations:
+        - The drone is at the depot, hence it requests a new route.
+        - The drones has arrived at its detination, hence it comes back to
+        depot.
+        - The drone is flying.
+
+        Returns whether any drone did something.
+        """
+        drones = self.__drones
+        with self._profiler.phase('classify'):
+            at_depot, at_destination, moving = self.__classify(drones)
+        active = False
+        idle = 0
+        at_depot_indices = numpy.flatnonzero(at_depot)
+        for i, route in zip(at_depot_indices,
+                            self._request_routes(0, at_depot_indices)):
+            self.__log_dispatch(0, i, route)
+            if not route:
+                idle += 1
+            else:
+                route = self._hand_over_at_depot(0, i, route, completed)
+                self.__drones_routes[i] = route
+                drones['routes'][i] += 1
+                active = True
+                if not route:
+                    continue
+                destination, _ = route[0]
+                drones['destination'][i] = destination
+                offset = drones['destination'][i] - drones['home'][i]
+                length = numpy.sqrt((offset ** 2).sum())
+                drones['delta'][i] = offset / length
+        self.__count_dispatches(at_depot, idle)
+        for i in numpy.flatnonzero(at_destination):
+            destination, packages = self.__drones_routes[i].pop()
+            drones['packages'][i] += len(packages)
+            if self._log is not None:
+                self._log.stop(self._frame, 0, i, destination, packages)
+            self._deliver_packages(destination, packages, completed)
+        drones['destination'][at_destination] = drones['home'][
+            at_destination]
+        drones['delta'][at_destination] *= -1
+        # Drones move at a speed of 1km/tick (1km/2minutes)
+        drones['position'][moving] += drones['delta'][moving]
+        drones['kms'][moving] += DRONE_SPEED
+        self._total_kms += DRONE_SPEED * int(moving.sum())
+        return active or bool(at_destination.any() or moving.any())
+
+    def __update_cyclists(self, completed):
+        """
+        Updates cyclists.
+
+        There are three possible situations:
+        - The cyclist is at the depot, hence it requests a new route.
+        - The cyclist has arrived at its detination, hence it heads to the new
+        destination in the route.
+        - The cyclist is cycling.
+
+        Returns whether any cyclist did something.
+        """
+        cyclists = self.__cyclists
+        with self._profiler.phase('classify'):
+            at_depot, at_destination, moving = self.__classify(cyclists)
+        active = False
+        idle = 0
+        at_depot_indices = numpy.flatnonzero(at_depot)
+        for i, route in zip(at_depot_indices,
+                            self._request_routes(1, at_depot_indices)):
+            self.__log_dispatch(1, i, route)
+            if not route:
+                idle += 1
+            else:
+                route = self._hand_over_at_depot(1, i, route, completed)
+                self.__cyclists_routes[i] = route
+                cyclists['routes'][i] += 1
+                active = True
+                if route:
+                    destination, _ = route[0]
+                    cyclists['destination'][i] = destination
+        self.__count_dispatches(at_depot, idle)
+        for i in numpy.flatnonzero(at_destination):
+            route = self.__cyclists_routes[i]
+            destination, packages = route.popleft()
+            cyclists['packages'][i] += len(packages)
+            if self._log is not None:
+                self._log.stop(self._frame, 1, i, destination, packages)
+            self._deliver_packages(destination, packages, completed)
+            if route:
+                destination, _ = route[0]
+                cyclists['destination'][i] = destination
+            else:
+                cyclists['destination'][i] = cyclists['home'][i]
+        # Cyclists move at a speed of 0.5km/tick (0.5km/2minutes)
+        self.__update_cyclists_delta(cyclists, moving)
+        cyclists['position'][moving] += cyclists['delta'][moving]
+        cyclists['kms'][moving] += CYCLIST_SPEED
+        self._total_kms += CYCLIST_SPEED * int(moving.sum())
+        return active or bool(at_destination.any() or moving.any())
+
+    def __count_dispatches(self, at_depot, idle):
+        """
+        Counts the routes given to the vehicles at the depot and the vehicles
+        left idle there.
+        """
+        at_depot = int(at_depot.sum())
+        if at_depot:
+            self._profiler.count(ROUTES_ISSUED, at_depot - idle)
+            self._profiler.count(IDLE_VEHICLE_TICKS, idle)
+
+    @staticmethod
+    def __update_cyclists_delta(cyclists, moving):
+        """
+        Updates the delta of the moving cyclists according to their current
+        position and destination. Cyclists move along one axis at a time.
+        """
+        aim = cyclists['destination'][moving] - cyclists['position'][moving]
+        horizontal = numpy.abs(aim[:, 0]) > numpy.abs(aim[:, 1])
+        delta = numpy.zeros_like(aim)
+        delta[horizontal, 0] = numpy.sign(aim[horizontal, 0])
+        delta[~horizontal, 1] = numpy.sign(aim[~horizontal, 1])
+        cyclists['delta'][moving] = CYCLIST_SPEED * delta
+
+    def _deliver_packages(self, destination, packages, completed):
+        """
+        The given packages have been delivered to the given destination. They
+        go to the first deliveries added waiting for them there, and the ids
+        of the deliveries they complete are added to `completed`.
+        """
+        self._profiler.count(PACKAGES_DELIVERED, len(packages))
+        for product in packages:
+            id_ = self.__take_package(destination, product, 0)
+            if id_ is not None and not self.__remaining[id_]:
+                completed.append(id_)
+                if self._log is not None:
+                    self._log.complete(self._frame, id_)
+
+    def __take_package(self, destination, product, end):
+        """
+        Takes a package of the given product to the given destination from
+        the first (`end` 0) or last (`end` -1) delivery waiting for it.
+
+        Returns the id of the delivery, or None if none was waiting for it.
+        """
+        waiting = self.__waiting.get((destination, product))
+        if not waiting:
+            return None
+        entry = waiting[end]
+        entry[1] -= 1
+        if not entry[1]:
+            if end:
+                waiting.pop()
+            else:
+                waiting.popleft()
+        id_ = entry[0]
+        self.__remaining[id_] -= 1
+        self.__outstanding -= 1
+        return id_
+
+
+class EventEngine(Engine):
+    """
+    Discrete-event version of the engine. Instead of moving every vehicle
+    every tick, it computes for every leg of a route the tick in which the
+    vehicle arrives, using the same movement rules, and jumps from event to
+    event with a heap keyed by tick. It gives the same ticks and kms as the
+    tick loop at a cost that doesn't depend on the distances travelled.
+
+    Idle vehicles at the depot poll the scheduler again only in the tick after
+    some other vehicle got a route, as the schedulers don't change their state
+    when they have nothing to give or when new deliveries arrive. The kms of a
+    leg are accounted as soon as the leg starts.
+    """
+
+    def __init__(self, deliveries, drones, cyclists, scheduler, arrivals=(),
+                 profiler=None, log=None):
+        """
+        Constructs the engine.
+        """
+        super(EventEngine, self).__init__(
+            deliveries, drones, cyclists, scheduler, arrivals, profiler, log)
+        self.__fleets = (
+            (self.drones, [None] * len(drones)),
+            (self.cyclists, [None] * len(cyclists)),
+        )
+        # Vehicles idle at the depot per fleet, mapped to the scheduler
+        # version they last polled.
+        self.__idle = ({}, {})
+        # Tick in which the vehicles idle at the depot got there.
+        self.__idle_since = ({}, {})
+        self.__last_frame = 0
+        self.__events = []
+        self.__version = 0
+        for fleet in (0, 1):
+            for i in range(len(self.__fleets[fleet][0])):
+                self.__push(0, fleet, DEPOT, i)
+
+    @property
+    def is_active(self):
+        """
+        Returns whether there are events left to handle or deliveries to
+        arrive.
+        """
+        return bool(self.__events) or self._next_arrival_tick is not None
+
+    def add_deliveries(self, deliveries):
+        """
+        Adds deliveries to the ones being delivered and hands them to the
+        scheduler. Idle vehicles poll the scheduler again.
+        """
+        super(EventEngine, self).add_deliveries(deliveries)
+        self.__version += 1
+
+    def step(self):
+        """
+        Advances the world to the next tick in which something happens.
+
+        Returns the ids of the deliveries completed in that tick.
+        """
+        frame = self._frame = self.__next_frame()
+        self._receive_deliveries(frame)
+        if not self.is_completed:
+            self._tick = frame
+        self.__last_frame = frame
+        arrivals = ([], [])
+        while self.__events and self.__events[0][0] == frame:
+            _, kind, fleet, i = heappop(self.__events)
+            if kind == DEPOT:
+                self.__log_return(frame, fleet, i)
+                self.__idle[fleet][i] = None
+                self.__idle_since[fleet][i] = frame
+            elif kind == ARRIVAL:
+                arrivals[fleet].append(i)
+        version = self.__version
+        completed = []
+        profiler = self._profiler
+        for fleet in (0, 1):
+            with profiler.phase(('drones', 'cyclists')[fleet]):
+                self.__dispatch(frame, fleet, completed)
+                for i in arrivals[fleet]:
+                    self.__arrive(frame, fleet, i, completed)
+        if self.__version != version and any(self.__idle):
+            # Idle vehicles may get a route in the next tick.
+            self.__push(frame + 1, 0, WAKE_UP, 0)
+        profiler.end_tick(frame)
+        return completed
+
+    def run(self, max_ticks=None):
+        """
+        Runs the simulation until all deliveries are completed and the whole
+        fleet is back at the depot, or until nothing else can happen.
+
+        Returns the result of the simulation.
+        """
+        while self.is_active:
+            if max_ticks is not None and self.__next_frame() >= max_ticks:
+                break
+            self.step()
+        # Vehicles still idle stayed at the depot until the last tick.
+        for since in self.__idle_since:
+            for frame in since.values():
+                self._profiler.count(
+                    IDLE_VEHICLE_TICKS, self.__last_frame + 1 - frame)
+            since.clear()
+        return self._end_log(self.result())
+
+    def __log_return(self, frame, fleet, i):
+        """
+        Records in the log, if any, the return to the depot of the vehicle `i`
+        of the given fleet if it was on a route.
+        """
+        vehicles, routes = self.__fleets[fleet]
+        if self._log is not None and routes[i] is not None:
+            self._log.home(frame, fleet, i, vehicles['kms'][i])
+            routes[i] = None
+
+    def __next_frame(self):
+        """
+        Returns the next tick in which something happens.
+        """
+        frame = self._next_arrival_tick
+        if self.__events and (frame is None or self.__events[0][0] < frame):
+            frame = self.__events[0][0]
+        return frame
+
+    def __push(self, frame, fleet, kind, i):
+        """
+        Schedules an event for the vehicle `i` of the given fleet.
+        """
+        heappush(self.__events, (frame, kind, fleet, i))
+
+    def __dispatch(self, frame, fleet, completed):
+        """
+        Gives routes to the idle vehicles of the given fleet, in the same order
+        the tick loop would do it. The ids of the deliveries completed at the
+        depot are added to `completed`.
+        """
+        vehicles, routes = self.__fleets[fleet]
+        idle = self.__idle[fleet]
+        polling = numpy.array(
+            [i for i in sorted(idle) if idle[i] != self.__version],
+            dtype=numpy.intp)
+        for i, route in zip(polling.tolist(),
+                            self._request_routes(fleet, polling)):
+            if route and self._log is not None:
+                self._log.route(frame, fleet, i, route)
+            if not route:
+                idle[i] = self.__version
+                continue
+            del idle[i]
+            self._profiler.count(ROUTES_ISSUED)
+            self._profiler.count(
+                IDLE_VEHICLE_TICKS, frame - self.__idle_since[fleet].pop(i))
+            self.__version += 1
+            route = self._hand_over_at_depot(fleet, i, route, completed)
+            routes[i] = route
+            vehicles['routes'][i] += 1
+            if route:
+                destination, _ = route[0]
+                self.__head_to(frame, fleet, i, destination, True)
+            else:
+                # Asks for a new route in the next tick, as the tick loop.
+                self.__push(frame + 1, fleet, DEPOT, i)
+
+    def __arrive(self, frame, fleet, i, completed):
+        """
+        The vehicle `i` of the given fleet has arrived at the next stop of its
+        route.
+        """
+        vehicles, routes = self.__fleets[fleet]
+        route = routes[i]
+        if fleet == 0:
+            destination, packages = route.pop()
+        else:
+            destination, packages = route.popleft()
+        vehicles['packages'][i] += len(packages)
+        if self._log is not None:
+            self._log.stop(frame, fleet, i, destination, packages)
+        self._deliver_packages(destination, packages, completed)
+        if route:
+            destination, _ = route[0]
+            self.__head_to(frame, fleet, i, destination, False)
+        else:
+            self.__head_to(
+                frame, fleet, i, tuple(vehicles['home'][i]), False)
+
+    def __head_to(self, frame, fleet, i, destination, new_route):
+        """
+        Sends the vehicle `i` of the given fleet from its position to the given
+        destination and schedules the corresponding event.
+        """
+        vehicles, _ = self.__fleets[fleet]
+        position = tuple(vehicles['position'][i])
+        if fleet == 0:
+            if new_route:
+                home = vehicles['home'][i]
+                x = float(destination[0]) - home[0]
+                y = float(destination[1]) - home[1]
+                length = sqrt(x * x + y * y)
+                vehicles['delta'][i] = (x / length, y / length)
+            else:
+                vehicles['delta'][i] *= -1
+            delta = tuple(vehicles['delta'][i])
+            leg = self.__drone_leg(position, destination, delta)
+            speed = DRONE_SPEED
+        else:
+            leg = self.__cyclist_leg(position, destination)
+            speed = CYCLIST_SPEED
+        vehicles['destination'][i] = destination
+        if leg is None:
+            # The vehicle would miss its destination forever.
+            return
+        moves, position = leg
+        vehicles['position'][i] = position
+        vehicles['kms'][i] += speed * moves
+        self._total_kms += speed * moves
+        home = vehicles['home'][i]
+        at_depot = destination[0] == home[0] and destination[1] == home[1]
+        kind = DEPOT if at_depot else ARRIVAL
+        self.__push(frame + moves + 1, fleet, kind, i)
+
+    @staticmethod
+    def __drone_leg(position, destination, delta):
+        """
+        Calculates how many moves of `delta` take the drone from its position
+        to the destination.
+
+        Returns the number of moves and the final position, or None if the
+        drone never gets close enough.
+        """
+        low, high = 0, inf
+        for a in (0, 1):
+            offset = destination[a] - position[a]
+            if delta[a] == 0:
+                if abs(offset) > ABSOLUTE_TOLERANCE:
+                    return None
+                continue
+            bounds = sorted((
+                (offset - ABSOLUTE_TOLERANCE) / delta[a],
+                (offset + ABSOLUTE_TOLERANCE) / delta[a]))
+            low, high = max(low, bounds[0]), min(high, bounds[1])
+        moves = max(0, ceil(low))
+        if moves > high + EPSILON:
+            return None
+        final = tuple(position[a] + moves * delta[a] for a in (0, 1))
+        error = max(abs(final[a] - destination[a]) for a in (0, 1))
+        if moves > 0:
+            before = max(
+                abs(final[a] - delta[a] - destination[a]) for a in (0, 1))
+        else:
+            before = inf
+        if (error < ABSOLUTE_TOLERANCE - EPSILON and
+                before > ABSOLUTE_TOLERANCE + EPSILON):
+            return moves, final
+        # Too close to call, step exactly as the tick loop does.
+        x, y = position
+        for moves in range(moves + 3):
+            if (abs(x - destination[0]) <= ABSOLUTE_TOLERANCE and
+                    abs(y - destination[1]) <= ABSOLUTE_TOLERANCE):
+                return moves, (x, y)
+            x += delta[0]
+            y += delta[1]
+        return None
+
+    @staticmethod
+    def __cyclist_leg(position, destination):
+        """
+        Calculates how many moves take the cyclist from its position to the
+        destination. Cyclists always move along the axis with the longest
+        distance left, so each axis is covered independently until it is
+        within the tolerance.
+
+        Returns the number of moves and the final position.
+        """
+        moves, final = 0, []
+        for a in (0, 1):
+            offset = destination[a] - position[a]
+            n = max(0, ceil(
+                (abs(offset) - ABSOLUTE_TOLERANCE) / CYCLIST_SPEED))
+            moves += n
+            direction = 1 if offset > 0 else -1
+            final.append(position[a] + direction * n * CYCLIST_SPEED)
+        return moves, tuple(final)
@@ -0,0 +1,301 @@
+"""
+This module contains an append-only log of the events of a run, recorded by
+the engines, and the tools to use it afterwards: re-scoring a run from its
+events and replaying its routes without the scheduler that made them.
+
+The log is a JSON lines file, gzipped if its path ends with '.gz'. The first
+line is a header with the fleet and the scheduler, every other line is an
+event as a compact array whose first item is its kind and second its tick:
+
+- ["d", tick, x, y, [products]]: a delivery is added.
+- ["r", tick, fleet, vehicle, [[x, y, [products]], ...]]: a route is
+  assigned.
+- ["s", tick, fleet, vehicle, x, y, [products]]: a stop is reached and its
+  packages delivered.
+- ["c", tick, delivery]: all the packages of a delivery are delivered.
+  Deliveries are numbered in the order they are added.
+- ["h", tick, fleet, vehicle, kms]: a vehicle is back at the depot, with the
+  kms it has travelled so far.
+- ["e", ticks, kms, completed, [drone kms], [cyclist kms]]: the run ended,
+  with its result and the kms of every vehicle.
+
+Fleets are 0 for the drones and 1 for the cyclists, and vehicles are their
+index in the fleet. Events are written in batches through a buffered file.
+"""
+
+import gzip
+import json
+from collections import deque
+
+from engine import Result, VehicleStats
+from scheduler import Delivery, Scheduler
+
+
+VERSION = 2
+BATCH_SIZE = 4096
+BUFFER_SIZE = 1 << 20
+
+DELIVERY, ROUTE, STOP, COMPLETE, HOME, END = 'd', 'r', 's', 'c', 'h', 'e'
+FLEETS = ('drone', 'cyclist')
+
+
+def _open(path, mode):
+    """
+    Opens the log with the given path as text, gzipped if it ends in '.gz'.
+    """
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, buffering=BUFFER_SIZE, encoding='utf-8')
+
+
+class EventLog(object):
+    """
+    Writer of the events of a run. Engines record to it when given one in
+    `log`, the owner of the log has to close it.
+    """
+
+    def __init__(self, path, batch_size=BATCH_SIZE):
+        self.__file = _open(path, 'w')
+        self.__batch = []
+        self.__batch_size = batch_size
+        self.__encode = json.JSONEncoder(separators=(',', ':')).encode
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def begin(self, drones, cyclists, scheduler, depots=((0, 0), )):
+        """
+        Records the header of the run, with the ids of the vehicles, the name
+        of the scheduler and the depots.
+        """
+        self.__append({
+            'version': VERSION, 'drones': list(drones),
+            'cyclists': list(cyclists), 'scheduler': scheduler,
+            'depots': [list(depot) for depot in depots],
+        })
+
+    def add_deliveries(self, tick, deliveries):
+        """
+        Records the deliveries added in the given tick.
+        """
+        for delivery in deliveries:
+            x, y = delivery.destination
+            self.__append(
+                [DELIVERY, tick, int(x), int(y), list(delivery.packages)])
+
+    def route(self, tick, fleet, vehicle, route):
+        """
+        Records the route assigned to a vehicle.
+        """
+        self.__append([ROUTE, tick, fleet, int(vehicle), [
+            [int(x), int(y), list(packages)] for (x, y), packages in route]])
+
+    def stop(self, tick, fleet, vehicle, destination, packages):
+        """
+        Records the packages delivered by a vehicle at a stop.
+        """
+        x, y = destination
+        self.__append(
+            [STOP, tick, fleet, int(vehicle), int(x), int(y), list(packages)])
+
+    def complete(self, tick, delivery):
+        """
+        Records that all the packages of the delivery with the given id were
+        delivered.
+        """
+        self.__append([COMPLETE, tick, int(delivery)])
+
+    def home(self, tick, fleet, vehicle, kms):
+        """
+        Records a vehicle coming back to the depot.
+        """
+        self.__append([HOME, tick, fleet, int(vehicle), float(kms)])
+
+    def end(self, ticks, kms, completed, drones_kms, cyclists_kms):
+        """
+        Records the end of the run, with its result and the kms of every
+        vehicle, and writes the pending events.
+        """
+        self.__append([
+            END, int(ticks), float(kms), bool(completed), drones_kms,
+            cyclists_kms])
+        self.flush()
+
+    def record(self, event):
+        """
+        Records an event given as its array, e.g. when merging logs.
+        """
+        self.__append(event)
+
+    def flush(self):
+        """
+        Writes the pending events.
+        """
+        if self.__batch:
+            self.__batch.append('')
+            self.__file.write('\n'.join(self.__batch))
+            self.__batch = []
+        self.__file.flush()
+
+    def close(self):
+        """
+        Writes the pending events and closes the log.
+        """
+        self.flush()
+        self.__file.close()
+
+    def __append(self, event):
+        """
+        Adds an event to the batch, writing it when it is full.
+        """
+        self.__batch.append(self.__encode(event))
+        if len(self.__batch) >= self.__batch_size:
+            self.flush()
+
+
+def read_log(path):
+    """
+    Reads the log with the given path.
+
+    Returns the header and a generator of the events.
+    """
+    file_ = _open(path, 'r')
+    header = json.loads(file_.readline() or 'null')
+    if not isinstance(header, dict) or header.get('version') != VERSION:
+        file_.close()
+        raise ValueError('Not an event log of version {}: {}'.format(
+            VERSION, path))
+
+    def events():
+        with file_:
+            for line in file_:
+                yield json.loads(line)
+
+    return header, events()
+
+
+def score_log(path):
+    """
+    Scores the run recorded in the log with the given path from its events,
+    without running it again.
+
+    Returns the Result of the run, as given by the engine.
+    """
+    header, events = read_log(path)
+    fleets = (header['drones'], header['cyclists'])
+    routes = ([0] * len(fleets[0]), [0] * len(fleets[1]))
+    packages = ([0] * len(fleets[0]), [0] * len(fleets[1]))
+    end = None
+    for event in events:
+        kind = event[0]
+        if kind == ROUTE:
+            routes[event[2]][event[3]] += 1
+        elif kind == STOP:
+            packages[event[2]][event[3]] += len(event[6])
+        elif kind == END:
+            end = event
+    if end is None:
+        raise ValueError('The run in the log did not end: {}'.format(path))
+    _, ticks, kms, completed = end[:4]
+    vehicles = [
+        VehicleStats(id_, FLEETS[fleet], end[4 + fleet][i], routes[fleet][i],
+                     packages[fleet][i])
+        for fleet in (0, 1) for i, id_ in enumerate(fleets[fleet])]
+    return Result(ticks, kms, completed, vehicles)
+
+
+def read_replay(path):
+    """
+    Reads what is needed to replay the run recorded in the log with the given
+    path.
+
+    Returns the header, the deliveries of the start, the later arrivals as
+    pairs of tick and delivery and a ReplayScheduler with the routes.
+    """
+    header, events = read_log(path)
+    deliveries, arrivals, routes = [], [], ([], [])
+    for event in events:
+        kind = event[0]
+        if kind == DELIVERY:
+            delivery = Delivery(tuple(event[4]), tuple(event[2:4]))
+            if event[1]:
+                arrivals.append((event[1], delivery))
+            else:
+                deliveries.append(delivery)
+        elif kind == ROUTE:
+            routes[event[2]].append((event[1], event[3], [
+                ((x, y), tuple(products)) for x, y, products in event[4]]))
+    return header, deliveries, arrivals, ReplayScheduler(
+        header['scheduler'], routes, header.get('depots', ((0, 0), )))
+
+
+class ReplayScheduler(Scheduler):
+    """
+    Scheduler giving the routes recorded in a log, in the same ticks and
+    order they were given, without computing anything. With several depots
+    every depot gets a scheduler of its own with the routes of the vehicles
+    based at it, as the vehicles are based at the depots in turn.
+
+    Its clock has to be set to a function returning the current tick, which
+    is the frame of the engine running the replay.
+    """
+
+    def __init__(self, name, routes, depots=((0, 0), )):
+        """
+        Constructs the scheduler with the routes of every fleet, as triples of
+        the tick, the vehicle and the stops of every route.
+        """
+        super(ReplayScheduler, self).__init__(name)
+        self.__routes = tuple(deque(fleet_routes) for fleet_routes in routes)
+        self.__depots = tuple(tuple(depot) for depot in depots)
+        self.clock = None
+
+    @property
+    def depots(self):
+        """
+        Returns the depots of the recorded run.
+        """
+        return self.__depots
+
+    def for_depot(self, depot):
+        """
+        Returns a scheduler with the recorded routes of the vehicles based at
+        the depot with the given index, which shares the clock of this one.
+        """
+        if len(self.__depots) == 1:
+            return self
+        n = len(self.__depots)
+        scheduler = ReplayScheduler(self.name, [
+            [route for route in fleet_routes if route[1] % n == depot]
+            for fleet_routes in self.__routes], (self.__depots[depot], ))
+        scheduler.clock = lambda: self.clock()
+        return scheduler
+
+    def get_route_for_drone(self):
+        """
+        Returns the next recorded drone route if it was given by this tick.
+        """
+        return self.__next_route(0)
+
+    def get_route_for_cyclist(self):
+        """
+        Returns the next recorded cyclist route if it was given by this tick.
+        """
+        return self.__next_route(1)
+
+    def add_deliveries(self, deliveries, weights=None):
+        """
+        Does nothing, the routes of the deliveries are already recorded.
+        """
+
+    def __next_route(self, fleet):
+        """
+        Returns the next route of the given fleet if its tick has come.
+        """
+        routes = self.__routes[fleet]
+        if not routes or routes[0][0] > self.clock():
+            return None
+        return deque(routes.popleft()[2])
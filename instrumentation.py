@@ -0,0 +1,237 @@
+"""
+This module contains opt-in instrumentation for the engines and the
+simulation: the time spent in every phase of a tick and in every scheduler
+call, and counters of what happened. The results can be printed as a summary
+or saved as a Chrome trace, which can be opened in chrome://tracing or
+https://ui.perfetto.dev.
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager, nullcontext
+
+from scheduler import Scheduler
+
+
+# Counters updated by the engines.
+ROUTES_ISSUED = 'routes issued'
+IDLE_VEHICLE_TICKS = 'idle vehicle-ticks'
+PACKAGES_DELIVERED = 'packages delivered'
+
+
+class Profiler(object):
+    """
+    Records the time spent in named phases and the value of counters. Phases
+    can be nested, the summary shows the total time of each one including
+    the phases inside it.
+
+    With `trace` every phase is also recorded as an event of a Chrome trace,
+    along with the counters at the end of every tick.
+    """
+
+    def __init__(self, trace=False):
+        self.__phases = {}
+        self.__counters = {}
+        self.__events = [] if trace else None
+        self.__clock = time.perf_counter_ns
+        self.__start = self.__clock()
+        self.__pid = os.getpid()
+
+    @property
+    def counters(self):
+        """
+        Returns the counters as a dict from name to value.
+        """
+        return dict(self.__counters)
+
+    @property
+    def phases(self):
+        """
+        Returns the phases as a dict from name to the number of times it was
+        entered and the total nanoseconds spent in it.
+        """
+        return {
+            name: tuple(stats[:2]) for name, stats in self.__phases.items()}
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Context manager that records the time spent in the given phase.
+        """
+        start = self.__clock()
+        try:
+            yield
+        finally:
+            end = self.__clock()
+            stats = self.__phases.get(name)
+            if stats is None:
+                stats = self.__phases[name] = [0, 0, 0]
+            stats[0] += 1
+            stats[1] += end - start
+            stats[2] = max(stats[2], end - start)
+            if self.__events is not None:
+                self.__events.append({
+                    'name': name, 'ph': 'X', 'pid': self.__pid, 'tid': 0,
+                    'ts': (start - self.__start) / 1000,
+                    'dur': (end - start) / 1000,
+                })
+
+    def count(self, name, value=1):
+        """
+        Adds the given value to a counter.
+        """
+        self.__counters[name] = self.__counters.get(name, 0) + value
+
+    def end_tick(self, tick):
+        """
+        Marks the end of the given tick, sampling the counters in the trace.
+        """
+        if self.__events is not None:
+            self.__events.append({
+                'name': 'counters', 'ph': 'C', 'pid': self.__pid,
+                'ts': (self.__clock() - self.__start) / 1000,
+                'args': dict(self.__counters, tick=tick),
+            })
+
+    def summary(self):
+        """
+        Returns a text summary of the phases, sorted by total time, and the
+        counters.
+        """
+        elapsed = max(self.__clock() - self.__start, 1)
+        lines = ['{:<28} {:>10} {:>12} {:>10} {:>10} {:>7}'.format(
+            'phase', 'calls', 'total ms', 'mean us', 'max us', '%')]
+        phases = sorted(
+            self.__phases.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (calls, total, maximum) in phases:
+            lines.append(
+                '{:<28} {:>10} {:>12.3f} {:>10.3f} {:>10.3f} {:>7.1%}'.format(
+                    name, calls, total / 1e6, total / calls / 1000,
+                    maximum / 1000, total / elapsed))
+        lines.append('{:<28} {:>23.3f}'.format('wall time ms', elapsed / 1e6))
+        for name, value in sorted(self.__counters.items()):
+            lines.append('{:<28} {:>10}'.format(name, value))
+        return '\n'.join(lines)
+
+    def write_trace(self, path):
+        """
+        Writes the recorded events to the given path as a Chrome trace.
+        """
+        if self.__events is None:
+            raise ValueError('The profiler was not recording a trace')
+        with open(path, 'w') as file_:
+            json.dump({
+                'traceEvents': self.__events, 'displayTimeUnit': 'ms',
+            }, file_)
+
+
+class NullProfiler(object):
+    """
+    Profiler that records nothing, used when instrumentation is off so the
+    engines don't have to check for it.
+    """
+
+    __context = nullcontext()
+
+    def phase(self, name):
+        """
+        Returns a context manager that does nothing.
+        """
+        return self.__context
+
+    def count(self, name, value=1):
+        """
+        Does nothing.
+        """
+
+    def end_tick(self, tick):
+        """
+        Does nothing.
+        """
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class ProfiledScheduler(Scheduler):
+    """
+    Scheduler that times every call to the given scheduler in a phase named
+    after the method.
+    """
+
+    def __init__(self, scheduler, profiler):
+        super(ProfiledScheduler, self).__init__(scheduler.name)
+        self.__scheduler = scheduler
+        self.__profiler = profiler
+
+    @property
+    def scheduler(self):
+        """
+        Returns the profiled scheduler.
+        """
+        return self.__scheduler
+
+    def get_route_for_drone(self):
+        """
+        Returns route for drone.
+        """
+        with self.__profiler.phase('get_route_for_drone'):
+            return self.__scheduler.get_route_for_drone()
+
+    def get_route_for_cyclist(self):
+        """
+        Returns route for cyclist.
+        """
+        with self.__profiler.phase('get_route_for_cyclist'):
+            return self.__scheduler.get_route_for_cyclist()
+
+    def get_routes_for_drones(self, n):
+        """
+        Returns routes for up to `n` drones.
+        """
+        with self.__profiler.phase('get_routes_for_drones'):
+            return self.__scheduler.get_routes_for_drones(n)
+
+    def get_routes_for_cyclists(self, n):
+        """
+        Returns routes for up to `n` cyclists.
+        """
+        with self.__profiler.phase('get_routes_for_cyclists'):
+            return self.__scheduler.get_routes_for_cyclists(n)
+
+    @property
+    def depots(self):
+        """
+        Returns the depots of the profiled scheduler.
+        """
+        return self.__scheduler.depots
+
+    def for_depot(self, depot):
+        """
+        Returns the profiled scheduler of the depot with the given index.
+        """
+        scheduler = self.__scheduler.for_depot(depot)
+        if scheduler is self.__scheduler:
+            return self
+        return ProfiledScheduler(scheduler, self.__profiler)
+
+    def set_fleet(self, drones, cyclists):
+        """
+        Tells the scheduler the number of drones and cyclists.
+        """
+        self.__scheduler.set_fleet(drones, cyclists)
+
+    def add_deliveries(self, deliveries, weights=None):
+        """
+        Adds deliveries that arrived after the scheduler was created.
+        """
+        with self.__profiler.phase('add_deliveries'):
+            self.__scheduler.add_deliveries(deliveries, weights)
+
+    def cancel(self, delivery):
+        """
+        Cancels the pending packages of the given delivery.
+        """
+        with self.__profiler.phase('cancel'):
+            return self.__scheduler.cancel(delivery)
@@ -0,0 +1,207 @@
+"""
+This module contains a bulk loader for the deliveries input format. Instead of
+reading it line by line, the whole input is tokenized at once with array
+operations and products are interned to integer indices, so inputs with
+millions of lines are loaded in a fraction of the time of `reader`.
+"""
+
+import mmap
+import os
+from collections import namedtuple
+
+import numpy
+
+from scheduler import Delivery
+
+
+# Input loaded in arrays. Products are distinct names, sorted when loaded, and
+# every product is referred to by its index there, `weights` is aligned with
+# them. The products of the delivery `i` are
+# `packages[offsets[i]:offsets[i + 1]]` and it goes to `destinations[i]`.
+Input = namedtuple(
+    'Input', 'products weights destinations packages offsets')
+
+# Bytes up to this one are whitespace (space, tab, new line...).
+WHITESPACE = ord(' ')
+NEW_LINE = ord('\n')
+
+
+def load_input(source):
+    """
+    Loads deliveries and weights in the format read by `reader` from the
+    given source: a path, which is memory-mapped, a binary file or bytes.
+
+    Raises ValueError if the input is malformed or any product has no weight.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as file_:
+            if not os.fstat(file_.fileno()).st_size:
+                return parse_input(b'')
+            # The map is released with the last view of it, which doesn't
+            # outlive the parsing unless it fails.
+            buffer = mmap.mmap(file_.fileno(), 0, access=mmap.ACCESS_READ)
+            return parse_input(buffer)
+    if hasattr(source, 'read'):
+        source = source.read()
+    return parse_input(source)
+
+
+def parse_input(buffer):
+    """
+    Parses deliveries and weights from the given buffer. Missing weights are
+    checked while the products are interned.
+
+    Returns the Input.
+    """
+    data = numpy.frombuffer(buffer, dtype=numpy.uint8)
+    starts, ends, lines = _tokenize(data)
+    n = _parse_count(data, starts, ends, lines, 0)
+    m = _parse_count(data, starts, ends, lines, n + 1)
+    if len(lines) < n + m + 2:
+        raise ValueError('Truncated input: {} weights expected'.format(m))
+    first = lines[:-1]
+    sizes = numpy.diff(lines)
+    # Deliveries: a count, that many products and the coordinates.
+    rows = slice(1, n + 1)
+    counts = _integers(data, starts[first[rows]], ends[first[rows]])
+    if (counts < 0).any() or (sizes[rows] < counts + 3).any():
+        raise ValueError('Malformed delivery')
+    last = first[rows] + sizes[rows] - 1
+    destinations = numpy.stack((
+        _integers(data, starts[last - 1], ends[last - 1]),
+        _integers(data, starts[last], ends[last])), axis=1)
+    offsets = numpy.zeros(n + 1, dtype=numpy.int64)
+    numpy.cumsum(counts, out=offsets[1:])
+    tokens = numpy.repeat(first[rows] + 1 - offsets[:-1], counts) + (
+        numpy.arange(offsets[-1]))
+    names = _strings(data, starts[tokens], ends[tokens])
+    # Weights: a product and its weight.
+    rows = slice(n + 2, n + m + 2)
+    if (sizes[rows] < 2).any():
+        raise ValueError('Malformed weight')
+    catalogue = _strings(data, starts[first[rows]], ends[first[rows]])
+    products, inverse = _intern(numpy.concatenate((catalogue, names)))
+    weights = numpy.zeros(len(products))
+    weights[inverse[:m]] = _strings(
+        data, starts[first[rows] + 1], ends[first[rows] + 1]).astype(float)
+    weighted = numpy.zeros(len(products), dtype=bool)
+    weighted[inverse[:m]] = True
+    packages = inverse[m:]
+    found = weighted[packages]
+    if not found.all():
+        missing = names[numpy.argmin(found)].decode()
+        raise ValueError('All products must have a weight: {}'.format(
+            missing))
+    return Input(products, weights, destinations, packages, offsets)
+
+
+def to_deliveries(input_):
+    """
+    Returns the deliveries and the weights of the given Input in the form
+    taken by the schedulers.
+    """
+    names = input_.products.astype(str).tolist()
+    packages = [names[i] for i in input_.packages.tolist()]
+    offsets = input_.offsets.tolist()
+    deliveries = [
+        Delivery(packages[start:end], tuple(destination))
+        for start, end, destination in zip(
+            offsets, offsets[1:], input_.destinations.tolist())
+    ]
+    weights = dict(zip(names, input_.weights.tolist()))
+    return deliveries, weights
+
+
+def _intern(names):
+    """
+    Returns the sorted distinct names and the index of every name in them.
+    Inputs usually list products in order, which the stable sort exploits.
+    """
+    order = numpy.argsort(names, kind='stable')
+    sorted_names = names[order]
+    distinct = numpy.ones(len(names), dtype=bool)
+    distinct[1:] = sorted_names[1:] != sorted_names[:-1]
+    inverse = numpy.empty(len(names), dtype=numpy.int64)
+    inverse[order] = numpy.cumsum(distinct) - 1
+    return sorted_names[distinct], inverse
+
+
+def _tokenize(data):
+    """
+    Splits the given bytes in tokens.
+
+    Returns where every token starts and ends and the index of the first
+    token of every non-empty line, plus the number of tokens at the end.
+    """
+    space = numpy.ones(len(data) + 2, dtype=numpy.int8)
+    space[1:-1] = data <= WHITESPACE
+    edges = numpy.diff(space)
+    starts = numpy.flatnonzero(edges == -1)
+    ends = numpy.flatnonzero(edges == 1)
+    line = numpy.searchsorted(numpy.flatnonzero(data == NEW_LINE), starts)
+    new_line = numpy.ones(len(starts), dtype=bool)
+    new_line[1:] = line[1:] != line[:-1]
+    lines = numpy.append(numpy.flatnonzero(new_line), len(starts))
+    return starts, ends, lines
+
+
+def _parse_count(data, starts, ends, lines, row):
+    """
+    Parses the count in the first token of the given non-empty line.
+    """
+    if row >= len(lines) - 1:
+        raise ValueError('Truncated input: line {} expected'.format(row + 1))
+    i = lines[row]
+    return int(bytes(data[starts[i]:ends[i]]))
+
+
+def _strings(data, starts, ends):
+    """
+    Returns the tokens between the given starts and ends as an array of byte
+    strings, gathering all of them at once.
+    """
+    return _gather(data, starts, ends).view(
+        'S{}'.format(max(1, int((ends - starts).max(initial=0))))).ravel()
+
+
+def _integers(data, starts, ends):
+    """
+    Returns the tokens between the given starts and ends parsed as integers,
+    digit by digit for all of them at once.
+    """
+    chars = _gather(data, starts, ends)
+    columns = numpy.arange(chars.shape[1])
+    negative = chars[:, 0] == ord('-')
+    digits = chars.astype(numpy.int64) - ord('0')
+    valid = ((columns >= negative[:, numpy.newaxis]) &
+             (columns < (ends - starts)[:, numpy.newaxis]))
+    if ((valid & ((digits < 0) | (digits > 9))).any() or
+            not valid.any(axis=1).all()):
+        raise ValueError('Malformed integer')
+    values = numpy.zeros(len(starts), dtype=numpy.int64)
+    for column in columns:
+        values = numpy.where(
+            valid[:, column], values * 10 + digits[:, column], values)
+    return numpy.where(negative, -values, values)
+
+
+def _gather(data, starts, ends):
+    """
+    Copies the tokens between the given starts and ends to the rows of a
+    matrix of bytes, padded with zeros.
+    """
+    lengths = ends - starts
+    width = max(1, int(lengths.max(initial=0)))
+    chars = numpy.zeros((len(starts), width), dtype=numpy.uint8)
+    if len(data) < width:
+        return chars
+    # Every row is a window of the input starting at the token, the last ones
+    # are moved back so they don't go beyond the end of the input.
+    windows = numpy.lib.stride_tricks.sliding_window_view(data, width)
+    last = len(data) - width
+    chars[...] = windows[numpy.minimum(starts, last)]
+    for i in numpy.flatnonzero(starts > last):
+        shift = starts[i] - last
+        chars[i, :width - shift] = chars[i, shift:]
+    chars[numpy.arange(width) >= lengths[:, numpy.newaxis]] = 0
+    return chars
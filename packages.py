@@ -0,0 +1,613 @@
+"""
+This module contains a compact columnar table of packages shared by the
+schedulers, and queues of rows of that table.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import ChainMap
+from heapq import heapify, heappop, heappush
+from itertools import accumulate
+
+import numpy
+
+
+# Status of a package.
+PENDING = 0
+GIVEN = 1
+CANCELLED = 2
+
+# Rows per block of a SortedRowQueue. A block is split in two when it grows
+# to twice this size.
+BLOCK_SIZE = 512
+
+
+class PackageTable(object):
+    """
+    Table with a row per package and a column per attribute: the coordinates
+    of its destination (int32), its weight (float64, so the weight limits are
+    compared with the weights as given), the id of its product (int32) and
+    its status (a byte of flags). Products are interned, so a package costs
+    21 bytes instead of a tuple per package. The packages of
+    every delivery are consecutive rows.
+
+    Schedulers keep rows of the table instead of copies of the packages, and
+    only build the route stops of the routes they give.
+    """
+
+    def __init__(self, weights):
+        """
+        Constructs an empty table for products with the given weights.
+        """
+        self.__weights = ChainMap({}, weights)
+        self.__names = []
+        self.__ids = {}
+        self.__size = 0
+        self.__xs = numpy.zeros(0, dtype=numpy.int32)
+        self.__ys = numpy.zeros(0, dtype=numpy.int32)
+        self.__package_weights = numpy.zeros(0, dtype=numpy.float64)
+        self.__products = numpy.zeros(0, dtype=numpy.int32)
+        self.__status = numpy.zeros(0, dtype=numpy.uint8)
+        # Row of the first package of every delivery, plus the end.
+        self.__offsets = array('q', (0, ))
+        # Deliveries per destination, only built when packages are looked up.
+        self.__deliveries = None
+
+    @staticmethod
+    def from_deliveries(deliveries, weights):
+        """
+        Creates a table with the packages of the given deliveries.
+        """
+        table = PackageTable(weights)
+        table.append(deliveries)
+        return table
+
+    def __len__(self):
+        return self.__size
+
+    @property
+    def nbytes(self):
+        """
+        Returns the bytes taken by the columns of the table.
+        """
+        return sum(column.nbytes for column in (
+            self.__xs, self.__ys, self.__package_weights, self.__products,
+            self.__status))
+
+    @property
+    def xs(self):
+        """
+        Returns the X coordinate of the destination of every package.
+        """
+        return self.__xs[:self.__size]
+
+    @property
+    def ys(self):
+        """
+        Returns the Y coordinate of the destination of every package.
+        """
+        return self.__ys[:self.__size]
+
+    @property
+    def weights(self):
+        """
+        Returns the weight of every package.
+        """
+        return self.__package_weights[:self.__size]
+
+    @property
+    def deliveries(self):
+        """
+        Returns the number of deliveries in the table.
+        """
+        return len(self.__offsets) - 1
+
+    def delivery_rows(self, delivery):
+        """
+        Returns the rows of the packages of the delivery with the given index.
+        """
+        return range(self.__offsets[delivery], self.__offsets[delivery + 1])
+
+    def destination(self, row):
+        """
+        Returns the destination of the package in the given row.
+        """
+        return (int(self.__xs[row]), int(self.__ys[row]))
+
+    def product(self, row):
+        """
+        Returns the product of the package in the given row.
+        """
+        return self.__names[self.__products[row]]
+
+    def weight(self, row):
+        """
+        Returns the weight of the package in the given row.
+        """
+        return float(self.__package_weights[row])
+
+    def route_stop(self, row):
+        """
+        Returns the route stop to deliver the package in the given row.
+        """
+        return (self.destination(row), (self.product(row), ))
+
+    def is_pending(self, row):
+        """
+        Returns whether the package in the given row was neither given to a
+        vehicle nor cancelled.
+        """
+        return self.__status[row] == PENDING
+
+    def give(self, row):
+        """
+        Marks the package in the given row as given to a vehicle.
+        """
+        self.__status[row] = GIVEN
+
+    def cancel(self, row):
+        """
+        Marks the package in the given row as cancelled.
+        """
+        self.__status[row] = CANCELLED
+
+    def append(self, deliveries, weights=None):
+        """
+        Appends the packages of the given deliveries. The weights of new
+        products can be given in `weights`.
+
+        Returns the range of the new rows.
+        """
+        if weights:
+            self.__weights.maps[0].update(weights)
+        xs, ys, products, package_weights = [], [], [], []
+        first_delivery = self.deliveries
+        for delivery in deliveries:
+            x, y = delivery.destination
+            for product in delivery.packages:
+                xs.append(x)
+                ys.append(y)
+                products.append(self.__intern(product))
+                package_weights.append(self.__weights[product])
+            self.__offsets.append(self.__offsets[-1] + len(delivery.packages))
+        start, end = self.__size, self.__size + len(products)
+        self.__reserve(end)
+        self.__xs[start:end] = xs
+        self.__ys[start:end] = ys
+        self.__products[start:end] = products
+        self.__package_weights[start:end] = package_weights
+        self.__status[start:end] = PENDING
+        self.__size = end
+        if self.__deliveries is not None:
+            self.__index_deliveries(first_delivery)
+        return range(start, end)
+
+    def find(self, destination, product):
+        """
+        Returns the row of a pending package of the given product to the given
+        destination, or None if there is none.
+        """
+        product_id = self.__ids.get(product)
+        if product_id is None:
+            return None
+        if self.__deliveries is None:
+            self.__deliveries = {}
+            self.__index_deliveries(0)
+        for delivery in self.__deliveries.get(destination, ()):
+            for row in self.delivery_rows(delivery):
+                if (self.__products[row] == product_id and
+                        self.__status[row] == PENDING):
+                    return row
+        return None
+
+    def __intern(self, product):
+        """
+        Returns the id of the given product, adding it if it is new.
+        """
+        product_id = self.__ids.get(product)
+        if product_id is None:
+            product_id = self.__ids[product] = len(self.__names)
+            self.__names.append(product)
+        return product_id
+
+    def __index_deliveries(self, first):
+        """
+        Adds the deliveries from the given index on to the index of deliveries
+        per destination.
+        """
+        for delivery in range(first, self.deliveries):
+            rows = self.delivery_rows(delivery)
+            if rows:
+                self.__deliveries.setdefault(
+                    self.destination(rows[0]), []).append(delivery)
+
+    def __reserve(self, size):
+        """
+        Grows the columns to hold the given number of rows, doubling their
+        capacity so appending a row costs constant time on average.
+        """
+        capacity = len(self.__xs)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity)
+        self.__xs = self.__grow(self.__xs, capacity)
+        self.__ys = self.__grow(self.__ys, capacity)
+        self.__package_weights = self.__grow(
+            self.__package_weights, capacity)
+        self.__products = self.__grow(self.__products, capacity)
+        self.__status = self.__grow(self.__status, capacity)
+
+    def __grow(self, column, capacity):
+        """
+        Returns a copy of the given column with the given capacity.
+        """
+        grown = numpy.zeros(capacity, dtype=column.dtype)
+        grown[:self.__size] = column[:self.__size]
+        return grown
+
+
+class RowQueue(object):
+    """
+    FIFO queue of rows of a package table kept in a numpy array.
+    """
+
+    def __init__(self, rows=()):
+        """
+        Constructs the queue with the given rows.
+        """
+        self.__rows = numpy.array(rows, dtype=numpy.int32)
+        self.__head = 0
+        self.__tail = len(self.__rows)
+
+    def __len__(self):
+        return self.__tail - self.__head
+
+    def __iter__(self):
+        return iter(self.__rows[self.__head:self.__tail].tolist())
+
+    @property
+    def nbytes(self):
+        """
+        Returns the bytes taken by the queue.
+        """
+        return self.__rows.nbytes
+
+    def first(self):
+        """
+        Returns the first row without removing it.
+        """
+        if self.__head == self.__tail:
+            raise IndexError('first from an empty queue')
+        return int(self.__rows[self.__head])
+
+    def popleft(self):
+        """
+        Removes and returns the first row.
+        """
+        row = self.first()
+        self.__head += 1
+        return row
+
+    def extend(self, rows):
+        """
+        Appends the given rows at the end.
+        """
+        rows = numpy.asarray(rows, dtype=numpy.int32)
+        if self.__tail + len(rows) > len(self.__rows):
+            # Drop the rows already popped and double the capacity.
+            pending = self.__rows[self.__head:self.__tail]
+            grown = numpy.zeros(
+                max(2 * len(pending), len(pending) + len(rows)),
+                dtype=numpy.int32)
+            grown[:len(pending)] = pending
+            self.__rows = grown
+            self.__head, self.__tail = 0, len(pending)
+        self.__rows[self.__tail:self.__tail + len(rows)] = rows
+        self.__tail += len(rows)
+
+    def clear(self):
+        """
+        Removes all the rows.
+        """
+        self.__rows = numpy.zeros(0, dtype=numpy.int32)
+        self.__head = self.__tail = 0
+
+
+class LongestTripQueue(object):
+    """
+    Queue of rows of a package table giving first the package with the
+    longest straight round trip from the depot, as the longest jobs first
+    keep the last vehicle from coming back late. It also keeps the total kms
+    of the round trips of its packages, including the cancelled ones until
+    they are popped.
+    """
+
+    def __init__(self, table, rows=()):
+        """
+        Constructs the queue with the given rows of the given table.
+        """
+        self.__table = table
+        # Heap of the negated round trips and the rows.
+        self.__heap = []
+        self.__kms = 0.0
+        self.extend(rows)
+
+    def __len__(self):
+        return len(self.__heap)
+
+    def __iter__(self):
+        return iter([row for _, row in self.__heap])
+
+    @property
+    def nbytes(self):
+        """
+        Returns the approximate bytes taken by the queue.
+        """
+        return 64 * len(self.__heap)
+
+    @property
+    def kms(self):
+        """
+        Returns the total kms of the round trips of the packages.
+        """
+        return self.__kms
+
+    def trip(self, row):
+        """
+        Returns the kms of the straight round trip to the package in the given
+        row.
+        """
+        x, y = self.__table.destination(row)
+        return 2 * (x * x + y * y) ** 0.5
+
+    def first(self):
+        """
+        Returns the row with the longest round trip without removing it.
+        """
+        if not self.__heap:
+            raise IndexError('first from an empty queue')
+        return self.__heap[0][1]
+
+    def popleft(self):
+        """
+        Removes and returns the row with the longest round trip.
+        """
+        if not self.__heap:
+            raise IndexError('popleft from an empty queue')
+        trip, row = heappop(self.__heap)
+        self.__kms += trip
+        if not self.__heap:
+            # Avoid accumulating rounding errors.
+            self.__kms = 0.0
+        return row
+
+    def extend(self, rows):
+        """
+        Adds the given rows.
+        """
+        rows = numpy.asarray(rows, dtype=numpy.int64)
+        if not len(rows):
+            return
+        trips = -2 * numpy.hypot(self.__table.xs[rows], self.__table.ys[rows])
+        self.__kms -= float(trips.sum())
+        entries = zip(trips.tolist(), rows.tolist())
+        if len(rows) > len(self.__heap):
+            self.__heap.extend(entries)
+            heapify(self.__heap)
+        else:
+            for entry in entries:
+                heappush(self.__heap, entry)
+
+    def clear(self):
+        """
+        Removes all the rows.
+        """
+        self.__heap = []
+        self.__kms = 0.0
+
+
+class SortedRowQueue(object):
+    """
+    Rows of a package table sorted by a key, such as their angle, kept in
+    blocks of about `block_size` rows along with their keys. Inserting or
+    removing rows only moves the rows of one block, so it doesn't get slower
+    as the queue grows like in a flat array. Rows are addressed by their
+    position in the whole queue.
+    """
+
+    def __init__(self, rows=(), keys=(), block_size=BLOCK_SIZE):
+        """
+        Constructs the queue with the given rows and their keys, which have
+        to be in increasing order.
+        """
+        rows, keys = array('i', rows), array('d', keys)
+        self.__block_size = block_size
+        self.__rows = [rows[i:i + block_size]
+                       for i in range(0, len(rows), block_size)]
+        self.__keys = [keys[i:i + block_size]
+                       for i in range(0, len(keys), block_size)]
+        # Last key of every block, to find the block of a key.
+        self.__maxes = [block[-1] for block in self.__keys]
+        # Position of the first row of every block, computed again lazily
+        # after rows are inserted or removed.
+        self.__starts = None
+        self.__len = len(rows)
+
+    def __len__(self):
+        return self.__len
+
+    def __iter__(self):
+        for block in self.__rows:
+            yield from block
+
+    def __getitem__(self, position):
+        block, i = self.__locate(position)
+        return self.__rows[block][i]
+
+    def key(self, position):
+        """
+        Returns the key of the row at the given position.
+        """
+        block, i = self.__locate(position)
+        return self.__keys[block][i]
+
+    def bisect_left(self, key):
+        """
+        Returns the position of the first row whose key is not lower than
+        the given key.
+        """
+        block = bisect_left(self.__maxes, key)
+        if block == len(self.__maxes):
+            return self.__len
+        return self.__block_starts()[block] + bisect_left(
+            self.__keys[block], key)
+
+    def insert(self, row, key):
+        """
+        Inserts the given row with the given key after the rows with the
+        same key.
+
+        Returns the position of the row.
+        """
+        self.__len += 1
+        if not self.__rows:
+            self.__rows.append(array('i', (row, )))
+            self.__keys.append(array('d', (key, )))
+            self.__maxes.append(key)
+            self.__starts = None
+            return 0
+        block = min(bisect_right(self.__maxes, key), len(self.__maxes) - 1)
+        keys = self.__keys[block]
+        i = bisect_right(keys, key)
+        position = self.__block_starts()[block] + i
+        keys.insert(i, key)
+        self.__rows[block].insert(i, row)
+        self.__maxes[block] = keys[-1]
+        if len(keys) > 2 * self.__block_size:
+            self.__split(block)
+        self.__starts = None
+        return position
+
+    def insert_many(self, rows, keys):
+        """
+        Inserts the given rows with the given keys, which have to be in
+        increasing order, each after the rows with the same key. Every block
+        is merged once with all its new rows, so the cost doesn't depend on
+        the size of the rest of the queue.
+        """
+        if not rows:
+            return
+        if not self.__rows:
+            self.__rows.append(array('i'))
+            self.__keys.append(array('d'))
+            self.__maxes.append(keys[-1])
+        # New rows by the block they go to, from the last block back, so
+        # splitting a block doesn't move the ones left to merge.
+        last = len(self.__maxes) - 1
+        groups = {}
+        for row, key in zip(rows, keys):
+            block = min(bisect_right(self.__maxes, key), last)
+            groups.setdefault(block, ([], []))
+            groups[block][0].append(row)
+            groups[block][1].append(key)
+        for block in sorted(groups, reverse=True):
+            new_rows, new_keys = groups[block]
+            merged_rows, merged_keys = self.__rows[block], self.__keys[block]
+            if len(new_rows) <= len(merged_rows):
+                # A few rows are cheaper to insert one by one.
+                for row, key in zip(new_rows, new_keys):
+                    i = bisect_right(merged_keys, key)
+                    merged_keys.insert(i, key)
+                    merged_rows.insert(i, row)
+            else:
+                merged_rows += array('i', new_rows)
+                merged_keys += array('d', new_keys)
+                order = sorted(
+                    range(len(merged_keys)), key=merged_keys.__getitem__)
+                merged_rows = array('i', (merged_rows[i] for i in order))
+                merged_keys = array('d', (merged_keys[i] for i in order))
+            # Blocks that grow over twice the size are split in blocks of
+            # the size.
+            size = len(merged_keys)
+            if size > 2 * self.__block_size:
+                size = self.__block_size
+            starts = range(0, len(merged_keys), size)
+            self.__rows[block:block + 1] = [
+                merged_rows[i:i + size] for i in starts]
+            self.__keys[block:block + 1] = [
+                merged_keys[i:i + size] for i in starts]
+            self.__maxes[block:block + 1] = [
+                merged_keys[min(i + size, len(merged_keys)) - 1]
+                for i in starts]
+        self.__len += len(rows)
+        self.__starts = None
+
+    def remove(self, row, key):
+        """
+        Removes the given row, which has the given key.
+
+        Returns the position it had, or None if it was not in the queue.
+        """
+        position = self.bisect_left(key)
+        while position < self.__len and self.key(position) == key:
+            if self[position] == row:
+                self.delete(position, 1)
+                return position
+            position += 1
+        return None
+
+    def delete(self, start, length):
+        """
+        Removes `length` consecutive rows from the given position on.
+        """
+        if start < 0 or length < 0 or start + length > self.__len:
+            raise IndexError('delete out of the queue')
+        if not length:
+            return
+        block, i = self.__locate(start)
+        left = length
+        while left:
+            rows, keys = self.__rows[block], self.__keys[block]
+            end = min(len(rows), i + left)
+            del rows[i:end]
+            del keys[i:end]
+            left -= end - i
+            if rows:
+                self.__maxes[block] = keys[-1]
+                block += 1
+            else:
+                del self.__rows[block]
+                del self.__keys[block]
+                del self.__maxes[block]
+            i = 0
+        self.__len -= length
+        self.__starts = None
+
+    def __locate(self, position):
+        """
+        Returns the block of the given position and the position in it.
+        """
+        if not 0 <= position < self.__len:
+            raise IndexError('queue position out of range')
+        starts = self.__block_starts()
+        block = bisect_right(starts, position) - 1
+        return block, position - starts[block]
+
+    def __block_starts(self):
+        """
+        Returns the position of the first row of every block.
+        """
+        if self.__starts is None:
+            self.__starts = list(
+                accumulate(map(len, self.__rows[:-1]), initial=0))
+        return self.__starts
+
+    def __split(self, block):
+        """
+        Splits the given block in two halves.
+        """
+        half = len(self.__rows[block]) // 2
+        for blocks in (self.__rows, self.__keys):
+            blocks.insert(block + 1, blocks[block][half:])
+            del blocks[block][half:]
+        self.__maxes.insert(block, self.__keys[block][-1])
@@ -0,0 +1,89 @@
+"""
+This module contains the functions to read the deliveries and the weights of
+the products in the text format given via stdin.
+"""
+
+import sys
+
+from scheduler import Delivery
+
+
+def read_deliveries(file_=None):
+    """
+    Reads deliveries from the given file, stdin by default.
+
+    It is expected something like:
+    3
+    3 product0 product1 product2 5 4
+    1 product3 15 9
+    1 product4 6 7
+    """
+    file_ = file_ or sys.stdin
+    n = int(file_.readline())
+    deliveries = []
+    for _ in range(n):
+        line = file_.readline()
+        line = line.strip()
+        tokens = line.split()
+        packages = tokens[1:1 + int(tokens[0])]
+        destination = (int(tokens[-2]), int(tokens[-1]))
+        deliveries.append(Delivery(packages, destination))
+    return deliveries
+
+
+def read_timed_deliveries(file_=None):
+    """
+    Reads deliveries arriving during the day from the given file, stdin by
+    default, until the end of it. Lines are read as the deliveries are
+    needed, so the file can be a stream being written meanwhile.
+
+    It is expected a delivery per line preceded by the tick in which it
+    arrives, sorted by tick:
+    10 2 product0 product3 -4 7
+    25 1 product2 3 3
+
+    Yields pairs of tick and delivery.
+    """
+    file_ = file_ or sys.stdin
+    for line in file_:
+        tokens = line.split()
+        if not tokens:
+            continue
+        packages = tokens[2:2 + int(tokens[1])]
+        destination = (int(tokens[-2]), int(tokens[-1]))
+        yield int(tokens[0]), Delivery(packages, destination)
+
+
+def read_weights(file_=None):
+    """
+    Reads weights from the given file, stdin by default.
+
+    It is expected something like:
+    5
+    product0 3.5
+    product1 4.5
+    product2 8.2
+    product3 5
+    product4 43
+    """
+    file_ = file_ or sys.stdin
+    n = int(file_.readline())
+    weights = {}
+    for _ in range(n):
+        line = file_.readline()
+        line = line.strip()
+        product, weight = line.split()
+        weights[product] = float(weight)
+    return weights
+
+
+def assert_all_packages_have_weight(deliveries, weights):
+    """
+    Asserts all weights were given for all products in packages.
+    """
+    for delivery in deliveries:
+        for product in delivery.packages:
+            if product not in weights:
+                msg = 'ERROR: All products must have a weight: {}'
+                print(msg.format(product))
+                sys.exit(1)
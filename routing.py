@@ -0,0 +1,291 @@
+"""
+This module contains helpers to build routes for the cyclists: a matrix with
+the distances between destinations and a cache of the optimal routes to visit
+a set of destinations.
+"""
+
+from collections import OrderedDict, namedtuple
+from itertools import permutations
+from math import inf
+from sys import maxsize
+
+import numpy
+
+
+# Above this number of destinations distances are computed when needed, as the
+# matrix would take too much memory.
+MAX_MATRIX_DESTINATIONS = 2048
+
+CACHE_SIZE = 4096
+
+# Routes up to this number of destinations are solved by brute force, which
+# is as fast as the dynamic programming for a few stops.
+BRUTE_FORCE_MAX_STOPS = 4
+# Routes up to this number of destinations are solved exactly with Held-Karp,
+# above it the nearest neighbour route improved with 2-opt is used.
+HELD_KARP_MAX_STOPS = 10
+
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses maxsize currsize')
+
+
+class DistanceMatrix(object):
+    """
+    Straight-line distances between every pair of destinations and between
+    every destination and the depot, keyed by the index of the destination.
+    Destinations added after construction are not part of the precomputed
+    matrix, the distances to them are computed when needed.
+    """
+
+    def __init__(self, destinations):
+        """
+        Constructs the matrix for the given destinations. Repeated
+        destinations share the same index.
+        """
+        self.__index = {}
+        for destination in destinations:
+            self.__index.setdefault(destination, len(self.__index))
+        self.__points = numpy.array(
+            list(self.__index), dtype=float).reshape(-1, 2)
+        self.__depot = numpy.sqrt((self.__points ** 2).sum(axis=1))
+        self.__matrix = None
+        if len(self.__points) <= MAX_MATRIX_DESTINATIONS:
+            self.__matrix = self.__calculate_distances(
+                self.__points, self.__points)
+        self.__added = []
+
+    def __len__(self):
+        return len(self.__index)
+
+    def index(self, destination):
+        """
+        Returns the index of the given destination.
+        """
+        return self.__index[destination]
+
+    def add(self, destination):
+        """
+        Returns the index of the given destination, adding it if it is new.
+        It costs the same no matter how many destinations there are.
+        """
+        index = self.__index.get(destination)
+        if index is None:
+            index = self.__index[destination] = len(self.__index)
+            self.__added.append(destination)
+        return index
+
+    def distances(self, indices):
+        """
+        Returns the distances from the depot to the given destinations and the
+        distances between them, as lists to be used in tight loops.
+        """
+        indices = numpy.asarray(indices)
+        n = len(self.__points)
+        if indices.max() >= n:
+            # Some destinations were added, none of them is precomputed.
+            points = numpy.array([
+                self.__points[i] if i < n else self.__added[i - n]
+                for i in indices], dtype=float)
+            depot = numpy.sqrt((points ** 2).sum(axis=1))
+            matrix = self.__calculate_distances(points, points)
+            return depot.tolist(), matrix.tolist()
+        if self.__matrix is not None:
+            matrix = self.__matrix[numpy.ix_(indices, indices)]
+        else:
+            points = self.__points[indices]
+            matrix = self.__calculate_distances(points, points)
+        return self.__depot[indices].tolist(), matrix.tolist()
+
+    @staticmethod
+    def __calculate_distances(points1, points2):
+        """
+        Returns the distances between every point in `points1` and every point
+        in `points2`.
+        """
+        offsets = points1[:, numpy.newaxis, :] - points2[numpy.newaxis, :, :]
+        return numpy.sqrt((offsets ** 2).sum(axis=2))
+
+
+class RouteCache(object):
+    """
+    Bounded LRU cache of the optimal order to visit a set of destinations
+    starting and ending at the depot.
+    """
+
+    def __init__(self, distances, maxsize=CACHE_SIZE,
+                 exact_max_stops=HELD_KARP_MAX_STOPS):
+        """
+        Constructs the cache on top of the given distance matrix. Routes with
+        more than `exact_max_stops` destinations are not guaranteed to be
+        optimal.
+        """
+        self.__distances = distances
+        self.__maxsize = maxsize
+        self.__exact_max_stops = exact_max_stops
+        self.__routes = OrderedDict()
+        self.__hits = 0
+        self.__misses = 0
+
+    def cache_info(self):
+        """
+        Returns the hits, misses, maximum size and current size of the cache.
+        """
+        return CacheInfo(
+            self.__hits, self.__misses, self.__maxsize, len(self.__routes))
+
+    def solve(self, indices):
+        """
+        Returns the kms and the order of the destination indices of the
+        shortest route visiting the given destinations.
+        """
+        key = frozenset(indices)
+        route = self.__routes.get(key)
+        if route is not None:
+            self.__hits += 1
+            self.__routes.move_to_end(key)
+            return route
+        self.__misses += 1
+        route = self.__solve(indices)
+        self.__routes[key] = route
+        if len(self.__routes) > self.__maxsize:
+            self.__routes.popitem(last=False)
+        return route
+
+    def solve_route_stops(self, route_stops):
+        """
+        Returns the kms and the stops of the shortest route with the given
+        route stops. Stops to the same destination are visited together.
+        """
+        stops_by_destination = OrderedDict()
+        for route_stop in route_stops:
+            destination, _ = route_stop
+            stops_by_destination.setdefault(
+                self.__distances.index(destination), []).append(route_stop)
+        kms, order = self.solve(list(stops_by_destination))
+        best_route = [
+            route_stop for i in order for route_stop in stops_by_destination[i]
+        ]
+        return kms, best_route
+
+    def __solve(self, indices):
+        """
+        Solves the TSP for the given destinations with the best approach for
+        its size.
+        """
+        depot, matrix = self.__distances.distances(indices)
+        if len(indices) <= BRUTE_FORCE_MAX_STOPS:
+            kms, order = solve_brute_force(depot, matrix)
+        elif len(indices) <= self.__exact_max_stops:
+            kms, order = solve_held_karp(depot, matrix)
+        else:
+            kms, order = solve_two_opt(depot, matrix)
+        return kms, tuple(indices[i] for i in order)
+
+
+def calculate_route_distance(depot, matrix, order):
+    """
+    Calculates the kms of the route visiting the stops in the given order,
+    starting and ending at the depot.
+    """
+    kms = depot[order[0]]
+    for i, j in zip(order, order[1:]):
+        kms += matrix[i][j]
+    kms += depot[order[-1]]
+    return kms
+
+
+def solve_brute_force(depot, matrix):
+    """
+    Solves the TSP checking all the permutations of the stops. `depot` has the
+    distances from the depot to the stops and `matrix` the distances between
+    them.
+
+    Returns the kms and the order of the stops of the optimal route.
+    """
+    min_kms, best_order = maxsize, None
+    for order in permutations(range(len(depot))):
+        kms = calculate_route_distance(depot, matrix, order)
+        if kms < min_kms:
+            min_kms, best_order = kms, order
+    return min_kms, best_order
+
+
+def solve_held_karp(depot, matrix):
+    """
+    Solves the TSP with the Held-Karp dynamic programming over subsets of
+    stops, in O(2^n n^2) instead of O(n!).
+
+    Returns the kms and the order of the stops of the optimal route.
+    """
+    n = len(depot)
+    full = (1 << n) - 1
+    # Shortest path from the depot visiting the stops in `mask` and ending at
+    # stop `j`, and the previous stop in that path.
+    costs = [[inf] * n for _ in range(full + 1)]
+    parents = [[-1] * n for _ in range(full + 1)]
+    for j in range(n):
+        costs[1 << j][j] = depot[j]
+    for mask in range(1, full + 1):
+        row = costs[mask]
+        for j in range(n):
+            cost = row[j]
+            if cost == inf:
+                continue
+            distances = matrix[j]
+            for k in range(n):
+                if mask & (1 << k):
+                    continue
+                next_mask = mask | (1 << k)
+                next_cost = cost + distances[k]
+                if next_cost < costs[next_mask][k]:
+                    costs[next_mask][k] = next_cost
+                    parents[next_mask][k] = j
+    min_kms, last = inf, -1
+    for j in range(n):
+        kms = costs[full][j] + depot[j]
+        if kms < min_kms:
+            min_kms, last = kms, j
+    order, mask = [], full
+    while last != -1:
+        order.append(last)
+        mask, last = mask & ~(1 << last), parents[mask][last]
+    order.reverse()
+    return min_kms, tuple(order)
+
+
+def solve_two_opt(depot, matrix):
+    """
+    Approximates the TSP starting with the nearest neighbour route and
+    reversing segments of it while that makes it shorter (2-opt).
+
+    Returns the kms and the order of the stops of the route.
+    """
+    n = len(depot)
+    pending = set(range(n))
+    order = []
+    distances = depot
+    while pending:
+        nearest = min(pending, key=distances.__getitem__)
+        pending.remove(nearest)
+        order.append(nearest)
+        distances = matrix[nearest]
+
+    def distance(i, j):
+        # Index -1 and n are the depot at both ends of the route.
+        if i < 0 or i >= n:
+            return depot[order[j]]
+        if j < 0 or j >= n:
+            return depot[order[i]]
+        return matrix[order[i]][order[j]]
+
+    improved = True
+    while improved:
+        improved = False
+        for i in range(n - 1):
+            for j in range(i + 1, n):
+                delta = (distance(i - 1, j) + distance(i, j + 1) -
+                         distance(i - 1, i) - distance(j, j + 1))
+                if delta < -1e-9:
+                    order[i:j + 1] = reversed(order[i:j + 1])
+                    improved = True
+    return calculate_route_distance(depot, matrix, order), tuple(order)
@@ -3,11 +3,25 @@ This module contains the interface that schedulers should implement.
 """
 
 from abc import ABC, abstractmethod
-from collections import namedtuple, deque
+from collections import namedtuple
+from importlib import import_module
+
+import numpy
+
+from packages import RowQueue
 
 
 Delivery = namedtuple('Delivery', 'packages destination')
 
+# Capacity of the vehicles.
+DRONE_MAX_WEIGHT = 5
+CYCLIST_MAX_PACKAGES = 4
+CYCLIST_MAX_WEIGHT = 50
+
+# Vehicle speeds in kms per tick (a tick is 2 minutes).
+DRONE_SPEED = 1
+CYCLIST_SPEED = 0.5
+
 
 class Scheduler(ABC):
     """
@@ -38,19 +52,97 @@ class Scheduler(ABC):
         """
         return None
 
+    def get_routes_for_drones(self, n):
+        """
+        Returns routes for up to `n` drones at once, fewer when there are not
+        enough packages for them. By default the routes are asked one by one.
+        """
+        return self._repeat(self.get_route_for_drone, n)
+
+    def get_routes_for_cyclists(self, n):
+        """
+        Returns routes for up to `n` cyclists at once, fewer when there are
+        not enough packages for them. By default the routes are asked one by
+        one.
+        """
+        return self._repeat(self.get_route_for_cyclist, n)
+
+    @property
+    def depots(self):
+        """
+        Returns the depots the routes start and end at. Unless the scheduler
+        handles several depots, it is the origin.
+        """
+        return ((0, 0), )
+
+    def for_depot(self, depot):
+        """
+        Returns the scheduler giving the routes of the vehicles based at the
+        depot with the given index.
+        """
+        return self
+
+    def set_fleet(self, drones, cyclists):
+        """
+        Tells the scheduler the number of drones and cyclists it gives routes
+        to. Schedulers that don't balance the work between the fleets ignore
+        it.
+        """
+
+    def add_deliveries(self, deliveries, weights=None):
+        """
+        Adds deliveries that arrived after the scheduler was created. The
+        weights of new products can be given in `weights`.
+        """
+        raise NotImplementedError(
+            '{} does not accept new deliveries'.format(self.name))
+
+    def cancel(self, delivery):
+        """
+        Cancels the packages of the given delivery that have not been given
+        to any vehicle yet.
+
+        Returns the products of the cancelled packages.
+        """
+        raise NotImplementedError(
+            '{} does not cancel deliveries'.format(self.name))
+
+    @staticmethod
+    def _repeat(get_route, n):
+        """
+        Returns the routes given by up to `n` calls to the given method,
+        stopping at the first call without a route.
+        """
+        routes = []
+        while len(routes) < n:
+            route = get_route()
+            if not route:
+                break
+            routes.append(route)
+        return routes
+
     @staticmethod
-    def _create_queues(deliveries, weights):
-        """
-        Creates two queues of packages, one for the drones and other for the
-        cyclists.
-        """
-        drones_queue = deque()
-        cyclists_queue = deque()
-        for delivery in deliveries:
-            for product in delivery.packages:
-                package = (delivery.destination, product)
-                if weights[product] <= 5:
-                    drones_queue.append(package)
-                else:
-                    cyclists_queue.append(package)
-        return drones_queue, cyclists_queue
+    def _create_queues(table, rows):
+        """
+        Creates two queues with the given rows of the package table, one for
+        the drones and other for the cyclists.
+        """
+        rows = numpy.arange(rows.start, rows.stop)
+        light = table.weights[rows] <= DRONE_MAX_WEIGHT
+        return RowQueue(rows[light]), RowQueue(rows[~light])
+
+
+def load_scheduler_class(name):
+    """
+    Returns the scheduler class implemented in the module with the given name.
+    Modules named like 'scheduler3' implement the class 'Scheduler3'.
+    """
+    module = import_module(name)
+    scheduler_class = getattr(module, name.capitalize(), None)
+    if scheduler_class is not None:
+        return scheduler_class
+    for value in vars(module).values():
+        if (isinstance(value, type) and issubclass(value, Scheduler) and
+                value.__module__ == module.__name__):
+            return value
+    raise ImportError('No scheduler found in module: {}'.format(name))
@@ -4,7 +4,8 @@ This module contains a very basic scheduler based on a queue.
 
 from collections import deque
 
-from scheduler import Scheduler
+from packages import PackageTable
+from scheduler import CYCLIST_MAX_WEIGHT, DRONE_MAX_WEIGHT, Scheduler
 
 
 class Scheduler1(Scheduler):
@@ -22,21 +23,20 @@ class Scheduler1(Scheduler):
 
     def __init__(self, deliveries, weights):
         super(Scheduler1, self).__init__('Scheduler1')
-        self.__queue = deque(deliveries)
-        self.__weights = weights
+        self.__table = PackageTable.from_deliveries(deliveries, weights)
+        # Index of the following delivery in the table.
+        self.__next = 0
 
     def get_route_for_drone(self):
         """
         Returns the route for the following delivery if a drone can handle it.
         """
-        if self.__queue:
-            delivery = self.__queue[0]
-            destination = delivery.destination
-            packages = delivery.packages
-            if len(packages) == 1 and self.__weights[packages[0]] <= 5:
-                self.__queue.popleft()
-                route_stop = (destination, packages)
-                route = deque((route_stop, ))
+        rows = self.__next_rows()
+        if rows:
+            if (len(rows) == 1 and
+                    self.__table.weight(rows[0]) <= DRONE_MAX_WEIGHT):
+                self.__next += 1
+                route = deque((self.__create_route_stop(rows), ))
                 return route
         return None
 
@@ -45,13 +45,32 @@ class Scheduler1(Scheduler):
         Returns the route for the following delivery if a cyclist can handle
         it.
         """
-        if self.__queue:
-            delivery = self.__queue[0]
-            packages = delivery.packages
-            total_weight = sum(self.__weights[package] for package in packages)
-            if total_weight <= 50:
-                self.__queue.popleft()
-                route_stop = (delivery.destination, packages)
-                route = deque((route_stop, ))
+        rows = self.__next_rows()
+        if rows:
+            total_weight = sum(self.__table.weight(row) for row in rows)
+            if total_weight <= CYCLIST_MAX_WEIGHT:
+                self.__next += 1
+                route = deque((self.__create_route_stop(rows), ))
                 return route
         return None
+
+    def __next_rows(self):
+        """
+        Returns the rows of the packages of the following delivery, skipping
+        deliveries without packages, or None if there are no more.
+        """
+        table = self.__table
+        while self.__next < table.deliveries:
+            rows = table.delivery_rows(self.__next)
+            if rows:
+                return rows
+            self.__next += 1
+        return None
+
+    def __create_route_stop(self, rows):
+        """
+        Returns the route stop to deliver all the packages in the given rows,
+        which belong to the same delivery.
+        """
+        products = tuple(self.__table.product(row) for row in rows)
+        return (self.__table.destination(rows[0]), products)
@@ -7,7 +7,8 @@ cyclists.
 
 from collections import deque
 
-from scheduler import Scheduler
+from packages import PackageTable
+from scheduler import CYCLIST_MAX_PACKAGES, CYCLIST_MAX_WEIGHT, Scheduler
 
 
 class Scheduler2(Scheduler):
@@ -22,36 +23,39 @@ class Scheduler2(Scheduler):
     - The number of drones could be a bottleneck.
     """
 
-    def __init__(self, deliveries, weights):
+    def __init__(self, deliveries, weights,
+                 max_packages=CYCLIST_MAX_PACKAGES,
+                 max_weight=CYCLIST_MAX_WEIGHT):
         super(Scheduler2, self).__init__('Scheduler2')
-        self.__weights = weights
+        self.__table = PackageTable.from_deliveries(deliveries, weights)
+        self.__max_packages = max_packages
+        self.__max_weight = max_weight
         self.__drones_queue, self.__cyclists_queue = self._create_queues(
-            deliveries, weights)
+            self.__table, range(len(self.__table)))
 
     def get_route_for_drone(self):
         """
         Returns a route for the next package in the drones queue.
         """
         if self.__drones_queue:
-            destination, product = self.__drones_queue.popleft()
-            route_stop = (destination, (product, ))
-            route = deque((route_stop, ))
+            row = self.__drones_queue.popleft()
+            route = deque((self.__table.route_stop(row), ))
             return route
         return None
 
     def get_route_for_cyclist(self):
         """
         Returns a route batching the maximum number of packages from the queue
-        up to 4 or 50kg.
+        up to the capacity of the cyclists, 4 packages or 50kg by default.
         """
         route = deque()
         total_weight = 0
         while self.__cyclists_queue:
-            destination, product = self.__cyclists_queue[0]
-            total_weight += self.__weights[product]
-            if len(route) < 4 and total_weight <= 50:
-                route_stop = (destination, (product, ))
-                route.append(route_stop)
+            row = self.__cyclists_queue.first()
+            total_weight += self.__table.weight(row)
+            if (len(route) < self.__max_packages and
+                    total_weight <= self.__max_weight):
+                route.append(self.__table.route_stop(row))
                 self.__cyclists_queue.popleft()
             else:
                 if route:
@@ -6,12 +6,17 @@ are too overloaded.
 """
 
 from collections import deque
-from itertools import permutations
-from math import atan2, sqrt
-from sys import maxsize
+from math import atan2, inf
 
+import numpy
 
-from scheduler import Scheduler
+from packages import (
+    LongestTripQueue, PackageTable, RowQueue, SortedRowQueue)
+from routing import (
+    CACHE_SIZE, HELD_KARP_MAX_STOPS, DistanceMatrix, RouteCache)
+from scheduler import (
+    CYCLIST_MAX_PACKAGES, CYCLIST_MAX_WEIGHT, CYCLIST_SPEED, DRONE_SPEED,
+    Scheduler)
 
 
 class Scheduler3(Scheduler):
@@ -20,65 +25,307 @@ class Scheduler3(Scheduler):
     the cyclists queue. It uses the Sweep Algorithm to optimize the routes for
     the cyclists. This consists on sorting the packages using a rotating ray
     centered at the depot, and then solving the Travelling Salesman Problem
-    for every batch. As cyclists can batch up to 4 packages as maximum, we use
+    for every batch. As cyclists batch 4 packages as maximum by default, we use
     a brute force approach, checking which one of the permutations of the
-    packages to be delivered produces the optimal route.
+    packages to be delivered produces the optimal route. For bigger capacities
+    (`max_packages` and `max_weight`) routes are solved with Held-Karp up to
+    `exact_max_stops` destinations and approximated with 2-opt above that.
+    Distances between destinations are precomputed and the optimal routes for
+    sets of destinations are kept in a LRU cache of `cache_size` routes, as the
+    same destinations are batched over and over.
+
+    Deliveries can be added and cancelled while the routes are being given.
+    Adding a package costs the same no matter how many are pending, the new
+    packages for the cyclists wait in a queue until the next route for a
+    cyclist is requested and then they are inserted at their angular position.
 
     This scheduler presents the following problems:
-    - This scheduler uses a greedy approach to batch the packages in the queue,
-    the problem with this is that packages used to form a route might no the
-    be the ones that are closest to each other. This could be solved by
-    sweeping the whole angular spectrum, using the caterpillar movement, to
-    calculate the best route possible. It could also be improved using applying
-    more advanced clustering techniques.
-    - We also have some room for improvement in the balacing process. Unloading
-    the drones on the cyclists may add new routes in areas that they have
-    already visited. A way to tackle this could be to take into account the
-    angular position of when adding the packages from the drones queue to the
-    cyclists queue.
+    - By default this scheduler uses a greedy approach to batch the packages in
+    the queue, the problem with this is that packages used to form a route
+    might no the be the ones that are closest to each other. With `caterpillar`
+    the whole angular spectrum is swept with a rolling window instead, and the
+    batch with the shortest route per package is given. It could also be
+    improved using applying more advanced clustering techniques.
+    - We also have some room for improvement in the balacing process. The
+    packages unloaded from the drones are inserted at their angular position
+    without restarting the sweep, but the ones behind the rotating ray wait
+    until it comes back to them.
+
+    With `makespan` the drones are given the packages with the longest round
+    trip first, and instead of unloading half of the drones queue when it is
+    longer than the cyclists queue, the longest drone packages are moved to
+    the cyclists while that makes the drones finish earlier than the
+    cyclists would, as the total ticks are given by the last vehicle to come
+    back. The finish times are estimated from the round trips of the drone
+    packages and the Manhattan round trips of the cyclist packages shared by
+    full batches, divided by the size of each fleet given in `set_fleet`.
     """
 
-    def __init__(self, deliveries, weights):
+    def __init__(self, deliveries, weights, caterpillar=False,
+                 cache_size=CACHE_SIZE, max_packages=CYCLIST_MAX_PACKAGES,
+                 max_weight=CYCLIST_MAX_WEIGHT,
+                 exact_max_stops=HELD_KARP_MAX_STOPS, makespan=False):
         super(Scheduler3, self).__init__('Scheduler3')
-        self.__weights = weights
-        self.__drones_queue, self.__cyclists_queue = self._create_queues(
-            deliveries, weights)
-        self.__cyclists_queue = self.__sort_by_angle(self.__cyclists_queue)
+        self.__table = PackageTable.from_deliveries(deliveries, weights)
+        self.__max_packages = max_packages
+        self.__max_weight = max_weight
+        self.__distances = DistanceMatrix(
+            delivery.destination for delivery in deliveries)
+        self.__routes_cache = RouteCache(
+            self.__distances, cache_size, exact_max_stops)
+        self.__drones_queue, cyclists_queue = self._create_queues(
+            self.__table, range(len(self.__table)))
+        self.__makespan = makespan
+        if makespan:
+            self.__drones_queue = LongestTripQueue(
+                self.__table, list(self.__drones_queue))
+        self.__fleet = (1, 1)
+        # Kms of the Manhattan round trips to the packages for the cyclists,
+        # in the queue or in the inbox, to estimate when they finish.
+        self.__cyclists_kms = self.__manhattan_kms(list(cyclists_queue))
+        # New packages for the cyclists waiting to be inserted in their queue.
+        # Cancelled packages are skipped when taken out of a queue that is not
+        # sorted by angle.
+        self.__inbox = RowQueue()
+        # Rows of the packages for the cyclists sorted by angle, and the angle
+        # of the rotating ray.
+        self.__cyclists_queue = self.__sort_by_angle(list(cyclists_queue))
+        self.__ray = -inf
+        self.__caterpillar = caterpillar
+        # Best window (kms per package, number of packages) starting at every
+        # position of the cyclists queue, only used by the caterpillar.
+        self.__windows = None
+
+    def set_fleet(self, drones, cyclists):
+        """
+        Sets the number of drones and cyclists the work is balanced for.
+        """
+        self.__fleet = (drones, cyclists)
+
+    def cache_info(self):
+        """
+        Returns the hits, misses, maximum size and current size of the cache
+        of optimal routes.
+        """
+        return self.__routes_cache.cache_info()
+
+    def add_deliveries(self, deliveries, weights=None):
+        """
+        Adds deliveries that arrived after the scheduler was created. The
+        weights of new products can be given in `weights`.
+        """
+        rows = self.__table.append(deliveries, weights)
+        for delivery in deliveries:
+            self.__distances.add(delivery.destination)
+        drones_queue, cyclists_queue = self._create_queues(self.__table, rows)
+        self.__drones_queue.extend(list(drones_queue))
+        self.__inbox.extend(list(cyclists_queue))
+        self.__cyclists_kms += self.__manhattan_kms(list(cyclists_queue))
+
+    def cancel(self, delivery):
+        """
+        Cancels the packages of the given delivery that have not been given
+        to any vehicle yet.
+
+        Returns the products of the cancelled packages.
+        """
+        cancelled = []
+        for product in delivery.packages:
+            row = self.__table.find(delivery.destination, product)
+            if row is None:
+                continue
+            self.__table.cancel(row)
+            # If it is in the drones queue or the inbox it is skipped later.
+            if self.__remove_package(row):
+                self.__cyclists_kms -= self.__manhattan_kms((row, ))
+            cancelled.append(product)
+        return tuple(cancelled)
+
+    def __insert_inbox(self):
+        """
+        Inserts the packages added since the last route in the cyclists queue.
+        They are sorted by angle and merged into the blocks of the queue they
+        fall in, so the cost doesn't grow with the packages already queued.
+        """
+        rows = [row for row in self.__inbox if self.__table.is_pending(row)]
+        self.__cyclists_kms -= self.__manhattan_kms([
+            row for row in self.__inbox if not self.__table.is_pending(row)])
+        self.__inbox.clear()
+        if self.__windows is not None:
+            for row in rows:
+                self.__insert_package(row)
+            return
+        angles = [self.__calculate_angle(row) for row in rows]
+        order = sorted(range(len(rows)), key=angles.__getitem__)
+        self.__cyclists_queue.insert_many(
+            [rows[i] for i in order], [angles[i] for i in order])
 
     def __balance_queues(self):
         """
         If the packages queue for the drones is bigger than the packages queue
-        for the cyclists half of the former queue is popped and appended to the
-        latter one. This measure attacks the bottleneck that a low number of
-        drones can cause.
-
-        Returns whether a re-balancing happened or not.
+        for the cyclists half of the former queue is popped and inserted in
+        the latter one at the angular position of every package. This measure
+        attacks the bottleneck that a low number of drones can cause.
         """
+        if self.__makespan:
+            self.__balance_makespan()
+            return
         n, m = len(self.__drones_queue), len(self.__cyclists_queue)
         if n > m:
             for _ in range(int((n + 1) / 2)):
-                self.__cyclists_queue.append(self.__drones_queue.popleft())
-            return True
-        return False
+                row = self.__drones_queue.popleft()
+                if self.__table.is_pending(row):
+                    self.__move_to_cyclists(row)
+
+    def __balance_makespan(self):
+        """
+        Moves the drone packages with the longest round trip to the cyclists
+        queue while the drones would still finish after the cyclists with the
+        package moved.
+        """
+        drones, cyclists = self.__fleet
+        if not cyclists:
+            return
+        queue = self.__drones_queue
+        per_package = 1 / self.__max_packages / CYCLIST_SPEED / cyclists
+        while queue:
+            row = queue.first()
+            if not self.__table.is_pending(row):
+                queue.popleft()
+                continue
+            drones_finish = (
+                queue.kms / DRONE_SPEED / drones if drones else inf)
+            cyclists_finish = (
+                self.__cyclists_kms + self.__manhattan_kms((row, ))
+            ) * per_package
+            if cyclists_finish >= drones_finish:
+                return
+            queue.popleft()
+            self.__move_to_cyclists(row)
+
+    def __move_to_cyclists(self, row):
+        """
+        Moves the package in the given row from the drones to the cyclists.
+        """
+        self.__cyclists_kms += self.__manhattan_kms((row, ))
+        self.__insert_package(row)
+
+    def __manhattan_kms(self, rows):
+        """
+        Returns the kms of the Manhattan round trips to the packages in the
+        given rows, the way cyclists move.
+        """
+        rows = numpy.asarray(rows, dtype=numpy.int64)
+        return 2 * float(
+            numpy.abs(self.__table.xs[rows]).sum() +
+            numpy.abs(self.__table.ys[rows]).sum())
+
+    def __insert_package(self, row):
+        """
+        Inserts the package in the given row in the cyclists queue keeping it
+        sorted by angle. The rotating ray keeps its position, so packages
+        behind it are given when the ray comes back to them.
+        """
+        i = self.__cyclists_queue.insert(row, self.__calculate_angle(row))
+        windows = self.__windows
+        if windows is not None:
+            windows.insert(i, None)
+            for j in range(self.__max_packages):
+                k = (i - j) % len(windows)
+                windows[k] = self.__score_window(k)
+
+    def __remove_package(self, row):
+        """
+        Removes the package in the given row from the cyclists queue.
+
+        Returns whether the package was there.
+        """
+        i = self.__cyclists_queue.remove(row, self.__calculate_angle(row))
+        if i is None:
+            return False
+        if self.__windows is not None:
+            del self.__windows[i]
+            self.__score_windows_before(i)
+        return True
+
+    def __take_packages(self, start, length):
+        """
+        Removes `length` consecutive packages from the cyclists queue starting
+        at the given position, wrapping around the angular spectrum.
+
+        Returns the route stops for the removed packages.
+        """
+        queue = self.__cyclists_queue
+        n = len(queue)
+        rows = [queue[(start + i) % n] for i in range(length)]
+        for row in rows:
+            self.__table.give(row)
+        self.__cyclists_kms -= self.__manhattan_kms(rows)
+        route_stops = [self.__table.route_stop(row) for row in rows]
+        self.__ray = queue.key((start + length - 1) % n)
+        if start + length <= n:
+            queue.delete(start, length)
+        else:
+            queue.delete(start, n - start)
+            queue.delete(0, start + length - n)
+        return route_stops
 
-    @staticmethod
-    def __sort_by_angle(packages):
+    def __sort_by_angle(self, rows):
         """
-        Sorts all the packages by the angle between the X axis and their
-        position vector. It goes from -PI to PI. This simulates the rotating
-        ray centered at the depot.
+        Sorts the packages in the given rows by the angle between the X axis
+        and their position vector. It goes from -PI to PI. This simulates the
+        rotating ray centered at the depot.
+
+        Returns a queue with the sorted rows.
         """
-        sorted_list = sorted(packages, key=lambda p: atan2(p[0][1], p[0][0]))
-        return deque(sorted_list)
+        xs = self.__table.xs[rows].tolist()
+        ys = self.__table.ys[rows].tolist()
+        angles = [atan2(y, x) for x, y in zip(xs, ys)]
+        order = sorted(range(len(rows)), key=angles.__getitem__)
+        return SortedRowQueue(
+            [rows[i] for i in order], [angles[i] for i in order])
+
+    def __calculate_angle(self, row):
+        """
+        Returns the angle between the X axis and the position vector of the
+        package in the given row.
+        """
+        x, y = self.__table.destination(row)
+        return atan2(y, x)
 
     def get_route_for_drone(self):
         """
         Returns a route for the next package in the drones queue.
         """
-        if self.__drones_queue:
-            destination, product = self.__drones_queue.popleft()
-            route_stop = (destination, (product, ))
-            route = deque((route_stop, ))
+        if self.__makespan:
+            self.__balance_makespan()
+        return self.__next_drone_route()
+
+    def get_routes_for_drones(self, n):
+        """
+        Returns routes for the next `n` packages in the drones queue, checking
+        the balance of the queues once for all of them.
+        """
+        if self.__makespan:
+            self.__balance_makespan()
+        routes = []
+        while len(routes) < n:
+            route = self.__next_drone_route()
+            if route is None:
+                break
+            routes.append(route)
+        return routes
+
+    def __next_drone_route(self):
+        """
+        Returns a route for the next pending package in the drones queue.
+        """
+        while self.__drones_queue:
+            row = self.__drones_queue.popleft()
+            if not self.__table.is_pending(row):
+                continue
+            self.__table.give(row)
+            route = deque((self.__table.route_stop(row), ))
             return route
         return None
 
@@ -87,55 +334,216 @@ class Scheduler3(Scheduler):
         Returns a route batching the maximum number of packages and trying
         to provide an optimal route.
         """
-        if self.__balance_queues():
-            self.__cyclists_queue = self.__sort_by_angle(self.__cyclists_queue)
+        self.__insert_inbox()
+        self.__balance_queues()
+        if self.__caterpillar:
+            return self.__get_caterpillar_route()
+        queue = self.__cyclists_queue
+        n = len(queue)
+        if not n:
+            return None
+        # The sweep goes on from the ray, starting again after a full turn.
+        start = queue.bisect_left(self.__ray) % n
+        length, total_weight = 0, 0
+        while length < min(self.__max_packages, n):
+            total_weight += self.__table.weight(queue[(start + length) % n])
+            if total_weight > self.__max_weight:
+                break
+            length += 1
+        if not length:
+            return None
+        route_stops = self.__take_packages(start, length)
+        return self.__create_best_route(route_stops)
+
+    def get_routes_for_cyclists(self, n):
+        """
+        Returns routes for up to `n` cyclists formed jointly. The queues are
+        balanced once and the packages the sweep would give to the cyclists
+        one by one, consecutive in the angular order from the ray, are taken
+        at once and split again into the same number of batches with the
+        shortest total route. The queues are balanced again only if they run
+        out of packages before. With the caterpillar the routes are given one
+        by one.
+        """
+        if self.__caterpillar:
+            return super(Scheduler3, self).get_routes_for_cyclists(n)
+        routes = []
+        while len(routes) < n:
+            self.__insert_inbox()
+            self.__balance_queues()
+            batch = self.__take_batches(n - len(routes))
+            if not batch:
+                break
+            routes.extend(batch)
+        return routes
+
+    def __take_batches(self, n):
+        """
+        Takes up to `n` batches of packages from the cyclists queue as the
+        sweep would, and splits them again jointly.
+
+        Returns the routes for the batches.
+        """
+        queue = self.__cyclists_queue
+        size = len(queue)
+        if not size:
+            return []
+        start = queue.bisect_left(self.__ray) % size
+        weights = []
+        batches = 0
+        while batches < n and len(weights) < size:
+            length, total_weight = 0, 0
+            while length < self.__max_packages and len(weights) < size:
+                weight = self.__table.weight(
+                    queue[(start + len(weights)) % size])
+                total_weight += weight
+                if total_weight > self.__max_weight:
+                    break
+                weights.append(weight)
+                length += 1
+            if not length:
+                break
+            batches += 1
+        if not weights:
+            return []
+        route_stops = self.__take_packages(start, len(weights))
+        return [self.__create_best_route(batch)
+                for batch in self.__split_batches(route_stops, weights)]
+
+    def __split_batches(self, route_stops, weights):
+        """
+        Splits the given route stops, consecutive in the angular order, into
+        the fewest batches of consecutive stops that fit in a cyclist, and
+        among them into the ones with the shortest total route.
+
+        Returns the batches.
+        """
+        n = len(route_stops)
+        # Fewest batches for the stops from every position on, so only the
+        # batches of a split with the fewest batches are solved.
+        rest = [0] * (n + 1)
+        for start in range(n - 1, -1, -1):
+            rest[start] = 1 + min(
+                rest[start + length]
+                for length in self.__batch_lengths(weights, start, 1))
+        # Fewest batches, their kms and the size of the last one for every
+        # number of first stops.
+        best = [(0, 0, 0)] + [None] * n
+        for end in range(1, n + 1):
+            for length in self.__batch_lengths(weights, end, -1):
+                previous = best[end - length]
+                if (previous is None or
+                        previous[0] + 1 + rest[end] != rest[0]):
+                    continue
+                kms, _ = self.__solve_route(route_stops[end - length:end])
+                candidate = (previous[0] + 1, previous[1] + kms, length)
+                if best[end] is None or candidate[:2] < best[end][:2]:
+                    best[end] = candidate
+        batches = []
+        end = n
+        while end:
+            length = best[end][2]
+            batches.append(route_stops[end - length:end])
+            end -= length
+        batches.reverse()
+        return batches
+
+    def __batch_lengths(self, weights, position, step):
+        """
+        Yields the lengths of the batches that fit in a cyclist starting at
+        the given position of the given weights with `step` 1, or ending
+        there with `step` -1.
+        """
         total_weight = 0
+        stop = len(weights) if step > 0 else -1
+        i = position if step > 0 else position - 1
+        length = 0
+        while i != stop and length < self.__max_packages:
+            total_weight += weights[i]
+            if total_weight > self.__max_weight:
+                return
+            length += 1
+            yield length
+            i += step
+
+    def __get_caterpillar_route(self):
+        """
+        Returns the route for the window of consecutive packages in the
+        angular order with the shortest route per package.
+
+        The window starting at every position of the queue is scored once and
+        kept. When a batch is taken only the windows right before it have to
+        be scored again, so a call costs a scan of the scores plus a few TSPs.
+        """
+        queue = self.__cyclists_queue
+        if self.__windows is None:
+            self.__windows = [
+                self.__score_window(i) for i in range(len(queue))]
+        windows = self.__windows
+        if not windows:
+            return None
+        start = min(range(len(windows)), key=windows.__getitem__)
+        _, length = windows[start]
+        if not length:
+            return None
+        n = len(queue)
+        route_stops = self.__take_packages(start, length)
+        if start + length <= n:
+            del windows[start:start + length]
+            gap = start
+        else:
+            # The window wrapped around, the queue starts after it now.
+            del windows[start:]
+            del windows[:start + length - n]
+            gap = len(windows)
+        self.__score_windows_before(gap)
+        return self.__create_best_route(route_stops)
+
+    def __score_windows_before(self, gap):
+        """
+        Scores again the windows that reached the given position of the
+        cyclists queue before some packages were removed from it.
+        """
+        windows = self.__windows
+        for i in range(1, min(self.__max_packages, len(windows) + 1)):
+            j = (gap - i) % len(windows)
+            windows[j] = self.__score_window(j)
+
+    def __score_window(self, start):
+        """
+        Scores the windows of consecutive packages starting at the given
+        position of the cyclists queue, wrapping around the angular spectrum.
+
+        Returns the kms per package of the best one and its number of
+        packages. Zero packages means no window fits in a cyclist.
+        """
+        queue = self.__cyclists_queue
+        n = len(queue)
+        best = (inf, 0)
         route_stops = []
-        while self.__cyclists_queue:
-            destination, product = self.__cyclists_queue[0]
-            total_weight += self.__weights[product]
-            if len(route_stops) < 4 and total_weight <= 50:
-                route_stop = (destination, (product, ))
-                route_stops.append(route_stop)
-                self.__cyclists_queue.popleft()
-            else:
-                if route_stops:
-                    return self.__create_best_route(route_stops)
-                return None
-        # After all elements in the queue have been consumed we may have a
-        # valid route.
-        if route_stops:
-            return self.__create_best_route(route_stops)
-        return None
+        total_weight = 0
+        for i in range(min(self.__max_packages, n)):
+            row = queue[(start + i) % n]
+            total_weight += self.__table.weight(row)
+            if total_weight > self.__max_weight:
+                break
+            route_stops.append(self.__table.route_stop(row))
+            kms, _ = self.__solve_route(route_stops)
+            score = kms / len(route_stops)
+            if score < best[0]:
+                best = (score, len(route_stops))
+        return best
 
-    @staticmethod
-    def __create_best_route(route_stops):
+    def __create_best_route(self, route_stops):
         """
-        Solves the TSP with the given route stops by brute force. This
-        shouldn't have an impact in performance as we would expect 4 route
-        stops as maximum.
+        Returns the given route stops in the order of the optimal route.
         """
-        routes = permutations(route_stops, len(route_stops))
-        min_kms, best_route = maxsize, None
-        for route in routes:
-            kms = Scheduler3.__calculate_route_distance(route)
-            if kms < min_kms:
-                min_kms, best_route = kms, route
+        _, best_route = self.__solve_route(route_stops)
         return deque(best_route)
 
-    @staticmethod
-    def __calculate_route_distance(route):
-        """
-        Calculates the traveled distance in the given route.
-        """
-        previous_destination = (0, 0)
-        kms = 0
-        for route_stop in route:
-            destination, _ = route_stop
-            kms += sqrt(
-                pow(destination[0] - previous_destination[0], 2) +
-                pow(destination[1] - previous_destination[1], 2))
-            previous_destination = destination
-        kms += sqrt(
-            pow(previous_destination[0], 2) + pow(previous_destination[1], 2))
-        return kms
+    def __solve_route(self, route_stops):
+        """
+        Returns the kms and the stops of the shortest route with the given
+        route stops.
+        """
+        return self.__routes_cache.solve_route_stops(route_stops)
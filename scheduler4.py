@@ -0,0 +1,258 @@
+"""
+This module contains a scheduler that plans all the routes for the cyclists
+up front with the Clarke-Wright savings algorithm, so giving a route is just
+taking the next one of the plan.
+"""
+
+from collections import deque
+from math import ceil
+
+import numpy
+
+from packages import PackageTable, RowQueue
+from routing import (
+    CACHE_SIZE, HELD_KARP_MAX_STOPS, DistanceMatrix, RouteCache)
+from scheduler import CYCLIST_MAX_PACKAGES, CYCLIST_MAX_WEIGHT, Scheduler
+from spatial import nearest_neighbours
+
+
+# Nearest packages every package is considered to be batched with.
+NEIGHBOURS = 8
+
+
+class Scheduler4(Scheduler):
+    """
+    This scheduler also distributes the packages between the drones and the
+    cyclists, moving the light packages farthest from the depot to the
+    cyclists while the drones would have more routes to make than them, for
+    the fleet sizes given in `set_fleet`. All the routes for the cyclists
+    are planned up front with the savings algorithm of Clarke and Wright:
+    every package starts in a route of its own, and the routes are merged end
+    to end by decreasing savings, the kms saved by visiting two packages in a
+    row instead of coming back to the depot in between, while they fit in a
+    cyclist. They are planned again in `set_fleet` only if the fleet moves
+    other packages to the cyclists.
+
+    Only the `neighbours` nearest packages of every package are considered
+    to be merged with it, which are found approximately along a few
+    space-filling curves, so the savings take linear memory. The routes are
+    given by decreasing distance to the depot of their farthest package, and
+    the stops of every route are visited in the optimal order.
+
+    This scheduler presents the following problems:
+    - The plan is made once, so deliveries can't be added afterwards and the
+    packages are not moved again between the drones and the cyclists as the
+    queues are emptied.
+    - Merging routes only at their ends is greedy, routes are never split
+    again nor packages exchanged between them.
+    """
+
+    def __init__(self, deliveries, weights, max_packages=CYCLIST_MAX_PACKAGES,
+                 max_weight=CYCLIST_MAX_WEIGHT, neighbours=NEIGHBOURS,
+                 cache_size=CACHE_SIZE, exact_max_stops=HELD_KARP_MAX_STOPS):
+        super(Scheduler4, self).__init__('Scheduler4')
+        self.__table = PackageTable.from_deliveries(deliveries, weights)
+        self.__max_packages = max_packages
+        self.__max_weight = max_weight
+        self.__routes_cache = RouteCache(
+            DistanceMatrix(delivery.destination for delivery in deliveries),
+            cache_size, exact_max_stops)
+        self.__neighbours = neighbours
+        self.__fleet = (1, 1)
+        # Whether any route was given, after which the plan is kept.
+        self.__started = False
+        # Rows of the packages for the drones and rows of every route for the
+        # cyclists.
+        self.__drones_queue = None
+        self.__plan = None
+        self.__make_plan(*self.__split_packages())
+
+    def set_fleet(self, drones, cyclists):
+        """
+        Sets the number of drones and cyclists the packages are split for.
+        The routes are planned again if the split changes, unless some route
+        was given already.
+        """
+        self.__fleet = (drones, cyclists)
+        if self.__started:
+            return
+        drones_rows, cyclists_rows = self.__split_packages()
+        if len(drones_rows) != len(self.__drones_queue):
+            self.__make_plan(drones_rows, cyclists_rows)
+
+    def __split_packages(self):
+        """
+        Splits the packages between the drones and the cyclists for the
+        fleet.
+
+        Returns the rows of the packages for the drones and for the cyclists.
+        """
+        drones_queue, cyclists_queue = self._create_queues(
+            self.__table, range(len(self.__table)))
+        return self.__balance_queues(
+            numpy.array(list(drones_queue), dtype=numpy.intp),
+            numpy.array(list(cyclists_queue), dtype=numpy.intp))
+
+    def __make_plan(self, drones_rows, cyclists_rows):
+        """
+        Queues the packages in the given rows for the drones and plans the
+        routes for the packages in the given rows for the cyclists.
+        """
+        self.__drones_queue = RowQueue(drones_rows.tolist())
+        self.__plan = self.__plan_routes(cyclists_rows, self.__neighbours)
+
+    def __distances_to_depot(self, rows):
+        """
+        Returns the distance from the depot to the packages in the given rows.
+        """
+        return numpy.hypot(self.__table.xs[rows], self.__table.ys[rows])
+
+    def __balance_queues(self, drones_rows, cyclists_rows):
+        """
+        Moves light packages to the cyclists while every drone would have
+        more routes to make than every cyclist, counting full batches. The
+        packages farthest from the depot are moved, which are the longest
+        trips for a drone and the ones that save more batched.
+
+        Returns the rows of the packages for the drones and for the cyclists.
+        """
+        drones, cyclists = self.__fleet
+        n, m = len(drones_rows), len(cyclists_rows)
+        capacity = self.__max_packages * cyclists
+        kept = (n + m) * drones / (drones + capacity) if capacity else n
+        n_moved = n - min(n, ceil(kept))
+        if not n_moved:
+            return drones_rows, cyclists_rows
+        order = numpy.argsort(
+            -self.__distances_to_depot(drones_rows), kind='stable')
+        moved = numpy.zeros(n, dtype=bool)
+        moved[order[:n_moved]] = True
+        return drones_rows[~moved], numpy.concatenate(
+            (cyclists_rows, drones_rows[moved]))
+
+    def __plan_routes(self, rows, neighbours):
+        """
+        Merges the packages in the given rows into routes with the savings
+        algorithm. Packages that don't fit in a cyclist are left out.
+
+        Returns a queue with the rows of the packages of every route, in the
+        order they are given.
+        """
+        weights = self.__table.weights[rows]
+        rows = rows[weights <= self.__max_weight]
+        weights = weights[weights <= self.__max_weight].tolist()
+        points = numpy.column_stack(
+            (self.__table.xs[rows], self.__table.ys[rows])).astype(float)
+        depot = numpy.hypot(points[:, 0], points[:, 1])
+        firsts, seconds, savings = self.__calculate_savings(
+            points, depot, neighbours)
+        order = numpy.argsort(-savings, kind='stable')
+        # Every package is in a route of its own at first. The rows of every
+        # route are kept in the route of its first package.
+        route_of = list(range(len(rows)))
+        routes = [[i] for i in range(len(rows))]
+        route_weights = weights
+        max_packages, max_weight = self.__max_packages, self.__max_weight
+        for i, j in zip(firsts[order].tolist(), seconds[order].tolist()):
+            first, second = route_of[i], route_of[j]
+            if first == second:
+                continue
+            head, tail = routes[first], routes[second]
+            if (len(head) + len(tail) > max_packages or
+                    route_weights[first] + route_weights[second] >
+                    max_weight):
+                continue
+            # Routes are joined through `i` and `j`, which have to be at one
+            # of their ends.
+            if head[-1] != i:
+                if head[0] != i:
+                    continue
+                head.reverse()
+            if tail[0] != j:
+                if tail[-1] != j:
+                    continue
+                tail.reverse()
+            head.extend(tail)
+            for k in tail:
+                route_of[k] = first
+            route_weights[first] += route_weights[second]
+            routes[second] = None
+        routes = [route for route in routes if route is not None]
+        farthest = [max(depot[route].tolist()) for route in routes]
+        order = sorted(range(len(routes)), key=farthest.__getitem__,
+                       reverse=True)
+        return deque(rows[routes[i]].tolist() for i in order)
+
+    @staticmethod
+    def __calculate_savings(points, depot, neighbours):
+        """
+        Calculates the savings of visiting every pair of the given points
+        that are near each other in a row instead of going back to the depot
+        in between, given their distances to the depot.
+
+        Returns the indices of the pairs of points and their savings, only
+        for the pairs that save some kms.
+        """
+        nearest = nearest_neighbours(points, neighbours)
+        firsts = numpy.repeat(numpy.arange(len(points)), nearest.shape[1])
+        seconds = nearest.ravel()
+        found = seconds >= 0
+        firsts, seconds = firsts[found], seconds[found]
+        # Every pair once, even if both points are neighbours of each other.
+        pairs = numpy.unique(
+            numpy.minimum(firsts, seconds) * len(points) +
+            numpy.maximum(firsts, seconds))
+        firsts, seconds = numpy.divmod(pairs, len(points))
+        offsets = points[firsts] - points[seconds]
+        savings = depot[firsts] + depot[seconds] - numpy.hypot(
+            offsets[:, 0], offsets[:, 1])
+        positive = savings > 0
+        return firsts[positive], seconds[positive], savings[positive]
+
+    def get_route_for_drone(self):
+        """
+        Returns a route for the next package in the drones queue.
+        """
+        self.__started = True
+        while self.__drones_queue:
+            row = self.__drones_queue.popleft()
+            if not self.__table.is_pending(row):
+                continue
+            self.__table.give(row)
+            return deque((self.__table.route_stop(row), ))
+        return None
+
+    def get_route_for_cyclist(self):
+        """
+        Returns the next route of the plan, visiting its stops in the optimal
+        order.
+        """
+        self.__started = True
+        while self.__plan:
+            rows = [
+                row for row in self.__plan.popleft()
+                if self.__table.is_pending(row)]
+            if not rows:
+                continue
+            for row in rows:
+                self.__table.give(row)
+            _, best_route = self.__routes_cache.solve_route_stops(
+                [self.__table.route_stop(row) for row in rows])
+            return deque(best_route)
+        return None
+
+    def cancel(self, delivery):
+        """
+        Cancels the packages of the given delivery that have not been given
+        to any vehicle yet. They are skipped when their route is given.
+
+        Returns the products of the cancelled packages.
+        """
+        cancelled = []
+        for product in delivery.packages:
+            row = self.__table.find(delivery.destination, product)
+            if row is None:
+                continue
+            self.__table.cancel(row)
+            cancelled.append(product)
+        return tuple(cancelled)
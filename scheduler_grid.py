@@ -0,0 +1,167 @@
+"""
+This module contains a scheduler that batches the packages for the cyclists
+looking up the nearest packages in a spatial index, instead of sorting the
+whole queue by angle.
+"""
+
+from collections import deque
+from heapq import heappop, heappush
+from math import sqrt
+
+from packages import PackageTable
+from routing import (
+    CACHE_SIZE, HELD_KARP_MAX_STOPS, DistanceMatrix, RouteCache)
+from scheduler import CYCLIST_MAX_PACKAGES, CYCLIST_MAX_WEIGHT, Scheduler
+from spatial import Grid
+
+
+# Packages looked up around the seed of a batch per package in the batch.
+CANDIDATES_PER_PACKAGE = 4
+
+
+class SchedulerGrid(Scheduler):
+    """
+    This scheduler also distributes the packages between the drones and the
+    cyclists, but the packages for the cyclists are kept in a uniform grid
+    over their destinations instead of a queue. Every batch is seeded at the
+    pending package farthest from the depot, and the nearest packages to it
+    that fit in the cyclist are pulled in. The farthest package is kept in a
+    heap, so neither of both lookups needs to go through the whole queue and
+    packages can be removed or added at any time.
+
+    This scheduler presents the following problems:
+    - Only a few packages around the seed are looked up, so a batch may not be
+    full when the nearest packages are too heavy.
+    - Pulling the nearest packages to the seed doesn't take into account the
+    way back to the depot, so the batches are not as elongated towards it as
+    they could be.
+    """
+
+    def __init__(self, deliveries, weights,
+                 max_packages=CYCLIST_MAX_PACKAGES,
+                 max_weight=CYCLIST_MAX_WEIGHT, cache_size=CACHE_SIZE,
+                 exact_max_stops=HELD_KARP_MAX_STOPS):
+        super(SchedulerGrid, self).__init__('SchedulerGrid')
+        self.__table = PackageTable.from_deliveries(deliveries, weights)
+        self.__max_packages = max_packages
+        self.__max_weight = max_weight
+        self.__routes_cache = RouteCache(
+            DistanceMatrix(delivery.destination for delivery in deliveries),
+            cache_size, exact_max_stops)
+        self.__drones_queue, cyclists_queue = self._create_queues(
+            self.__table, range(len(self.__table)))
+        # Rows of the packages for the cyclists, in the grid and in a heap by
+        # distance to the depot.
+        self.__grid = Grid(self.__calculate_cell_size(deliveries))
+        self.__farthest = []
+        rows = list(cyclists_queue)
+        xs = self.__table.xs[rows].tolist()
+        ys = self.__table.ys[rows].tolist()
+        for row, x, y in zip(rows, xs, ys):
+            self.__add_package(row, (x, y))
+
+    @staticmethod
+    def __calculate_cell_size(deliveries):
+        """
+        Calculates the size of the cells of the grid to have a couple of
+        destinations per cell on average.
+        """
+        if not deliveries:
+            return 1
+        xs = [delivery.destination[0] for delivery in deliveries]
+        ys = [delivery.destination[1] for delivery in deliveries]
+        area = (max(xs) - min(xs) + 1) * (max(ys) - min(ys) + 1)
+        return max(1, sqrt(2 * area / len(deliveries)))
+
+    def __add_package(self, row, destination):
+        """
+        Adds the package in the given row, going to the given destination, to
+        the ones to be delivered by cyclists.
+        """
+        self.__grid.insert(row, destination)
+        distance = sqrt(destination[0] ** 2 + destination[1] ** 2)
+        heappush(self.__farthest, (-distance, row))
+
+    def __remove_package(self, row):
+        """
+        Removes the package in the given row from the ones to be delivered by
+        cyclists.
+
+        Returns the route stop to deliver it.
+        """
+        self.__grid.remove(row)
+        return self.__table.route_stop(row)
+
+    def __balance_queues(self):
+        """
+        If the packages queue for the drones is bigger than the packages for
+        the cyclists half of the former queue is popped and added to the
+        latter ones. This measure attacks the bottleneck that a low number of
+        drones can cause. Packages that don't fit in a cyclist are queued
+        again for the drones.
+        """
+        n, m = len(self.__drones_queue), len(self.__grid)
+        if n > m:
+            kept = []
+            for _ in range(int((n + 1) / 2)):
+                row = self.__drones_queue.popleft()
+                if self.__table.weight(row) > self.__max_weight:
+                    kept.append(row)
+                    continue
+                self.__add_package(row, self.__table.destination(row))
+            self.__drones_queue.extend(kept)
+
+    def get_route_for_drone(self):
+        """
+        Returns a route for the next package in the drones queue.
+        """
+        if self.__drones_queue:
+            row = self.__drones_queue.popleft()
+            route = deque((self.__table.route_stop(row), ))
+            return route
+        return None
+
+    def get_route_for_cyclist(self):
+        """
+        Returns a route with the farthest package and its nearest packages
+        that fit in the cyclist.
+        """
+        self.__balance_queues()
+        seed = self.__pop_farthest()
+        if seed is None:
+            return None
+        route_stops = [self.__remove_package(seed)]
+        destination, _ = route_stops[0]
+        total_weight = self.__table.weight(seed)
+        batch = []
+        candidates = CANDIDATES_PER_PACKAGE * self.__max_packages
+        for _, id_ in self.__grid.nearest(destination):
+            if len(route_stops) + len(batch) >= self.__max_packages:
+                break
+            candidates -= 1
+            if candidates < 0:
+                break
+            weight = self.__table.weight(id_)
+            if total_weight + weight <= self.__max_weight:
+                total_weight += weight
+                batch.append(id_)
+        for id_ in batch:
+            route_stops.append(self.__remove_package(id_))
+        _, best_route = self.__routes_cache.solve_route_stops(route_stops)
+        return deque(best_route)
+
+    def __pop_farthest(self):
+        """
+        Pops the row of the pending package farthest from the depot that fits
+        in a cyclist. Packages that don't fit in any vehicle are left pending
+        in the grid, out of the heap.
+        """
+        while self.__farthest:
+            _, row = heappop(self.__farthest)
+            if row not in self.__grid:
+                # Already delivered as part of another batch.
+                continue
+            if self.__table.weight(row) > self.__max_weight:
+                continue
+            return row
+        return None
@@ -0,0 +1,265 @@
+"""
+This module contains the sharded mode to run a huge day across several
+processes. The plane is split into angular sectors around the depot balanced
+by number of packages and weight, the fleet is split in proportion, and every
+shard runs its own scheduler and headless engine in a worker process. The
+results and event logs of the shards are merged into a global one.
+"""
+
+import heapq
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+
+from engine import Engine, EventEngine, Result
+from eventlog import COMPLETE, DELIVERY, END, EventLog, read_log
+from loader import Input, to_deliveries
+from scheduler import load_scheduler_class
+
+
+# Statistics of a shard. The angles of its deliveries go from `start` to `end`
+# radians.
+ShardReport = namedtuple(
+    'ShardReport',
+    'shard start end deliveries packages weight drones cyclists ticks kms '
+    'completed seconds')
+
+
+def split_sectors(input_, n_shards):
+    """
+    Splits the deliveries of the given Input into angular sectors around the
+    depot with about the same share of the packages and of their weight.
+    Deliveries are never split.
+
+    Returns the indices of the deliveries of every sector, sorted by angle,
+    and the angles of the first and last delivery of every sector.
+    """
+    destinations = input_.destinations.astype(float)
+    angles = numpy.arctan2(destinations[:, 1], destinations[:, 0])
+    order = numpy.argsort(angles, kind='stable')
+    counts = numpy.diff(input_.offsets)
+    weights = numpy.bincount(
+        numpy.repeat(numpy.arange(len(counts)), counts),
+        weights=input_.weights[input_.packages], minlength=len(counts))
+    # Share of the packages plus share of the weight of every delivery.
+    loads = (counts / max(counts.sum(), 1) +
+             weights / max(weights.sum(), 1e-9))[order]
+    cumulative = numpy.cumsum(loads)
+    total = cumulative[-1] if len(cumulative) else 0
+    cuts = numpy.searchsorted(
+        cumulative, total * numpy.arange(1, n_shards) / n_shards)
+    sectors = numpy.split(order, cuts)
+    bounds = [
+        (float(angles[rows[0]]), float(angles[rows[-1]])) if len(rows)
+        else (numpy.nan, numpy.nan) for rows in sectors]
+    return sectors, bounds
+
+
+def split_fleet(n_vehicles, loads):
+    """
+    Splits the given number of vehicles in proportion to the given loads,
+    with at least one per load when there are enough vehicles.
+
+    Returns the number of vehicles for every load.
+    """
+    loads = numpy.asarray(loads, dtype=float)
+    minimum = 1 if n_vehicles >= len(loads) else 0
+    counts = numpy.full(len(loads), minimum)
+    spare = n_vehicles - counts.sum()
+    if not loads.sum():
+        loads = numpy.ones(len(loads))
+    shares = spare * loads / loads.sum()
+    counts += numpy.floor(shares).astype(int)
+    # Largest remainders first.
+    left = n_vehicles - counts.sum()
+    remainders = numpy.argsort(-(shares - numpy.floor(shares)), kind='stable')
+    counts[remainders[:left]] += 1
+    return counts.tolist()
+
+
+def limit_shards(n_shards, drones, cyclists):
+    """
+    Returns the number of shards up to the given one for which every shard
+    gets at least one cyclist, and at least one drone if there are drones,
+    so no shard is left with packages nobody can deliver. Without cyclists
+    there is a single shard.
+    """
+    if drones:
+        n_shards = min(n_shards, drones)
+    return max(min(n_shards, cyclists), 1)
+
+
+def select_deliveries(input_, rows):
+    """
+    Returns an Input with the deliveries in the given rows of the given one.
+    """
+    starts, ends = input_.offsets[rows], input_.offsets[rows + 1]
+    counts = ends - starts
+    offsets = numpy.zeros(len(rows) + 1, dtype=input_.offsets.dtype)
+    numpy.cumsum(counts, out=offsets[1:])
+    # Index of every package of the deliveries in the given Input.
+    packages = numpy.repeat(starts - offsets[:-1], counts) + numpy.arange(
+        offsets[-1])
+    return Input(
+        input_.products, input_.weights, input_.destinations[rows],
+        input_.packages[packages], offsets)
+
+
+def _run_shard(job):
+    """
+    Runs the scheduler and a headless engine for a shard in a worker process.
+
+    Returns the result of the shard and the seconds it took.
+    """
+    input_, drones, cyclists, scheduler_name, event_driven, log_path = job
+    start = time.perf_counter()
+    deliveries, weights = to_deliveries(input_)
+    scheduler = load_scheduler_class(scheduler_name)(deliveries, weights)
+    engine_class = EventEngine if event_driven else Engine
+    log = EventLog(log_path) if log_path else None
+    result = engine_class(
+        deliveries, drones, cyclists, scheduler, log=log).run()
+    if log is not None:
+        log.close()
+    return result, time.perf_counter() - start
+
+
+def run_sharded(input_, drones, cyclists, scheduler_name, n_shards,
+                processes=None, event_driven=True, log_path=None):
+    """
+    Runs the deliveries of the given Input split into `n_shards` sectors,
+    each one with its share of the given drones and cyclists and its own
+    instance of the scheduler, in up to `processes` worker processes. With a
+    `log_path` the event logs of the shards are merged into one there.
+
+    There are fewer shards if needed for every shard to have at least one
+    cyclist, and at least one drone if there are drones.
+
+    Returns the merged Result and the report of every shard.
+    """
+    n_shards = limit_shards(n_shards, len(drones), len(cyclists))
+    sectors, bounds = split_sectors(input_, n_shards)
+    shards = [select_deliveries(input_, rows) for rows in sectors]
+    packages = [len(shard.packages) for shard in shards]
+    weights = [float(shard.weights[shard.packages].sum()) for shard in shards]
+    total_packages, total_weight = max(sum(packages), 1), max(sum(weights), 1)
+    loads = [p / total_packages + w / total_weight
+             for p, w in zip(packages, weights)]
+    fleets = []
+    for vehicles in (drones, cyclists):
+        counts = numpy.cumsum([0] + split_fleet(len(vehicles), loads))
+        fleets.append([vehicles[a:b] for a, b in zip(counts, counts[1:])])
+    logs = [
+        '{}.shard{}'.format(log_path, k) if log_path else None
+        for k in range(n_shards)]
+    jobs = [
+        (shard, fleets[0][k], fleets[1][k], scheduler_name, event_driven,
+         logs[k])
+        for k, shard in enumerate(shards)]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        outcomes = list(executor.map(_run_shard, jobs))
+    reports = [
+        ShardReport(
+            k, bounds[k][0], bounds[k][1], len(shards[k].offsets) - 1,
+            packages[k], weights[k], len(fleets[0][k]), len(fleets[1][k]),
+            result.ticks, result.kms, result.completed, seconds)
+        for k, (result, seconds) in enumerate(outcomes)]
+    results = [result for result, _ in outcomes]
+    if log_path:
+        merge_logs(logs, log_path)
+        for path in logs:
+            os.remove(path)
+    return merge_results(results), reports
+
+
+def merge_results(results):
+    """
+    Merges the results of the shards into a global one. The day lasts until
+    the last shard finishes and the drones of all the shards are listed
+    before the cyclists.
+    """
+    vehicles = [
+        vehicle for type_ in ('drone', 'cyclist') for result in results
+        for vehicle in result.vehicles if vehicle.type == type_]
+    return Result(
+        max((result.ticks for result in results), default=0),
+        sum(result.kms for result in results),
+        all(result.completed for result in results), vehicles)
+
+
+def merge_logs(paths, path):
+    """
+    Merges the event logs of the shards with the given paths into one with
+    the given path, ordered by tick. Vehicles and deliveries are numbered
+    again across the shards, in the order of the shards.
+
+    The merged log can be scored, but not replayed, as the shards were
+    dispatched independently.
+    """
+    headers, streams = [], []
+    for shard_path in paths:
+        header, events = read_log(shard_path)
+        headers.append(header)
+        streams.append(events)
+    offsets = [
+        numpy.cumsum([0] + [len(header[fleet]) for header in headers]).tolist()
+        for fleet in ('drones', 'cyclists')]
+    # Global id of the deliveries of every shard, given as they are added.
+    ids = [[] for _ in paths]
+    next_id = 0
+    ends = [None] * len(paths)
+    with EventLog(path) as log:
+        log.begin(
+            [id_ for header in headers for id_ in header['drones']],
+            [id_ for header in headers for id_ in header['cyclists']],
+            headers[0]['scheduler'] if headers else '')
+        merged = heapq.merge(*(
+            _keyed(k, events) for k, events in enumerate(streams)),
+            key=lambda item: item[:2])
+        for _, k, event in merged:
+            kind = event[0]
+            if kind == END:
+                ends[k] = event
+                continue
+            if kind == DELIVERY:
+                ids[k].append(next_id)
+                next_id += 1
+            elif kind == COMPLETE:
+                event[2] = ids[k][event[2]]
+            else:
+                event[3] += offsets[event[2]][k]
+            log.record(event)
+        ends = [end for end in ends if end is not None]
+        log.end(
+            max((end[1] for end in ends), default=0),
+            sum(end[2] for end in ends),
+            len(ends) == len(paths) and all(end[3] for end in ends),
+            [kms for end in ends for kms in end[4]],
+            [kms for end in ends for kms in end[5]])
+
+
+def _keyed(shard, events):
+    """
+    Returns the given events of a shard as triples of tick, shard and event.
+    """
+    for event in events:
+        yield event[1], shard, event
+
+
+def describe_imbalance(reports):
+    """
+    Returns the ratio of the maximum to the mean of the load, the ticks and
+    the seconds of the shards, 1 when they are perfectly balanced.
+    """
+    imbalance = {}
+    for name, values in (
+            ('packages', [report.packages for report in reports]),
+            ('weight', [report.weight for report in reports]),
+            ('ticks', [report.ticks for report in reports]),
+            ('seconds', [report.seconds for report in reports])):
+        mean = sum(values) / len(values) if values else 0
+        imbalance[name] = max(values) / mean if mean else 1.0
+    return imbalance
@@ -1,14 +1,22 @@
 """
 This module contains a convenience class Simulation to test and visualize
 results with different combinations of number of drones, cyclists and specific
-schedulers.
+schedulers. The world itself is advanced by the headless `Engine`, this class
+only draws it.
+
+Every kind of object is drawn with a single artist updated in place, and the
+trails keep a fixed number of past positions, so the cost of a frame doesn't
+grow with the length of the run and frames are blitted.
 """
 
-from collections import Counter
+import os
 
 import numpy
 from matplotlib import animation
 from matplotlib import pyplot
+from matplotlib.colors import to_rgba
+
+from engine import Engine
 
 
 # Drawing context.
@@ -16,6 +24,11 @@ FIGURE_SIZE = (480, 480)
 MAX_AXIS = 20
 FRAME_DELAY = 10  # Delay between frames in milliseconds.
 
+# Exported videos.
+EXPORT_FPS = 20
+EXPORT_EVERY = 10  # Ticks per exported frame.
+PILLOW_FORMATS = ('.gif', '.webp', '.png')
+
 # Object drawing.
 DRONE_MARKER = 'X'
 DRONE_COLOR = 'royalblue'
@@ -24,14 +37,14 @@ CYCLIST_MARKER = 'o'
 CYCLIST_COLOR = 'orange'
 CYCLIST_TRAIL_COLOR = 'gold'
 TRAIL_MARKER = '.'
+TRAIL_SIZE = 36  # Area in points^2, as a '.' marker of size 6.
+TRAIL_LENGTH = 100  # Ticks of past positions drawn.
+DEPOT_MARKER = '^'
+DEPOT_COLOR = 'k'
 DELIVERY_MARKER = 's'
 PENDING_DELIVERY_COLOR = 'r'
 DONE_DELIVERY_COLOR = 'lime'
 
-# Point comparison.
-RELATIVE_TOLERANCE = 0
-ABSOLUTE_TOLERANCE = 0.5
-
 
 class Simulation(object):
     """
@@ -42,62 +55,86 @@ class Simulation(object):
     perform all deliveries.
     """
 
-    def __init__(self, deliveries, drones, cyclists, scheduler):
-        """
-        Constructs the simulation.
-        """
-        self.__deliveries, self.__delivered = self.__create_deliveries(
-            deliveries)
-        self.__drones = self.__create_vehicles_array(drones)
-        self.__cyclists = self.__create_vehicles_array(cyclists)
-        self.__routes = {}
-        self.__scheduler = scheduler
-        self.__deliveries_scatter = {}
+    def __init__(self, deliveries, drones, cyclists, scheduler, arrivals=(),
+                 profiler=None):
+        """
+        Constructs the simulation. Deliveries arriving during the day are
+        given in `arrivals` as pairs of tick and delivery sorted by tick. A
+        `Profiler` given in `profiler` also records the drawing phases of
+        every frame.
+        """
+        self.__engine = Engine(
+            deliveries, drones, cyclists, scheduler, arrivals, profiler)
+        # Color of every delivery in the deliveries scatter, by its id.
+        self.__deliveries_colors = numpy.zeros((0, 4))
+        self.__deliveries_scatter = None
         self.__drones_scatter = None
         self.__cyclists_scatter = None
-        self.__tick = 0
-        self.__time = '0h 0s'
-        self.__total_kms = 0
+        self.__trails = ()
         self.__hud = None
 
-    @staticmethod
-    def __create_deliveries(deliveries):
+    @property
+    def engine(self):
         """
-        Creates needed structures to track state of deliveries.
+        Returns the engine advancing the world.
         """
-        counted_deliveries, counted_delivered = {}, {}
-        for delivery in deliveries:
-            counted_deliveries[delivery.destination] = Counter(
-                delivery.packages)
-            counted_delivered[delivery.destination] = Counter()
-        return counted_deliveries, counted_delivered
+        return self.__engine
 
-    @staticmethod
-    def __create_vehicles_array(vehicles):
-        """
-        Creates a numpy array with data about the given vehicles to simulate
-        their behaviour.
+    def start(self, output=None, every=None, fps=None):
         """
-        array = numpy.zeros(
-            len(vehicles), dtype=[
-                ('position', float, 2),
-                ('destination', float, 2),
-                ('delta', float, 2),
-                ('id', str, 6),
-            ]
-        )
-        array['id'] = vehicles
-        return array
+        Starts the simulation. With an `output` path the simulation is not
+        shown but rendered offscreen as fast as possible, drawing a frame
+        every `every` ticks until the engine stops, and saved as a video with
+        `fps` frames per second, EXPORT_EVERY and EXPORT_FPS if not given.
+        GIFs are written with Pillow and other formats need ffmpeg.
 
-    def start(self):
-        """
-        Starts the simulation.
-        """
+        Raises ValueError if `every` or `fps` are not positive.
+        """
+        every = EXPORT_EVERY if every is None else every
+        fps = EXPORT_FPS if fps is None else fps
+        if every < 1 or fps < 1:
+            raise ValueError(
+                'There has to be at least one tick per frame and one frame '
+                'per second')
+        if output is not None:
+            self.__export(output, every, fps)
+            return
         ani = animation.FuncAnimation(
             pyplot.gcf(), self.__update, init_func=self.__init_func,
-            interval=FRAME_DELAY)
+            interval=FRAME_DELAY, blit=True, cache_frame_data=False)
         pyplot.show()
 
+    def __export(self, output, every, fps):
+        """
+        Renders the simulation with the Agg backend and saves it to the given
+        path.
+        """
+        writer = self.__create_writer(output, fps)
+        pyplot.switch_backend('agg')
+        self.__init_func()
+        figure = pyplot.gcf()
+        with writer.saving(figure, output, figure.get_dpi()):
+            writer.grab_frame()
+            while self.__engine.is_active:
+                self.__update(None, every)
+                writer.grab_frame()
+
+    @staticmethod
+    def __create_writer(output, fps):
+        """
+        Returns the writer for the format of the given path.
+
+        Raises ValueError if the format needs ffmpeg and it is not available.
+        """
+        extension = os.path.splitext(output)[1].lower()
+        if extension in PILLOW_FORMATS:
+            return animation.PillowWriter(fps=fps)
+        if not animation.writers.is_available('ffmpeg'):
+            raise ValueError(
+                'Writing {} files needs ffmpeg, which was not found. Export a '
+                '.gif instead'.format(extension or 'extensionless'))
+        return animation.FFMpegWriter(fps=fps)
+
     def __init_func(self):
         """
         Initializes the first frame of the simulation.
@@ -106,37 +143,65 @@ class Simulation(object):
         dpi = figure.get_dpi()
         figure.set_size_inches(
             FIGURE_SIZE[0]/float(dpi), FIGURE_SIZE[1]/float(dpi))
-        figure.canvas.set_window_title('Simulation')
+        figure.canvas.manager.set_window_title('Simulation')
         title = '{} drones, {} cyclists and {}'.format(
-            len(self.__drones), len(self.__cyclists), self.__scheduler.name)
+            len(self.__engine.drones), len(self.__engine.cyclists),
+            self.__engine.scheduler.name)
         pyplot.suptitle(title, fontweight='bold')
         pyplot.axis((-MAX_AXIS, MAX_AXIS, -MAX_AXIS, MAX_AXIS))
         pyplot.grid(zorder=0)
+        depots = numpy.array(self.__engine.depots, dtype=float)
+        pyplot.scatter(
+            depots[:, 0], depots[:, 1], marker=DEPOT_MARKER, s=80,
+            color=DEPOT_COLOR, zorder=5)
+        self.__deliveries_scatter = pyplot.scatter(
+            numpy.zeros(0), numpy.zeros(0), marker=DELIVERY_MARKER,
+            edgecolors='k', zorder=20)
         self.__initialize_deliveries()
         self.__initialize_vehicles()
         self.__initialize_hud()
+        return self.__artists
 
-    def __initialize_deliveries(self):
+    @property
+    def __artists(self):
         """
-        Initializes a point scatter per delivery to show their state.
+        Returns the artists redrawn in every frame.
         """
-        for destination in self.__deliveries.keys():
-            x, y = destination
-            self.__deliveries_scatter[destination] = pyplot.scatter(
-                (x, ), (y, ), marker=DELIVERY_MARKER,
-                color='k', facecolors=PENDING_DELIVERY_COLOR, zorder=20)
+        return (
+            (self.__deliveries_scatter, self.__drones_scatter,
+             self.__cyclists_scatter, self.__hud) +
+            tuple(trail.scatter for trail in self.__trails))
+
+    def __initialize_deliveries(self):
+        """
+        Adds the destinations of the deliveries to the deliveries scatter to
+        show their state. It is also called to draw the deliveries that
+        arrived since the last frame.
+        """
+        destinations = self.__engine.destinations
+        colors = numpy.tile(
+            to_rgba(PENDING_DELIVERY_COLOR),
+            (len(destinations) - len(self.__deliveries_colors), 1))
+        self.__deliveries_colors = numpy.concatenate(
+            (self.__deliveries_colors, colors))
+        self.__deliveries_scatter.set_offsets(
+            numpy.array(destinations, dtype=float).reshape(-1, 2))
+        self.__deliveries_scatter.set_facecolors(self.__deliveries_colors)
 
     def __initialize_vehicles(self):
         """
         Initializes a point scatter per vehicle type.
         """
         self.__drones_scatter = self.__create_vehicles_scatter(
-            self.__drones, DRONE_MARKER, DRONE_COLOR, 40)
+            self.__engine.drones, DRONE_MARKER, DRONE_COLOR, 40)
         self.__cyclists_scatter = self.__create_vehicles_scatter(
-            self.__cyclists, CYCLIST_MARKER, CYCLIST_COLOR, 30)
+            self.__engine.cyclists, CYCLIST_MARKER, CYCLIST_COLOR, 30)
         pyplot.legend(
             (self.__drones_scatter, self.__cyclists_scatter),
             ('Drones', 'Cyclists'))
+        self.__trails = (
+            Trail(len(self.__engine.drones), DRONE_TRAIL_COLOR),
+            Trail(len(self.__engine.cyclists), CYCLIST_TRAIL_COLOR))
 
     @staticmethod
     def __create_vehicles_scatter(vehicles, marker, color, zorder):
@@ -144,10 +209,9 @@ class Simulation(object):
         Initializes a point scatter to draw a specific type of vehicles with
         the given characteristics.
         """
-        n = len(vehicles)
         scatter = pyplot.scatter(
-            numpy.zeros(n), numpy.zeros(n), marker=marker, color=color,
-            zorder=zorder)
+            vehicles['position'][:, 0], vehicles['position'][:, 1],
+            marker=marker, color=color, zorder=zorder)
         return scatter
 
     def __initialize_hud(self):
@@ -158,166 +222,89 @@ class Simulation(object):
             MAX_AXIS - 9, 2 - MAX_AXIS, '0 ticks\n0 kms',
             bbox=dict(facecolor='white'))
 
-    def __update(self, frame):
-        """
-        Update function called in every tick to update the 'world'.
-        """
-        self.__update_hud(frame)
-        self.__update_vehicles()
-        self.__plot_vehicles()
+    def __update(self, frame, ticks=1):
+        """
+        Update function called in every frame to advance and draw the 'world'.
+        The world is advanced the given number of ticks, or until the engine
+        stops.
+        """
+        profiler = self.__engine.profiler
+        completed = []
+        with profiler.phase('step'):
+            for _ in range(ticks):
+                completed.extend(self.__engine.step())
+                if not self.__engine.is_active:
+                    break
+        with profiler.phase('hud'):
+            self.__update_hud()
+        with profiler.phase('deliveries'):
+            self.__update_deliveries(completed)
+        with profiler.phase('plot'):
+            self.__plot_vehicles()
+        return self.__artists
 
-    def __update_hud(self, frame):
+    def __update_hud(self):
         """
         Updates the extra information displayed on top of the graph.
         This includes the current tick, the elapsed time and the tolal kms.
         """
-        if self.__deliveries != self.__delivered:
-            self.__tick = frame
-            # Each tick is 2 minutes.
-            minutes = self.__tick * 2
-            self.__time = '{}h {}m'.format(int(minutes / 60), minutes % 60)
+        tick = self.__engine.tick
+        # Each tick is 2 minutes.
+        minutes = tick * 2
+        time = '{}h {}m'.format(int(minutes / 60), minutes % 60)
         text = 'Tick:  {}\nTime: {}\nKms:  {}'.format(
-            self.__tick, self.__time, self.__total_kms)
+            tick, time, self.__engine.total_kms)
         self.__hud.set_text(text)
 
-    def __update_vehicles(self):
-        """
-        Updates all vehicles in the fleet.
-        """
-        self.__update_drones()
-        self.__update_cyclists()
-
-    def __update_drones(self):
-        """
-        Updates drones.
-
-        There are three possible situations:
-        - The drone is at the depot, hence it requests a new route.
-        - The drones has arrived at its detination, hence it comes back to
-        depot.
-        - The drone is flying.
-        """
-        for drone in numpy.nditer(
-                self.__drones, flags=['zerosize_ok'], op_flags=['readwrite']):
-            id_ = str(drone['id'])
-            if self.__vehicle_is_at_depot(drone):
-                route = self.__scheduler.get_route_for_drone()
-                if route:
-                    #print('Drone {} got route: {}'.format(id_, route))
-                    self.__routes[id_] = route
-                    destination, _ = route[0]
-                    drone['destination'] = destination
-                    length = numpy.sqrt((drone['destination'] ** 2).sum())
-                    # Drones move at a speed of 1km/tick (1km/2minutes)
-                    drone['delta'] = drone['destination'] / length
-            elif self.__vehicle_is_at_destination(drone):
-                destination, packages = self.__routes[id_].pop()
-                self.__deliver_packages(id_, 'drone', destination, packages)
-                drone['destination'] = numpy.zeros(2)
-                drone['delta'] = -drone['delta']
-            else:
-                drone['position'] += drone['delta']
-                self.__total_kms += 1
-
-    def __update_cyclists(self):
-        """
-        Updates cyclists.
-
-        There are three possible situations:
-        - The cyclist is at the depot, hence it requests a new route.
-        - The cyclist has arrived at its detination, hence it heads to the new
-        destination in the route.
-        - The cyclist is cycling.
-        """
-        for cyclist in numpy.nditer(
-                self.__cyclists, flags=['zerosize_ok'],
-                op_flags=['readwrite']):
-            id_ = str(cyclist['id'])
-            if self.__vehicle_is_at_depot(cyclist):
-                route = self.__scheduler.get_route_for_cyclist()
-                if route:
-                    #print('Cyclist {} got route: {}'.format(id_, route))
-                    self.__routes[id_] = route
-                    destination, _ = route[0]
-                    cyclist['destination'] = destination
-            elif self.__vehicle_is_at_destination(cyclist):
-                route = self.__routes[id_]
-                destination, packages = route.popleft()
-                self.__deliver_packages(id_, 'cyclist', destination, packages)
-                if route:
-                    destination, _ = route[0]
-                    cyclist['destination'] = destination
-                else:
-                    cyclist['destination'] = numpy.zeros(2)
-            else:
-                # Cyclists move at a speed of 0.5km/tick (0.5km/2minutes)
-                self.__update_cyclist_delta(cyclist)
-                cyclist['position'] += cyclist['delta']
-                self.__total_kms += 0.5
-
-    @staticmethod
-    def __update_cyclist_delta(cyclist):
+    def __update_deliveries(self, completed):
         """
-        Updating the given cyclist delta according to its current position and
-        destination.
+        Draws the new deliveries and marks the deliveries with the given ids
+        as delivered.
         """
-        aim = cyclist['destination'] - cyclist['position']
-        if abs(aim[0]) > abs(aim[1]):
-            x = 0.5 * numpy.sign(aim[0])
-            cyclist['delta'] = numpy.array((x, 0))
-        else:
-            y = 0.5 * numpy.sign(aim[1])
-            cyclist['delta'] = numpy.array((0, y))
+        if len(self.__engine.destinations) > len(self.__deliveries_colors):
+            self.__initialize_deliveries()
+        if completed:
+            self.__deliveries_colors[completed] = to_rgba(DONE_DELIVERY_COLOR)
+            self.__deliveries_scatter.set_facecolors(
+                self.__deliveries_colors)
 
-    @staticmethod
-    def __vehicle_is_at_depot(vehicle):
+    def __plot_vehicles(self):
         """
-        Returns whether the given vehicle is at the depot.
+        Draws the vehicles in the graph.
         """
-        return (
-            Simulation.__are_close(vehicle['destination'], numpy.zeros(2)) and
-            Simulation.__are_close(vehicle['position'], numpy.zeros(2)))
+        drones, cyclists = self.__engine.drones, self.__engine.cyclists
+        self.__drones_scatter.set_offsets(drones['position'])
+        self.__cyclists_scatter.set_offsets(cyclists['position'])
+        for trail, vehicles in zip(self.__trails, (drones, cyclists)):
+            trail.append(vehicles['position'])
 
-    @staticmethod
-    def __vehicle_is_at_destination(vehicle):
-        """
-        Returns whether the given vehicle is at its destination.
-        """
-        return Simulation.__are_close(
-            vehicle['position'], vehicle['destination'])
 
-    @staticmethod
-    def __are_close(array1, array2):
-        """
-        Returns if two points are close to each other.
-        """
-        return numpy.allclose(
-            array1, array2, rtol=RELATIVE_TOLERANCE, atol=ABSOLUTE_TOLERANCE)
+class Trail(object):
+    """
+    Trail of the last positions of a fleet, drawn as a single scatter. The
+    positions of the last `capacity` ticks are kept in a ring buffer, so
+    memory and drawing time stay the same however long the run is.
+    """
+
+    def __init__(self, n_vehicles, color, capacity=TRAIL_LENGTH):
+        # Unused slots are NaN, which are not drawn.
+        self.__positions = numpy.full((capacity, n_vehicles, 2), numpy.nan)
+        self.__next = 0
+        self.__scatter = pyplot.scatter(
+            numpy.zeros(0), numpy.zeros(0), marker=TRAIL_MARKER,
+            s=TRAIL_SIZE, color=color, zorder=10)
 
-    def __deliver_packages(self, id_, type_, destination, packages):
+    @property
+    def scatter(self):
         """
-        The vehicle with the id `id_` has delivered the given packages to the
-        given destination.
+        Returns the scatter drawing the trail.
         """
-        #print('{} {} delivered to {} packages: {}'.format(
-        #    type_.capitalize(), id_, destination, packages))
-        self.__delivered[destination].update(packages)
-        if self.__delivered[destination] == self.__deliveries[destination]:
-            self.__deliveries_scatter[destination].set_facecolor(
-                DONE_DELIVERY_COLOR)
+        return self.__scatter
 
-    def __plot_vehicles(self):
+    def append(self, positions):
         """
-        Draws the vehicles in the graph.
+        Adds the given positions of the fleet, replacing the oldest ones.
         """
-        self.__drones_scatter.set_offsets(self.__drones['position'])
-        self.__cyclists_scatter.set_offsets(self.__cyclists['position'])
-        trail = (
-            (self.__drones, DRONE_TRAIL_COLOR),
-            (self.__cyclists, CYCLIST_TRAIL_COLOR))
-        for vehicles, color in trail:
-            x = vehicles['position'][:, 0]
-            y = vehicles['position'][:, 1]
-            pyplot.plot(
-                x, y, marker=TRAIL_MARKER, linestyle='', color=color,
-                zorder=10)
+        self.__positions[self.__next] = positions
+        self.__next = (self.__next + 1) % len(self.__positions)
+        self.__scatter.set_offsets(self.__positions.reshape(-1, 2))
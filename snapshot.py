@@ -0,0 +1,198 @@
+"""
+This module contains a binary snapshot format for the input loaded by
+`loader`, so the same input can be loaded again without parsing it. Snapshots
+are memory-mapped and their arrays are used in place.
+
+A snapshot is a magic string, the length of a JSON header, the header and the
+arrays, each one aligned to 64 bytes. The header has the version of the format,
+the checksum of the text it was built from and the dtype, shape and offset of
+every array.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+import numpy
+
+from loader import Input, load_input
+
+
+MAGIC = b'DLVSNAP\0'
+VERSION = 1
+ALIGNMENT = 64
+SUFFIX = '.snapshot'
+
+# Header length after the magic string.
+LENGTH = struct.Struct('<I')
+
+
+def calculate_checksum(path):
+    """
+    Returns the checksum of the contents of the file with the given path.
+    """
+    checksum = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as file_:
+        for chunk in iter(lambda: file_.read(1 << 20), b''):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+def write_snapshot(input_, path, checksum=''):
+    """
+    Writes the given Input to a snapshot with the given path. `checksum` is
+    the checksum of the text it was loaded from.
+    """
+    arrays = [numpy.ascontiguousarray(array) for array in input_]
+    writer = SnapshotWriter(path, Input(*(
+        (array.dtype, array.shape) for array in arrays)), checksum)
+    for name, array in zip(Input._fields, arrays):
+        writer.array(name)[...] = array
+    writer.close()
+
+
+class SnapshotWriter(object):
+    """
+    Writer of a snapshot whose arrays are filled in place, so they can be
+    written by chunks without holding them in memory. The file is written
+    aside and renamed when closed, so a snapshot is never seen half written.
+    """
+
+    def __init__(self, path, layout, checksum=''):
+        """
+        Creates the snapshot with the given path. `layout` is an Input with
+        the dtype and the shape of every array.
+        """
+        self.__path = path
+        self.__temporary = '{}.{}.tmp'.format(path, os.getpid())
+        self.__arrays = {}
+        offset = 0
+        for name, (dtype, shape) in zip(Input._fields, layout):
+            dtype = numpy.dtype(dtype)
+            self.__arrays[name] = {
+                'dtype': dtype.str, 'shape': tuple(shape), 'offset': offset}
+            offset = _align(offset + dtype.itemsize * int(numpy.prod(shape)))
+        header = json.dumps({
+            'version': VERSION, 'checksum': checksum,
+            'arrays': self.__arrays,
+        }).encode()
+        self.__start = _align(len(MAGIC) + LENGTH.size + len(header))
+        with open(self.__temporary, 'wb') as file_:
+            file_.write(MAGIC)
+            file_.write(LENGTH.pack(len(header)))
+            file_.write(header)
+            file_.truncate(self.__start + offset)
+        with open(self.__temporary, 'r+b') as file_:
+            # Empty snapshots can't be mapped, but there is nothing to fill.
+            self.__buffer = mmap.mmap(file_.fileno(), 0) if offset else None
+
+    def array(self, name):
+        """
+        Returns a writable view of the array with the given name.
+        """
+        fields = self.__arrays[name]
+        dtype = numpy.dtype(fields['dtype'])
+        count = int(numpy.prod(fields['shape']))
+        if not count:
+            return numpy.zeros(fields['shape'], dtype=dtype)
+        return numpy.frombuffer(
+            self.__buffer, dtype=dtype, count=count,
+            offset=self.__start + fields['offset']).reshape(fields['shape'])
+
+    def close(self):
+        """
+        Flushes the arrays and puts the snapshot in its place. Views of the
+        arrays must not be used anymore.
+        """
+        if self.__buffer is not None:
+            self.__buffer.flush()
+        os.replace(self.__temporary, self.__path)
+
+
+def read_snapshot(path):
+    """
+    Reads the snapshot with the given path, memory-mapping it.
+
+    Returns the checksum of the text it was built from and the Input, whose
+    arrays are read-only views of the map. Raises ValueError if the file is
+    not a snapshot of this version.
+    """
+    with open(path, 'rb') as file_:
+        if os.fstat(file_.fileno()).st_size < len(MAGIC) + LENGTH.size:
+            raise ValueError('Not a snapshot: {}'.format(path))
+        buffer = mmap.mmap(file_.fileno(), 0, access=mmap.ACCESS_READ)
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError('Not a snapshot: {}'.format(path))
+    length, = LENGTH.unpack_from(buffer, len(MAGIC))
+    end = len(MAGIC) + LENGTH.size + length
+    try:
+        header = json.loads(bytes(buffer[len(MAGIC) + LENGTH.size:end]))
+    except ValueError:
+        raise ValueError('Corrupt snapshot header: {}'.format(path))
+    if header.get('version') != VERSION:
+        raise ValueError('Snapshot version {} is not {}: {}'.format(
+            header.get('version'), VERSION, path))
+    start = _align(end)
+    arrays = []
+    for name in Input._fields:
+        fields = header['arrays'][name]
+        dtype = numpy.dtype(fields['dtype'])
+        shape = tuple(fields['shape'])
+        count = int(numpy.prod(shape))
+        offset = start + fields['offset']
+        if offset + count * dtype.itemsize > len(buffer):
+            raise ValueError('Truncated snapshot: {}'.format(path))
+        arrays.append(numpy.frombuffer(
+            buffer, dtype=dtype, count=count, offset=offset).reshape(shape))
+    return header['checksum'], Input(*arrays)
+
+
+def is_snapshot(path):
+    """
+    Returns whether the file with the given path is a snapshot.
+    """
+    with open(path, 'rb') as file_:
+        return file_.read(len(MAGIC)) == MAGIC
+
+
+def load_cached(path, snapshot_path=None):
+    """
+    Loads the input in the text file with the given path through a snapshot,
+    `path` plus '.snapshot' by default. The snapshot is built when it doesn't
+    exist and built again when it is stale or from another version.
+
+    Returns the Input, memory-mapped from the snapshot.
+    """
+    snapshot_path = snapshot_path or path + SUFFIX
+    checksum = calculate_checksum(path)
+    try:
+        cached_checksum, input_ = read_snapshot(snapshot_path)
+        if cached_checksum == checksum:
+            return input_
+    except (OSError, ValueError, KeyError):
+        pass
+    write_snapshot(load_input(path), snapshot_path, checksum)
+    _, input_ = read_snapshot(snapshot_path)
+    return input_
+
+
+def load_file(path):
+    """
+    Loads the input in the file with the given path, either a snapshot or a
+    text file loaded through its snapshot.
+
+    Returns the Input.
+    """
+    if is_snapshot(path):
+        _, input_ = read_snapshot(path)
+        return input_
+    return load_cached(path)
+
+
+def _align(offset):
+    """
+    Rounds the given offset up to the alignment of the arrays.
+    """
+    return -(-offset // ALIGNMENT) * ALIGNMENT
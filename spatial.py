@@ -0,0 +1,237 @@
+"""
+This module contains a spatial index to look up the points closest to a given
+one, supporting insertions and removals, and an approximate lookup of the
+nearest neighbours of many points at once.
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from heapq import heappop, heappush
+from math import floor, sqrt
+
+import numpy
+
+
+# Shifted Z-order curves the neighbours are looked up in, and positions looked
+# at on each side of every point along every curve.
+CURVES = 4
+WINDOW = 6
+# Points whose candidate neighbours are compared at once.
+CHUNK_SIZE = 1 << 14
+# Cells of the Z-order curve per axis.
+CURVE_CELLS = 1 << 16
+
+
+class Grid(object):
+    """
+    Uniform grid over the plane. Every cell keeps the ids of the items inside
+    it, so finding the nearest items only visits the cells around the query
+    point, in rings of increasing size. The occupied cells are also indexed
+    by row, so a ring only looks at the rows and columns with items, and the
+    rings without any are skipped at once.
+    """
+
+    def __init__(self, cell_size=1):
+        """
+        Constructs an empty grid with square cells of the given size.
+        """
+        self.__cell_size = cell_size
+        self.__cells = {}
+        self.__points = {}
+        # Sorted columns of the occupied cells of every row with any, and the
+        # sorted rows.
+        self.__rows = {}
+        self.__row_keys = []
+
+    def __len__(self):
+        return len(self.__points)
+
+    def __contains__(self, id_):
+        return id_ in self.__points
+
+    def insert(self, id_, point):
+        """
+        Inserts the item with the given id at the given point.
+        """
+        cell = self.__cell(point)
+        items = self.__cells.get(cell)
+        if items is None:
+            items = self.__cells[cell] = set()
+            cx, cy = cell
+            columns = self.__rows.get(cy)
+            if columns is None:
+                columns = self.__rows[cy] = []
+                insort(self.__row_keys, cy)
+            insort(columns, cx)
+        items.add(id_)
+        self.__points[id_] = point
+
+    def remove(self, id_):
+        """
+        Removes the item with the given id.
+        """
+        cell = self.__cell(self.__points.pop(id_))
+        items = self.__cells[cell]
+        items.remove(id_)
+        if items:
+            return
+        del self.__cells[cell]
+        cx, cy = cell
+        columns = self.__rows[cy]
+        del columns[bisect_left(columns, cx)]
+        if not columns:
+            del self.__rows[cy]
+            del self.__row_keys[bisect_left(self.__row_keys, cy)]
+
+    def nearest(self, point):
+        """
+        Yields the distance and the id of the items by increasing distance to
+        the given point. The grid must not change while iterating.
+        """
+        x, y = point
+        cx, cy = self.__cell(point)
+        candidates = []
+        ring = 0 if self.__points else None
+        while ring is not None:
+            found = False
+            for cell in self.__ring(cx, cy, ring):
+                found = True
+                for id_ in self.__cells[cell]:
+                    px, py = self.__points[id_]
+                    distance = sqrt((px - x) ** 2 + (py - y) ** 2)
+                    heappush(candidates, (distance, id_))
+            if found:
+                next_ring = ring + 1
+            else:
+                next_ring = self.__next_ring(cx, cy, ring)
+            if next_ring is None:
+                break
+            # All the items within this distance have been found already.
+            limit = (next_ring - 1) * self.__cell_size
+            while candidates and candidates[0][0] <= limit:
+                yield heappop(candidates)
+            ring = next_ring
+        while candidates:
+            yield heappop(candidates)
+
+    def __cell(self, point):
+        """
+        Returns the cell containing the given point.
+        """
+        return (floor(point[0] / self.__cell_size),
+                floor(point[1] / self.__cell_size))
+
+    def __ring(self, cx, cy, ring):
+        """
+        Yields the occupied cells at the given Chebyshev distance of the cell
+        (cx, cy).
+        """
+        keys = self.__row_keys
+        for y in keys[bisect_left(keys, cy - ring):
+                      bisect_right(keys, cy + ring)]:
+            if abs(y - cy) == ring:
+                # A whole side of the ring.
+                columns = self.__rows[y]
+                for x in columns[bisect_left(columns, cx - ring):
+                                 bisect_right(columns, cx + ring)]:
+                    yield x, y
+                continue
+            for x in (cx - ring, cx + ring):
+                if (x, y) in self.__cells:
+                    yield x, y
+
+    def __next_ring(self, cx, cy, ring):
+        """
+        Returns the first ring around the cell (cx, cy) after the given one
+        with any occupied cell, or None if there is none.
+        """
+        best = None
+        for y in self.__row_keys:
+            dy = abs(y - cy)
+            if best is not None and dy >= best:
+                continue
+            columns = self.__rows[y]
+            if dy > ring:
+                # Any column of the row is beyond the ring.
+                i = bisect_left(columns, cx)
+                dx = min(abs(columns[j] - cx)
+                         for j in (i - 1, i) if 0 <= j < len(columns))
+                distance = max(dy, dx)
+            else:
+                # Only the columns out of the ring.
+                left = bisect_left(columns, cx - ring) - 1
+                right = bisect_right(columns, cx + ring)
+                distances = []
+                if left >= 0:
+                    distances.append(cx - columns[left])
+                if right < len(columns):
+                    distances.append(columns[right] - cx)
+                if not distances:
+                    continue
+                distance = min(distances)
+            if best is None or distance < best:
+                best = distance
+        return best
+
+
+def nearest_neighbours(points, k, curves=CURVES, window=WINDOW):
+    """
+    Finds approximately the `k` nearest neighbours of every one of the given
+    points, without comparing every pair. The points are sorted along
+    `curves` Z-order curves over grids shifted by fixed offsets, and the
+    neighbours are the nearest among the `window` points on each side of
+    every point along every curve.
+
+    Returns an array with the indices of the neighbours of every point, -1
+    where there are fewer than `k` candidates.
+    """
+    points = numpy.asarray(points, dtype=float).reshape(-1, 2)
+    n = len(points)
+    k = min(k, 2 * curves * window)
+    neighbours = numpy.full((n, k), -1, dtype=numpy.intp)
+    if n < 2 or k < 1:
+        return neighbours
+    low = points.min(axis=0)
+    span = max(float((points.max(axis=0) - low).max()), 1.0)
+    shifts = numpy.random.default_rng(0).random((curves, 2)) * span
+    shifts[0] = 0
+    offsets = numpy.concatenate(
+        (numpy.arange(-window, 0), numpy.arange(1, window + 1)))
+    candidates = []
+    for shift in shifts:
+        cells = ((points - low + shift) * ((CURVE_CELLS - 1) / (2 * span))
+                 ).astype(numpy.uint64)
+        order = numpy.argsort(
+            _spread_bits(cells[:, 0]) | (_spread_bits(cells[:, 1]) << 1),
+            kind='stable')
+        ranks = numpy.empty(n, dtype=numpy.intp)
+        ranks[order] = numpy.arange(n)
+        candidates.append(order[numpy.clip(
+            ranks[:, numpy.newaxis] + offsets, 0, n - 1)])
+    candidates = numpy.sort(numpy.concatenate(candidates, axis=1), axis=1)
+    for start in range(0, n, CHUNK_SIZE):
+        chunk = candidates[start:start + CHUNK_SIZE]
+        rows = numpy.arange(start, start + len(chunk))[:, numpy.newaxis]
+        distances = ((points[chunk] - points[rows]) ** 2).sum(axis=2)
+        # A point is not its own neighbour, nor is any candidate twice.
+        repeated = numpy.zeros(chunk.shape, dtype=bool)
+        repeated[:, 1:] = chunk[:, 1:] == chunk[:, :-1]
+        distances[repeated | (chunk == rows)] = numpy.inf
+        nearest = numpy.argpartition(distances, k - 1, axis=1)[:, :k]
+        found = numpy.take_along_axis(chunk, nearest, axis=1)
+        found[numpy.isinf(
+            numpy.take_along_axis(distances, nearest, axis=1))] = -1
+        neighbours[start:start + CHUNK_SIZE] = found
+    return neighbours
+
+
+def _spread_bits(values):
+    """
+    Returns the given 16 bits values with a zero bit between every two bits,
+    to interleave the coordinates of a Z-order curve.
+    """
+    values = values & numpy.uint64(0xFFFF)
+    for shift, mask in ((8, 0x00FF00FF), (4, 0x0F0F0F0F), (2, 0x33333333),
+                        (1, 0x55555555)):
+        values = (values | (values << numpy.uint64(shift))) & numpy.uint64(
+            mask)
+    return values
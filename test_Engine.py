@@ -0,0 +1,245 @@
+"""
+This modules contains unit-tests for the Engine.
+"""
+
+import random
+from unittest import TestCase
+
+import numpy
+
+from engine import ABSOLUTE_TOLERANCE, Engine, EventEngine
+from scheduler import Delivery
+from scheduler3 import Scheduler3
+
+
+def step_one_by_one(vehicles, routes, get_routes, is_drone):
+    """
+    Advances the given vehicles one tick checking them one by one with
+    `numpy.allclose`, as the engine did before classifying the whole fleet
+    at once, as a reference. The vehicles at the depot get their routes from
+    one call to `get_routes`.
+
+    Returns the number of vehicles that moved.
+    """
+    at_depot = [
+        numpy.allclose(vehicle['destination'], 0, rtol=0,
+                       atol=ABSOLUTE_TOLERANCE) and
+        numpy.allclose(vehicle['position'], 0, rtol=0,
+                       atol=ABSOLUTE_TOLERANCE)
+        for vehicle in vehicles]
+    given = iter(get_routes(sum(at_depot)))
+    moved = 0
+    for i, vehicle in enumerate(numpy.nditer(
+            vehicles, flags=['zerosize_ok'], op_flags=['readwrite'])):
+        at_destination = numpy.allclose(
+            vehicle['position'], vehicle['destination'], rtol=0,
+            atol=ABSOLUTE_TOLERANCE)
+        if at_depot[i]:
+            route = next(given, None)
+            if route:
+                routes[i] = route
+                vehicle['destination'] = route[0][0]
+                if is_drone:
+                    length = numpy.sqrt((vehicle['destination'] ** 2).sum())
+                    vehicle['delta'] = vehicle['destination'] / length
+        elif at_destination:
+            if is_drone:
+                routes[i].pop()
+                vehicle['destination'] = 0
+                vehicle['delta'] = -vehicle['delta']
+            else:
+                routes[i].popleft()
+                vehicle['destination'] = routes[i][0][0] if routes[i] else 0
+        else:
+            if not is_drone:
+                aim = vehicle['destination'] - vehicle['position']
+                horizontal = abs(aim[0]) > abs(aim[1])
+                vehicle['delta'] = (
+                    (0.5 * numpy.sign(aim[0]), 0) if horizontal else
+                    (0, 0.5 * numpy.sign(aim[1])))
+            vehicle['position'] += vehicle['delta']
+            moved += 1
+    return moved
+
+
+class TestEngine(TestCase):
+    """
+    Tests for the Engine
+    """
+
+    def test_run_drone_delivery(self):
+        """
+        A drone flies to the destination and back at 1 km/tick.
+        """
+        deliveries = (
+            Delivery(('product0', ), (3, 0)),
+        )
+        weights = {'product0': 2}
+        engine = Engine(
+            deliveries, ['D0'], [], Scheduler3(deliveries, weights))
+        result = engine.run()
+        self.assertTrue(result.completed)
+        self.assertEqual(result.ticks, 4)
+        self.assertEqual(result.kms, 6)
+
+    def test_run_cyclist_delivery(self):
+        """
+        A cyclist rides to the destination and back at 0.5 km/tick moving
+        along one axis at a time until it is within 0.5 km.
+        """
+        deliveries = (
+            Delivery(('product0', ), (2, 1)),
+        )
+        weights = {'product0': 10}
+        engine = Engine(
+            deliveries, [], ['C0'], Scheduler3(deliveries, weights))
+        result = engine.run()
+        self.assertTrue(result.completed)
+        self.assertEqual(result.ticks, 5)
+        self.assertEqual(result.kms, 3)
+
+    def test_run_vehicle_stats(self):
+        """
+        Per-vehicle stats are given for every vehicle in the fleet.
+        """
+        deliveries = (
+            Delivery(('product0', 'product1'), (2, 0)),
+        )
+        weights = {'product0': 2, 'product1': 10}
+        engine = Engine(
+            deliveries, ['D0'], ['C0'], Scheduler3(deliveries, weights))
+        result = engine.run()
+        drone, cyclist = result.vehicles
+        self.assertEqual(
+            (drone.id, drone.type, drone.kms, drone.routes, drone.packages),
+            ('D0', 'drone', 4, 1, 1))
+        self.assertEqual(
+            (cyclist.id, cyclist.type, cyclist.kms, cyclist.routes,
+             cyclist.packages),
+            ('C0', 'cyclist', 2.5, 1, 1))
+        self.assertEqual(result.kms, 6.5)
+
+    def test_run_stops_when_stuck(self):
+        """
+        The engine stops when nothing else can be delivered.
+        """
+        deliveries = (
+            Delivery(('product0', ), (2, 0)),
+        )
+        weights = {'product0': 60}
+        engine = Engine(
+            deliveries, ['D0'], ['C0'], Scheduler3(deliveries, weights))
+        result = engine.run()
+        self.assertFalse(result.completed)
+        self.assertEqual(result.kms, 0)
+
+    def test_event_engine_same_result_as_tick_loop(self):
+        """
+        The event-driven engine gives the same ticks and kms as the tick loop.
+        """
+        deliveries = (
+            Delivery(('product0', 'product1', 'product2'), (5, 4)),
+            Delivery(('product3', ), (15, 9)),
+            Delivery(('product4', ), (6, 7)),
+            Delivery(('product5', 'product6'), (-7, 3)),
+            Delivery(('product7', ), (-2, -11)),
+        )
+        weights = {
+            'product0': 3.5, 'product1': 4.5, 'product2': 8.2, 'product3': 5,
+            'product4': 43, 'product5': 1, 'product6': 20, 'product7': 2
+        }
+        for drones, cyclists in ((1, 1), (0, 2), (2, 0), (3, 2)):
+            drones = ['D{}'.format(i) for i in range(drones)]
+            cyclists = ['C{}'.format(i) for i in range(cyclists)]
+            expected = Engine(
+                deliveries, drones, cyclists,
+                Scheduler3(deliveries, weights)).run()
+            result = EventEngine(
+                deliveries, drones, cyclists,
+                Scheduler3(deliveries, weights)).run()
+            self.assertEqual(result, expected)
+
+    def test_run_deliveries_arriving_later(self):
+        """
+        Deliveries arriving during the day are delivered from the tick they
+        arrive, by both engines.
+        """
+        weights = {'product0': 2, 'product1': 10}
+        arrivals = (
+            (10, Delivery(('product0', ), (3, 0))),
+            (12, Delivery(('product1', ), (2, 1))),
+        )
+        for engine_class in (Engine, EventEngine):
+            engine = engine_class(
+                (), ['D0'], ['C0'], Scheduler3((), weights), arrivals)
+            result = engine.run()
+            self.assertTrue(result.completed)
+            self.assertEqual(result.ticks, 17)
+            self.assertEqual(result.kms, 9)
+
+    def test_run_deliveries_to_same_destination(self):
+        """
+        Deliveries to the same destination are completed one by one, each
+        when its own packages are delivered.
+        """
+        deliveries = (
+            Delivery(('product0', ), (3, 0)),
+            Delivery(('product0', 'product0'), (3, 0)),
+        )
+        weights = {'product0': 2}
+        for engine_class in (Engine, EventEngine):
+            engine = engine_class(
+                deliveries, ['D0'], [], Scheduler3(deliveries, weights))
+            self.assertEqual(engine.outstanding, 3)
+            completed = []
+            while engine.is_active:
+                completed.extend(engine.step())
+            self.assertEqual(completed, [0, 1])
+            self.assertTrue(engine.is_completed)
+            self.assertEqual(engine.tick, 20)
+
+    def test_classify_same_as_one_by_one(self):
+        """
+        Classifying the whole fleet at once moves every vehicle in every tick
+        as checking them one by one with `numpy.allclose`.
+        """
+        generator = random.Random(5)
+        points = [
+            (x, y) for x in range(-12, 13) for y in range(-12, 13)
+            if (x, y) != (0, 0)]
+        deliveries = [
+            Delivery(
+                ['product{}'.format(generator.randrange(20))
+                 for _ in range(generator.randint(1, 4))],
+                destination)
+            for destination in generator.sample(points, 40)
+        ]
+        weights = {
+            'product{}'.format(i): generator.choice((1, 3, 8, 20))
+            for i in range(20)}
+        drones = ['D{}'.format(i) for i in range(3)]
+        cyclists = ['C{}'.format(i) for i in range(4)]
+        engine = Engine(
+            deliveries, drones, cyclists, Scheduler3(deliveries, weights))
+        scheduler = Scheduler3(deliveries, weights)
+        fleets = (
+            (Engine._create_vehicles_array(drones), [None] * len(drones),
+             scheduler.get_routes_for_drones, True),
+            (Engine._create_vehicles_array(cyclists), [None] * len(cyclists),
+             scheduler.get_routes_for_cyclists, False),
+        )
+        kms = 0
+        while engine.is_active:
+            engine.step()
+            for vehicles, routes, get_routes, is_drone in fleets:
+                moved = step_one_by_one(
+                    vehicles, routes, get_routes, is_drone)
+                kms += moved * (1 if is_drone else 0.5)
+            for vehicles, expected in zip(
+                    (engine.drones, engine.cyclists), fleets):
+                for field in ('position', 'destination', 'delta'):
+                    self.assertEqual(
+                        vehicles[field].tolist(),
+                        expected[0][field].tolist())
+        self.assertEqual(engine.total_kms, kms)
+        self.assertTrue(engine.is_completed)
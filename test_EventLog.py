@@ -0,0 +1,112 @@
+"""
+This modules contains unit-tests for the EventLog.
+"""
+
+import os
+import tempfile
+from unittest import TestCase
+
+from depots import MultiDepotScheduler
+from engine import Engine, EventEngine
+from eventlog import EventLog, read_log, read_replay, score_log
+from scheduler import Delivery
+from scheduler3 import Scheduler3
+
+
+class TestEventLog(TestCase):
+    """
+    Tests for the EventLog
+    """
+
+    deliveries = (
+        Delivery(('product0', 'product1'), (3, 0)),
+        Delivery(('product1', ), (0, -2)),
+        Delivery(('product0', 'product0', 'product1'), (-4, 5)),
+    )
+    arrivals = ((6, Delivery(('product1', ), (2, 7))), )
+    weights = {'product0': 2, 'product1': 10}
+
+    def run_logged(self, engine_class, path):
+        """
+        Runs the deliveries with the given engine recording them in the log
+        with the given path.
+
+        Returns the result of the run.
+        """
+        with EventLog(path, batch_size=3) as log:
+            engine = engine_class(
+                self.deliveries, ['D0', 'D1'], ['C0'],
+                Scheduler3(self.deliveries, self.weights), self.arrivals,
+                log=log)
+            return engine.run()
+
+    def test_score_log(self):
+        """
+        Scoring the log gives the result of the run with both engines, also
+        when the log is gzipped.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            for engine_class in (Engine, EventEngine):
+                for name in ('run.jsonl', 'run.jsonl.gz'):
+                    path = os.path.join(directory, name)
+                    result = self.run_logged(engine_class, path)
+                    self.assertTrue(result.completed)
+                    self.assertEqual(score_log(path), result)
+            _, events = read_log(path)
+            events = list(events)
+        kinds = [event[0] for event in events]
+        self.assertEqual(kinds.count('d'), 4)
+        self.assertEqual(kinds.count('s'), sum(
+            1 for event in events if event[0] == 'r'
+            for _ in event[4]))
+        self.assertEqual(kinds.count('c'), 4)
+        self.assertEqual(kinds[-1], 'e')
+
+    def test_replay(self):
+        """
+        Replaying the recorded routes gives the same events and result
+        without the original scheduler.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'run.jsonl')
+            replayed = os.path.join(directory, 'replay.jsonl')
+            result = self.run_logged(Engine, path)
+            header, deliveries, arrivals, scheduler = read_replay(path)
+            with EventLog(replayed) as log:
+                engine = EventEngine(
+                    deliveries, header['drones'], header['cyclists'],
+                    scheduler, arrivals, log=log)
+                scheduler.clock = lambda: engine.frame
+                self.assertEqual(engine.run(), result)
+            with open(path) as original, open(replayed) as replay:
+                self.assertEqual(original.read(), replay.read())
+
+    def test_replay_several_depots(self):
+        """
+        Replaying a run with several depots gives every vehicle the routes
+        it was given, and so the same ticks and kms.
+        """
+        depots = ((0, 0), (6, 6), (-6, -6))
+        deliveries = self.deliveries + (
+            Delivery(('product0', ), (7, 4)),
+            Delivery(('product1', 'product0'), (-5, -8)),
+            Delivery(('product0', ), (5, 9)),
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'run.jsonl')
+            with EventLog(path) as log:
+                scheduler = MultiDepotScheduler.build(
+                    Scheduler3, deliveries, self.weights, depots)
+                result = Engine(
+                    deliveries, ['D0', 'D1', 'D2', 'D3'], ['C0', 'C1', 'C2'],
+                    scheduler, log=log).run()
+            header, deliveries, arrivals, scheduler = read_replay(path)
+            engine = Engine(
+                deliveries, header['drones'], header['cyclists'], scheduler,
+                arrivals)
+            scheduler.clock = lambda: engine.frame
+            replayed = engine.run()
+        self.assertTrue(result.completed)
+        self.assertEqual(replayed.ticks, result.ticks)
+        self.assertEqual(replayed.kms, result.kms)
+        self.assertEqual(replayed, result)
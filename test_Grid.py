@@ -0,0 +1,48 @@
+"""
+This modules contains unit-tests for the Grid.
+"""
+
+import random
+from math import sqrt
+from unittest import TestCase
+
+from spatial import Grid
+
+
+class TestGrid(TestCase):
+    """
+    Tests for the Grid
+    """
+
+    def test_nearest_same_as_brute_force(self):
+        """
+        The items are yielded by increasing distance on clustered points far
+        from each other, also after removing some of them.
+        """
+        rng = random.Random(3)
+        grid = Grid(cell_size=2)
+        points = {}
+        for id_ in range(300):
+            cx, cy = rng.choice(((0, 0), (150, -90), (-400, 260)))
+            points[id_] = (cx + rng.uniform(-5, 5), cy + rng.uniform(-5, 5))
+            grid.insert(id_, points[id_])
+        for id_ in rng.sample(sorted(points), 120):
+            grid.remove(id_)
+            del points[id_]
+        for query in ((0, 0), (150, -90), (60, 300), (-1000, -1000)):
+            found = [distance for distance, _ in grid.nearest(query)]
+            expected = sorted(
+                sqrt((x - query[0]) ** 2 + (y - query[1]) ** 2)
+                for x, y in points.values())
+            self.assertEqual(found, expected)
+
+    def test_nearest_in_empty_grid(self):
+        """
+        An empty grid yields nothing, also after its items are removed.
+        """
+        grid = Grid()
+        self.assertEqual(list(grid.nearest((1, 1))), [])
+        grid.insert('a', (3, 4))
+        self.assertEqual(list(grid.nearest((0, 0))), [(5, 'a')])
+        grid.remove('a')
+        self.assertEqual(list(grid.nearest((0, 0))), [])
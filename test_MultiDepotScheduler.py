@@ -0,0 +1,123 @@
+"""
+This modules contains unit-tests for the MultiDepotScheduler.
+"""
+
+from collections import deque
+from unittest import TestCase
+
+import numpy
+
+from depots import MultiDepotScheduler, check_fleet, nearest_depots
+from engine import Engine, EventEngine
+from scheduler import Delivery
+from scheduler3 import Scheduler3
+
+
+class TestMultiDepotScheduler(TestCase):
+    """
+    Tests for the MultiDepotScheduler
+    """
+
+    depots = ((0, 0), (20, 0))
+    deliveries = (
+        Delivery(('product0', ), (3, 0)),
+        Delivery(('product1', ), (18, 2)),
+        Delivery(('product0', ), (11, -1)),
+        Delivery(('product1', ), (-2, -4)),
+    )
+    weights = {'product0': 2, 'product1': 10}
+
+    def test_nearest_depots(self):
+        """
+        Every destination goes to its nearest depot, ties to the first one.
+        """
+        result = nearest_depots(
+            self.depots, [(3, 0), (18, 2), (11, -1), (10, 5)])
+        self.assertEqual(result.tolist(), [0, 1, 1, 0])
+
+    def test_get_route_for_depot(self):
+        """
+        The scheduler of every depot gives the routes to its nearest packages
+        in the world frame.
+        """
+        scheduler = MultiDepotScheduler.build(
+            Scheduler3, self.deliveries, self.weights, self.depots)
+        self.assertEqual(
+            scheduler.for_depot(1).get_route_for_drone(),
+            deque((((11, -1), ('product0', )), )))
+        self.assertEqual(
+            scheduler.for_depot(1).get_route_for_cyclist(),
+            deque((((18, 2), ('product1', )), )))
+        self.assertIsNone(scheduler.for_depot(1).get_route_for_drone())
+        scheduler.add_deliveries((Delivery(('product0', ), (25, 1)), ))
+        self.assertEqual(
+            scheduler.for_depot(1).get_route_for_drone(),
+            deque((((25, 1), ('product0', )), )))
+
+    def test_build_in_parallel(self):
+        """
+        Building the schedulers in worker processes gives the same routes.
+        """
+        expected = MultiDepotScheduler.build(
+            Scheduler3, self.deliveries, self.weights, self.depots)
+        result = MultiDepotScheduler.build(
+            Scheduler3, self.deliveries, self.weights, self.depots,
+            processes=2)
+        self.assertEqual(result.name, 'Scheduler3 (2 depots)')
+        for depot in range(len(self.depots)):
+            self.assertEqual(
+                result.for_depot(depot).get_route_for_cyclist(),
+                expected.for_depot(depot).get_route_for_cyclist())
+
+    def test_run_vehicles_based_at_depots(self):
+        """
+        Vehicles are based at the depots in turn and both engines give the
+        same result.
+        """
+        results = []
+        for engine_class in (Engine, EventEngine):
+            scheduler = MultiDepotScheduler.build(
+                Scheduler3, self.deliveries, self.weights, self.depots)
+            engine = engine_class(
+                self.deliveries, ['D0', 'D1'], ['C0', 'C1'], scheduler)
+            results.append(engine.run())
+            for vehicles in (engine.drones, engine.cyclists):
+                self.assertEqual(vehicles['home'].tolist(), [[0, 0], [20, 0]])
+                self.assertTrue(numpy.allclose(
+                    vehicles['position'], vehicles['home'], atol=0.5))
+        self.assertTrue(results[0].completed)
+        self.assertEqual(results[0], results[1])
+        # The far packages are delivered from the second depot.
+        self.assertEqual(
+            [vehicle.kms for vehicle in results[0].vehicles], [6, 18, 9, 5])
+
+    def test_run_delivery_at_a_depot(self):
+        """
+        Packages whose destination is a depot are handed over there when
+        their route is given, with both engines.
+        """
+        deliveries = self.deliveries + (
+            Delivery(('product0', 'product1'), (20, 0)), )
+        results = []
+        for engine_class in (Engine, EventEngine):
+            scheduler = MultiDepotScheduler.build(
+                Scheduler3, deliveries, self.weights, self.depots)
+            engine = engine_class(
+                deliveries, ['D0', 'D1'], ['C0', 'C1'], scheduler)
+            results.append(engine.run())
+            self.assertFalse(numpy.isnan(engine.drones['position']).any())
+        self.assertTrue(results[0].completed)
+        self.assertEqual(results[0], results[1])
+
+    def test_check_fleet(self):
+        """
+        Every depot needs a vehicle, and a cyclist for the heavy packages.
+        """
+        check_fleet(self.depots, self.deliveries, self.weights, 0, 2)
+        light = [delivery for delivery in self.deliveries
+                 if delivery.packages == ('product0', )]
+        check_fleet(self.depots, light, self.weights, 2, 1)
+        with self.assertRaises(ValueError):
+            check_fleet(self.depots, self.deliveries, self.weights, 2, 1)
+        with self.assertRaises(ValueError):
+            check_fleet(self.depots, light, self.weights, 1, 1)
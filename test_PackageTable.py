@@ -0,0 +1,62 @@
+"""
+This modules contains unit-tests for the PackageTable.
+"""
+
+from unittest import TestCase
+
+from packages import PackageTable, RowQueue
+from scheduler import Delivery
+
+
+class TestPackageTable(TestCase):
+    """
+    Tests for the PackageTable
+    """
+
+    def test_from_deliveries(self):
+        """
+        Every package gets a row and the packages of a delivery are
+        consecutive rows.
+        """
+        deliveries = (
+            Delivery(('product0', 'product1'), (4, -2)),
+            Delivery(('product1', ), (3, 7)),
+        )
+        weights = {'product0': 2.5, 'product1': 40}
+        table = PackageTable.from_deliveries(deliveries, weights)
+        self.assertEqual(len(table), 3)
+        self.assertEqual(table.deliveries, 2)
+        self.assertEqual(table.delivery_rows(1), range(2, 3))
+        self.assertEqual(table.weights.tolist(), [2.5, 40, 40])
+        self.assertEqual(table.route_stop(0), ((4, -2), ('product0', )))
+        self.assertEqual(table.route_stop(2), ((3, 7), ('product1', )))
+
+    def test_find_pending_package(self):
+        """
+        Only pending packages are found, the ones given to a vehicle or
+        cancelled are not.
+        """
+        deliveries = (
+            Delivery(('product0', 'product0'), (1, 1)),
+        )
+        table = PackageTable.from_deliveries(deliveries, {'product0': 1})
+        self.assertEqual(table.find((1, 1), 'product0'), 0)
+        table.give(0)
+        self.assertEqual(table.find((1, 1), 'product0'), 1)
+        table.cancel(1)
+        self.assertIsNone(table.find((1, 1), 'product0'))
+        self.assertIsNone(table.find((2, 2), 'product0'))
+
+    def test_append_rows(self):
+        """
+        Appended deliveries get new rows, with the weights of new products.
+        """
+        table = PackageTable.from_deliveries((), {})
+        rows = table.append(
+            (Delivery(('product0', ), (5, 5)), ), {'product0': 8})
+        self.assertEqual(rows, range(0, 1))
+        self.assertEqual(table.weight(0), 8)
+        queue = RowQueue((3, 4))
+        queue.popleft()
+        queue.extend(rows)
+        self.assertEqual(list(queue), [4, 0])
@@ -0,0 +1,67 @@
+"""
+This modules contains unit-tests for the Profiler.
+"""
+
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from engine import Engine, EventEngine
+from instrumentation import (
+    IDLE_VEHICLE_TICKS, PACKAGES_DELIVERED, ROUTES_ISSUED, Profiler)
+from scheduler import Delivery
+from scheduler3 import Scheduler3
+
+
+class TestProfiler(TestCase):
+    """
+    Tests for the Profiler
+    """
+
+    def test_engine_counters(self):
+        """
+        Both engines count the same routes, idle vehicle-ticks and delivered
+        packages, and time the scheduler calls.
+        """
+        deliveries = (
+            Delivery(('product0', 'product1'), (3, 0)),
+            Delivery(('product1', ), (0, -2)),
+        )
+        weights = {'product0': 2, 'product1': 10}
+        counters = []
+        for engine_class in (Engine, EventEngine):
+            profiler = Profiler()
+            engine = engine_class(
+                deliveries, ['D0'], ['C0'], Scheduler3(deliveries, weights),
+                profiler=profiler)
+            result = engine.run()
+            self.assertEqual(
+                profiler.counters[ROUTES_ISSUED],
+                sum(vehicle.routes for vehicle in result.vehicles))
+            self.assertEqual(profiler.counters[PACKAGES_DELIVERED], 3)
+            self.assertIn('get_route_for_cyclist', profiler.phases)
+            counters.append(profiler.counters)
+        self.assertEqual(counters[0], counters[1])
+        self.assertGreater(counters[0][IDLE_VEHICLE_TICKS], 0)
+
+    def test_write_trace(self):
+        """
+        The trace has an event for every phase and the counters of every
+        tick.
+        """
+        profiler = Profiler(trace=True)
+        with profiler.phase('outer'):
+            with profiler.phase('inner'):
+                profiler.count('things', 2)
+        profiler.end_tick(0)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'trace.json')
+            profiler.write_trace(path)
+            with open(path) as file_:
+                events = json.load(file_)['traceEvents']
+        self.assertEqual(
+            [(event['name'], event['ph']) for event in events],
+            [('inner', 'X'), ('outer', 'X'), ('counters', 'C')])
+        self.assertEqual(events[2]['args'], {'things': 2, 'tick': 0})
+        self.assertEqual(profiler.phases['outer'][0], 1)
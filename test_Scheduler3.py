@@ -57,6 +57,23 @@ class TestScheduler3(TestCase):
         result = scheduler.get_route_for_drone()
         self.assertEqual(result, expected)
 
+    def test_get_route_for_drone_package_just_over_five_kg(self):
+        """
+        A package just over 5 kg cannot be given to a drone, the limit is
+        compared with the weight as given.
+        """
+        deliveries = (
+            Delivery(('product0', ), (4, 2)),
+        )
+        weights = {'product0': 5.0000001}
+        scheduler = Scheduler3(deliveries, weights)
+        self.assertIsNone(scheduler.get_route_for_drone())
+        expected = deque((
+            ((4, 2), ('product0', )),
+        ))
+        result = scheduler.get_route_for_cyclist()
+        self.assertEqual(result, expected)
+
     def test_get_route_for_drone_from_delivery(self):
         """
         A package from a delivery can be given to a drone.
@@ -273,3 +290,249 @@ class TestScheduler3(TestCase):
         ))
         result = scheduler.get_route_for_cyclist()
         self.assertEqual(result, expected)
+
+    def test_get_route_for_cyclist_caterpillar_closest_batch(self):
+        """
+        The caterpillar gives the batch with the shortest route per package.
+        """
+        deliveries = (
+            Delivery(('product0', ), (10, -1)),
+            Delivery(('product1', ), (1, 1)),
+        )
+        weights = {'product0': 26, 'product1': 26}
+        scheduler = Scheduler3(deliveries, weights, caterpillar=True)
+        expected = deque((
+            ((1, 1), ('product1', )),
+        ))
+        result = scheduler.get_route_for_cyclist()
+        self.assertEqual(result, expected)
+
+    def test_get_route_for_cyclist_caterpillar_wraps_around(self):
+        """
+        The caterpillar batches packages at both ends of the angular spectrum.
+        """
+        deliveries = (
+            Delivery(('product0', ), (-2, 1)),
+            Delivery(('product1', ), (5, 0)),
+            Delivery(('product2', ), (-2, -1)),
+        )
+        weights = {'product0': 20, 'product1': 20, 'product2': 20}
+        scheduler = Scheduler3(deliveries, weights, caterpillar=True)
+        expected = deque((
+            ((-2, 1), ('product0', )),
+            ((-2, -1), ('product2', )),
+        ))
+        result = scheduler.get_route_for_cyclist()
+        self.assertEqual(result, expected)
+        expected = deque((
+            ((5, 0), ('product1', )),
+        ))
+        result = scheduler.get_route_for_cyclist()
+        self.assertEqual(result, expected)
+        self.assertIsNone(scheduler.get_route_for_cyclist())
+
+    def test_get_route_for_drone_makespan_longest_first(self):
+        """
+        With makespan drones are given the packages with the longest round
+        trip first.
+        """
+        deliveries = (
+            Delivery(('product0', ), (1, 0)),
+            Delivery(('product0', ), (0, -10)),
+            Delivery(('product0', ), (3, 3)),
+        )
+        weights = {'product0': 2}
+        scheduler = Scheduler3(deliveries, weights, makespan=True)
+        scheduler.set_fleet(1, 0)
+        result = [scheduler.get_route_for_drone()[0][0] for _ in range(3)]
+        self.assertEqual(result, [(0, -10), (3, 3), (1, 0)])
+
+    def test_get_route_for_cyclist_makespan_balanced_packages(self):
+        """
+        With makespan the longest drone packages are given to the cyclists
+        while that makes the drones finish earlier.
+        """
+        deliveries = (
+            Delivery(('product0', ), (10, 0)),
+            Delivery(('product0', ), (1, 0)),
+        )
+        weights = {'product0': 2}
+        scheduler = Scheduler3(deliveries, weights, makespan=True)
+        scheduler.set_fleet(1, 1)
+        expected = deque((
+            ((1, 0), ('product0', )),
+        ))
+        self.assertEqual(scheduler.get_route_for_drone(), expected)
+        expected = deque((
+            ((10, 0), ('product0', )),
+        ))
+        self.assertEqual(scheduler.get_route_for_cyclist(), expected)
+        self.assertIsNone(scheduler.get_route_for_drone())
+
+    def test_get_route_for_cyclist_cached_routes(self):
+        """
+        Routes to the same destinations are taken from the cache.
+        """
+        deliveries = (
+            Delivery(('product0', 'product1', 'product2'), (1, 0)),
+        )
+        weights = {'product0': 26, 'product1': 26, 'product2': 26}
+        scheduler = Scheduler3(deliveries, weights)
+        for product in deliveries[0].packages:
+            expected = deque((
+                ((1, 0), (product, )),
+            ))
+            result = scheduler.get_route_for_cyclist()
+            self.assertEqual(result, expected)
+        cache_info = scheduler.cache_info()
+        self.assertEqual((cache_info.hits, cache_info.misses), (2, 1))
+
+    def test_get_route_for_cyclist_bigger_capacity(self):
+        """
+        Cyclists with a bigger capacity are given an optimal route with more
+        packages.
+        """
+        deliveries = (
+            Delivery(('product0', ), (1, 0)),
+            Delivery(('product1', ), (0, 2)),
+            Delivery(('product2', ), (2, 0)),
+            Delivery(('product3', ), (0, 1)),
+            Delivery(('product4', ), (2, 2)),
+            Delivery(('product5', ), (1, 2)),
+        )
+        weights = {
+            'product0': 10, 'product1': 10, 'product2': 10, 'product3': 10,
+            'product4': 10, 'product5': 10
+        }
+        scheduler = Scheduler3(
+            deliveries, weights, max_packages=6, max_weight=60)
+        expected = deque((
+            ((1, 0), ('product0', )),
+            ((2, 0), ('product2', )),
+            ((2, 2), ('product4', )),
+            ((1, 2), ('product5', )),
+            ((0, 2), ('product1', )),
+            ((0, 1), ('product3', )),
+        ))
+        result = scheduler.get_route_for_cyclist()
+        # Both directions of the route are optimal.
+        self.assertIn(result, (expected, deque(reversed(expected))))
+
+    def test_get_route_for_cyclist_balanced_packages_behind_ray(self):
+        """
+        Packages moved from the drones behind the rotating ray are given after
+        the ray comes back to them.
+        """
+        deliveries = (
+            Delivery(('product0', ), (1, 0)),
+            Delivery(('product1', ), (0, 1)),
+            Delivery(('product2', ), (1, -1)),
+            Delivery(('product3', ), (1, -2)),
+        )
+        weights = {
+            'product0': 49, 'product1': 49, 'product2': 2, 'product3': 2
+        }
+        scheduler = Scheduler3(deliveries, weights)
+        expected = deque((
+            ((1, 0), ('product0', )),
+        ))
+        result = scheduler.get_route_for_cyclist()
+        self.assertEqual(result, expected)
+        expected = deque((
+            ((0, 1), ('product1', )),
+        ))
+        result = scheduler.get_route_for_cyclist()
+        self.assertEqual(result, expected)
+        expected = deque((
+            ((1, -1), ('product2', )),
+        ))
+        result = scheduler.get_route_for_cyclist()
+        self.assertEqual(result, expected)
+
+    def test_add_deliveries_after_creation(self):
+        """
+        Deliveries added after the scheduler was created are given to the
+        drones and the cyclists as well.
+        """
+        deliveries = (
+            Delivery(('product0', ), (1, 0)),
+        )
+        weights = {'product0': 10}
+        scheduler = Scheduler3(deliveries, weights)
+        scheduler.add_deliveries((
+            Delivery(('product1', 'product2'), (0, 3)),
+        ), {'product1': 2, 'product2': 10})
+        expected = deque((
+            ((0, 3), ('product1', )),
+        ))
+        result = scheduler.get_route_for_drone()
+        self.assertEqual(result, expected)
+        expected = deque((
+            ((1, 0), ('product0', )),
+            ((0, 3), ('product2', )),
+        ))
+        result = scheduler.get_route_for_cyclist()
+        # Both directions of the route are optimal.
+        self.assertIn(result, (expected, deque(reversed(expected))))
+
+    def test_cancel_pending_packages(self):
+        """
+        Cancelled packages are not given to any vehicle, and packages already
+        given can't be cancelled.
+        """
+        deliveries = (
+            Delivery(('product0', 'product1'), (1, 0)),
+            Delivery(('product2', ), (2, 2)),
+        )
+        weights = {'product0': 2, 'product1': 10, 'product2': 10}
+        scheduler = Scheduler3(deliveries, weights)
+        result = scheduler.cancel(deliveries[0])
+        self.assertEqual(result, ('product0', 'product1'))
+        self.assertIsNone(scheduler.get_route_for_drone())
+        expected = deque((
+            ((2, 2), ('product2', )),
+        ))
+        result = scheduler.get_route_for_cyclist()
+        self.assertEqual(result, expected)
+        result = scheduler.cancel(deliveries[1])
+        self.assertEqual(result, ())
+
+    def test_get_routes_for_cyclists_split_jointly(self):
+        """
+        The batches for several cyclists are split with the shortest total
+        route instead of filling every batch in turn.
+        """
+        deliveries = (
+            Delivery(('product0', ), (10, 1)),
+            Delivery(('product0', ), (10, 2)),
+            Delivery(('product1', ), (2, 10)),
+            Delivery(('product0', ), (1, 10)),
+        )
+        weights = {'product0': 20, 'product1': 10}
+        scheduler = Scheduler3(deliveries, weights)
+        result = [
+            set(route) for route in scheduler.get_routes_for_cyclists(3)]
+        self.assertEqual(result, [
+            {((10, 1), ('product0', )), ((10, 2), ('product0', ))},
+            {((2, 10), ('product1', )), ((1, 10), ('product0', ))},
+        ])
+        self.assertEqual(scheduler.get_routes_for_cyclists(3), [])
+        scheduler = Scheduler3(deliveries, weights)
+        result = list(iter(scheduler.get_route_for_cyclist, None))
+        self.assertEqual([len(route) for route in result], [3, 1])
+
+    def test_get_routes_for_drones(self):
+        """
+        The drones get a route for every light package, up to the number of
+        drones asking.
+        """
+        deliveries = (
+            Delivery(('product0', 'product0'), (4, 2)),
+            Delivery(('product0', ), (-1, 3)),
+        )
+        weights = {'product0': 2}
+        scheduler = Scheduler3(deliveries, weights)
+        self.assertEqual(len(scheduler.get_routes_for_drones(2)), 2)
+        self.assertEqual(
+            scheduler.get_routes_for_drones(2),
+            [deque((((-1, 3), ('product0', )), ))])
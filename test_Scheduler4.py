@@ -0,0 +1,116 @@
+"""
+This modules contains unit-tests for the Scheduler4.
+"""
+
+from collections import Counter, deque
+from unittest import TestCase
+
+from loader import to_deliveries
+from scheduler import Delivery
+from scheduler4 import Scheduler4
+from workload import Workload
+
+
+class TestScheduler4(TestCase):
+    """
+    Tests for the Scheduler4
+    """
+
+    def test_get_route_for_drone_package_less_than_five_kg(self):
+        """
+        A package of weight less than 5 kg can be given to a drone.
+        """
+        deliveries = (
+            Delivery(('product0', ), (4, 2)),
+            Delivery(('product1', ), (-3, 1)),
+        )
+        weights = {'product0': 2, 'product1': 10}
+        scheduler = Scheduler4(deliveries, weights)
+        expected = deque((
+            ((4, 2), ('product0', )),
+        ))
+        result = scheduler.get_route_for_drone()
+        self.assertEqual(result, expected)
+        self.assertIsNone(scheduler.get_route_for_drone())
+
+    def test_set_fleet_before_the_plan(self):
+        """
+        The packages are split for the fleet given before the first route,
+        and the fleet is ignored once the routes are planned.
+        """
+        deliveries = (
+            Delivery(('product0', ), (4, 2)),
+            Delivery(('product0', ), (8, 1)),
+            Delivery(('product1', ), (-3, 1)),
+        )
+        weights = {'product0': 2, 'product1': 10}
+        scheduler = Scheduler4(deliveries, weights)
+        scheduler.set_fleet(4, 1)
+        self.assertEqual(len(list(
+            iter(scheduler.get_route_for_drone, None))), 2)
+        scheduler = Scheduler4(deliveries, weights)
+        self.assertEqual(len(list(
+            iter(scheduler.get_route_for_drone, None))), 1)
+        scheduler.set_fleet(4, 1)
+        self.assertEqual(len(list(
+            iter(scheduler.get_route_for_cyclist, None))), 1)
+
+    def test_get_route_for_cyclist_merges_by_savings(self):
+        """
+        Packages near each other and far from the depot are batched together
+        and the farthest route is given first.
+        """
+        deliveries = (
+            Delivery(('product0', ), (10, 1)),
+            Delivery(('product0', ), (-2, 0)),
+            Delivery(('product0', ), (11, 2)),
+            Delivery(('product1', ), (0, -1)),
+        )
+        weights = {'product0': 20, 'product1': 20}
+        scheduler = Scheduler4(deliveries, weights)
+        result = scheduler.get_route_for_cyclist()
+        self.assertEqual(
+            set(result),
+            {((10, 1), ('product0', )), ((11, 2), ('product0', ))})
+        result = scheduler.get_route_for_cyclist()
+        self.assertEqual(
+            set(result),
+            {((-2, 0), ('product0', )), ((0, -1), ('product1', ))})
+        self.assertIsNone(scheduler.get_route_for_cyclist())
+
+    def test_get_route_for_cyclist_every_package_once(self):
+        """
+        Every package is given once, in routes that fit in a cyclist.
+        """
+        deliveries, weights = to_deliveries(
+            Workload(300, 20, seed=3, products=40).to_input())
+        scheduler = Scheduler4(deliveries, weights)
+        given = Counter()
+        for route in iter(scheduler.get_route_for_drone, None):
+            given.update((route[0], ))
+        for route in iter(scheduler.get_route_for_cyclist, None):
+            self.assertLessEqual(len(route), 4)
+            self.assertLessEqual(
+                sum(weights[products[0]] for _, products in route), 50)
+            given.update(route)
+        expected = Counter(
+            (delivery.destination, (product, ))
+            for delivery in deliveries for product in delivery.packages)
+        self.assertEqual(given, expected)
+
+    def test_cancel_pending_packages(self):
+        """
+        Cancelled packages are left out of their routes.
+        """
+        deliveries = (
+            Delivery(('product0', 'product1'), (6, 1)),
+            Delivery(('product1', ), (7, 1)),
+        )
+        weights = {'product0': 8, 'product1': 10}
+        scheduler = Scheduler4(deliveries, weights)
+        result = scheduler.cancel(deliveries[1])
+        self.assertEqual(result, ('product1', ))
+        result = list(iter(scheduler.get_route_for_cyclist, None))
+        self.assertEqual(
+            [set(route) for route in result],
+            [{((6, 1), ('product0', )), ((6, 1), ('product1', ))}])
@@ -0,0 +1,116 @@
+"""
+This modules contains unit-tests for the SchedulerGrid.
+"""
+
+from collections import deque
+from unittest import TestCase
+
+from scheduler import Delivery
+from scheduler_grid import SchedulerGrid
+
+
+class TestSchedulerGrid(TestCase):
+    """
+    Tests for the SchedulerGrid
+    """
+
+    def test_get_route_for_drone_package_less_than_five_kg(self):
+        """
+        A package of weight less than 5 kg can be given to a drone.
+        """
+        deliveries = (
+            Delivery(('product0', ), (4, 2)),
+        )
+        weights = {'product0': 2}
+        scheduler = SchedulerGrid(deliveries, weights)
+        expected = deque((
+            ((4, 2), ('product0', )),
+        ))
+        result = scheduler.get_route_for_drone()
+        self.assertEqual(result, expected)
+
+    def test_get_route_for_cyclist_seeded_at_farthest_package(self):
+        """
+        Batches are seeded at the farthest package and filled with its
+        nearest packages.
+        """
+        deliveries = (
+            Delivery(('product0', ), (1, 0)),
+            Delivery(('product1', ), (9, 1)),
+            Delivery(('product2', ), (-3, 0)),
+            Delivery(('product3', ), (10, 0)),
+        )
+        weights = {
+            'product0': 20, 'product1': 20, 'product2': 20, 'product3': 20
+        }
+        scheduler = SchedulerGrid(deliveries, weights)
+        expected = deque((
+            ((9, 1), ('product1', )),
+            ((10, 0), ('product3', )),
+        ))
+        result = scheduler.get_route_for_cyclist()
+        self.assertIn(result, (expected, deque(reversed(expected))))
+        expected = deque((
+            ((1, 0), ('product0', )),
+            ((-3, 0), ('product2', )),
+        ))
+        result = scheduler.get_route_for_cyclist()
+        self.assertIn(result, (expected, deque(reversed(expected))))
+        self.assertIsNone(scheduler.get_route_for_cyclist())
+
+    def test_get_route_for_cyclist_skips_heavy_neighbours(self):
+        """
+        Neighbours that don't fit in the cyclist are left for other batches.
+        """
+        deliveries = (
+            Delivery(('product0', ), (10, 0)),
+            Delivery(('product1', ), (9, 0)),
+            Delivery(('product2', ), (7, 0)),
+        )
+        weights = {'product0': 20, 'product1': 40, 'product2': 20}
+        scheduler = SchedulerGrid(deliveries, weights)
+        expected = deque((
+            ((7, 0), ('product2', )),
+            ((10, 0), ('product0', )),
+        ))
+        result = scheduler.get_route_for_cyclist()
+        self.assertIn(result, (expected, deque(reversed(expected))))
+
+    def test_get_route_for_cyclist_package_greater_than_fifty_kg(self):
+        """
+        A package of weight greater than 50 kg cannot be given to a cyclist.
+        """
+        deliveries = (
+            Delivery(('product0', ), (4, 2)),
+        )
+        weights = {'product0': 51}
+        scheduler = SchedulerGrid(deliveries, weights)
+        self.assertIsNone(scheduler.get_route_for_cyclist())
+
+    def test_package_over_the_cyclist_max_weight(self):
+        """
+        Light packages too heavy for the cyclists stay with the drones, and
+        packages over the drone max weight too heavy for the cyclists are
+        never given nor dropped.
+        """
+        deliveries = (
+            Delivery(('product0', ), (4, 2)),
+            Delivery(('product1', ), (9, 1)),
+            Delivery(('product2', ), (-3, 0)),
+        )
+        weights = {'product0': 4, 'product1': 12, 'product2': 6}
+        scheduler = SchedulerGrid(deliveries, weights, max_weight=3)
+        self.assertIsNone(scheduler.get_route_for_cyclist())
+        self.assertEqual(
+            scheduler.get_route_for_drone(),
+            deque((((4, 2), ('product0', )), )))
+        scheduler = SchedulerGrid(deliveries, weights, max_weight=8)
+        self.assertEqual(
+            scheduler.get_route_for_cyclist(),
+            deque((((-3, 0), ('product2', )), )))
+        # The package of 12 kg still counts as pending for the cyclists, so
+        # the drones keep theirs.
+        self.assertIsNone(scheduler.get_route_for_cyclist())
+        self.assertEqual(
+            scheduler.get_route_for_drone(),
+            deque((((4, 2), ('product0', )), )))
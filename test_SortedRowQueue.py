@@ -0,0 +1,82 @@
+"""
+This modules contains unit-tests for the SortedRowQueue.
+"""
+
+import random
+from bisect import bisect_left, bisect_right
+from unittest import TestCase
+
+from packages import SortedRowQueue
+
+
+class TestSortedRowQueue(TestCase):
+    """
+    Tests for the SortedRowQueue
+    """
+
+    def test_same_as_flat_list(self):
+        """
+        Inserting, merging, removing and deleting rows across small blocks
+        keeps the same rows in the same order as a flat sorted list.
+        """
+        rng = random.Random(7)
+        keys = sorted(rng.randrange(50) for _ in range(40))
+        expected = [(key, row) for row, key in enumerate(keys)]
+        queue = SortedRowQueue(range(len(keys)), keys, block_size=4)
+        for row in range(len(keys), 400):
+            operation = rng.random()
+            if operation < 0.5:
+                key = rng.randrange(50)
+                position = bisect_right([k for k, _ in expected], key)
+                expected.insert(position, (key, row))
+                self.assertEqual(queue.insert(row, key), position)
+            elif operation < 0.6:
+                new = sorted(
+                    ((rng.randrange(50), row + 1000 * i)
+                     for i in range(rng.randrange(1, 12))),
+                    key=lambda pair: pair[0])
+                for key, new_row in new:
+                    position = bisect_right([k for k, _ in expected], key)
+                    expected.insert(position, (key, new_row))
+                queue.insert_many(
+                    [r for _, r in new], [k for k, _ in new])
+            elif operation < 0.75 and expected:
+                key, removed = rng.choice(expected)
+                position = expected.index((key, removed))
+                del expected[position]
+                self.assertEqual(queue.remove(removed, key), position)
+            elif expected:
+                start = rng.randrange(len(expected))
+                length = rng.randrange(len(expected) - start + 1)
+                del expected[start:start + length]
+                queue.delete(start, length)
+            self.assertEqual(list(queue), [r for _, r in expected])
+            self.assertEqual(len(queue), len(expected))
+        for key in range(-1, 51):
+            self.assertEqual(
+                queue.bisect_left(key),
+                bisect_left([k for k, _ in expected], key))
+        self.assertEqual(
+            [queue.key(i) for i in range(len(queue))],
+            [k for k, _ in expected])
+
+    def test_remove_missing_row(self):
+        """
+        Removing a row that is not in the queue changes nothing.
+        """
+        queue = SortedRowQueue([3, 1], [0.5, 1.5])
+        self.assertIsNone(queue.remove(1, 0.5))
+        self.assertIsNone(queue.remove(2, 1.0))
+        self.assertEqual(list(queue), [3, 1])
+        with self.assertRaises(IndexError):
+            queue[2]
+
+    def test_insert_many_in_empty_queue(self):
+        """
+        Rows merged into an empty queue are split in blocks.
+        """
+        queue = SortedRowQueue(block_size=2)
+        queue.insert_many(list(range(7)), [float(i) for i in range(7)])
+        self.assertEqual(list(queue), list(range(7)))
+        self.assertEqual(queue.bisect_left(3.5), 4)
+        self.assertEqual(queue.insert(9, 3.0), 4)
@@ -0,0 +1,55 @@
+"""
+This modules contains unit-tests for the loader.
+"""
+
+import os
+from unittest import TestCase
+
+from loader import load_input, to_deliveries
+from reader import read_deliveries, read_weights
+from scheduler import Delivery
+
+
+class TestLoader(TestCase):
+    """
+    Tests for the loader
+    """
+
+    def test_load_input_interns_products(self):
+        """
+        Products are interned to indices into the sorted products and every
+        delivery refers to its packages through the offsets.
+        """
+        data = (
+            b'2\n'
+            b'2 product1 product0 5 -4\n'
+            b'1 product1 -15 9\n'
+            b'2\n'
+            b'product0 3.5\n'
+            b'product1 43\n'
+        )
+        result = load_input(data)
+        self.assertEqual(result.products.tolist(), [b'product0', b'product1'])
+        self.assertEqual(result.weights.tolist(), [3.5, 43])
+        self.assertEqual(result.destinations.tolist(), [[5, -4], [-15, 9]])
+        self.assertEqual(result.packages.tolist(), [1, 0, 1])
+        self.assertEqual(result.offsets.tolist(), [0, 2, 3])
+
+    def test_load_input_same_as_reader(self):
+        """
+        The loaded input gives the same deliveries and weights as the reader.
+        """
+        path = os.path.join(
+            os.path.dirname(__file__), 'sample_inputs', 'deliveries4.txt')
+        with open(path) as file_:
+            expected = (read_deliveries(file_), read_weights(file_))
+        result = to_deliveries(load_input(path))
+        self.assertEqual(result, expected)
+        self.assertIsInstance(result[0][0], Delivery)
+
+    def test_load_input_missing_weight(self):
+        """
+        An error is raised when a product has no weight.
+        """
+        with self.assertRaisesRegex(ValueError, 'product1'):
+            load_input(b'1\n2 product0 product1 1 1\n1\nproduct0 2\n')
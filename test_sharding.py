@@ -0,0 +1,73 @@
+"""
+This modules contains unit-tests for the sharded mode.
+"""
+
+import os
+import tempfile
+from unittest import TestCase
+
+import numpy
+
+from eventlog import score_log
+from sharding import limit_shards, run_sharded, split_fleet, split_sectors
+from workload import Workload
+
+
+class TestSharding(TestCase):
+    """
+    Tests for the sharded mode
+    """
+
+    input_ = Workload(400, 30, seed=7, products=20).to_input()
+
+    def test_split_sectors(self):
+        """
+        Every delivery goes to one sector, sectors do not overlap and their
+        packages are balanced.
+        """
+        sectors, bounds = split_sectors(self.input_, 4)
+        rows = numpy.concatenate(sectors)
+        self.assertEqual(sorted(rows.tolist()), list(range(400)))
+        for (_, end), (start, _) in zip(bounds, bounds[1:]):
+            self.assertLessEqual(end, start)
+        counts = numpy.diff(self.input_.offsets)
+        packages = [int(counts[rows].sum()) for rows in sectors]
+        self.assertLess(max(packages) / min(packages), 1.2)
+        self.assertEqual(split_fleet(5, [3, 1, 1, 1]), [2, 1, 1, 1])
+        self.assertEqual(split_fleet(2, [1, 1, 1]), [1, 1, 0])
+
+    def test_run_sharded(self):
+        """
+        The shards complete all the deliveries with their share of the fleet
+        and the merged log scores as the merged result.
+        """
+        drones = ['D{}'.format(i) for i in range(6)]
+        cyclists = ['C{}'.format(i) for i in range(6)]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'log.jsonl.gz')
+            result, reports = run_sharded(
+                self.input_, drones, cyclists, 'scheduler3', 3, 2,
+                log_path=path)
+            self.assertEqual(score_log(path), result)
+            self.assertEqual(os.listdir(directory), ['log.jsonl.gz'])
+        self.assertTrue(result.completed)
+        self.assertEqual(result.ticks, max(report.ticks for report in reports))
+        self.assertAlmostEqual(
+            result.kms, sum(report.kms for report in reports))
+        self.assertEqual(sum(report.drones for report in reports), 6)
+        self.assertEqual(
+            sorted(vehicle.id for vehicle in result.vehicles),
+            sorted(drones + cyclists))
+
+    def test_run_sharded_with_few_vehicles(self):
+        """
+        There are no more shards than cyclists or drones, so every shard can
+        deliver its packages.
+        """
+        self.assertEqual(limit_shards(8, 2, 3), 2)
+        self.assertEqual(limit_shards(8, 0, 3), 3)
+        self.assertEqual(limit_shards(8, 0, 0), 1)
+        result, reports = run_sharded(
+            self.input_, ['D0'], ['C0'], 'scheduler3', 3, 1)
+        self.assertTrue(result.completed)
+        self.assertEqual(len(reports), 1)
@@ -0,0 +1,61 @@
+"""
+This modules contains unit-tests for the snapshots.
+"""
+
+import os
+import tempfile
+from unittest import TestCase
+
+from loader import load_input
+from snapshot import SUFFIX, load_cached, read_snapshot, write_snapshot
+
+
+INPUT = (
+    b'2\n'
+    b'2 product0 product1 5 -4\n'
+    b'1 product1 -15 9\n'
+    b'2\n'
+    b'product0 3.5\n'
+    b'product1 43\n'
+)
+
+
+class TestSnapshot(TestCase):
+    """
+    Tests for the snapshots
+    """
+
+    def setUp(self):
+        self.__directory = tempfile.TemporaryDirectory()
+        self.__path = os.path.join(self.__directory.name, 'deliveries.txt')
+        with open(self.__path, 'wb') as file_:
+            file_.write(INPUT)
+
+    def tearDown(self):
+        self.__directory.cleanup()
+
+    def test_read_snapshot_same_input(self):
+        """
+        A snapshot gives the same arrays as the text, mapped in place.
+        """
+        expected = load_input(INPUT)
+        write_snapshot(expected, self.__path + SUFFIX, 'checksum')
+        checksum, result = read_snapshot(self.__path + SUFFIX)
+        self.assertEqual(checksum, 'checksum')
+        for array, expected_array in zip(result, expected):
+            self.assertEqual(array.dtype, expected_array.dtype)
+            self.assertEqual(array.tolist(), expected_array.tolist())
+            self.assertFalse(array.flags.writeable)
+
+    def test_load_cached_rebuilds_stale_snapshot(self):
+        """
+        The snapshot is built the first time and built again when the text
+        changes.
+        """
+        result = load_cached(self.__path)
+        self.assertTrue(os.path.exists(self.__path + SUFFIX))
+        self.assertEqual(result.destinations.tolist(), [[5, -4], [-15, 9]])
+        with open(self.__path, 'wb') as file_:
+            file_.write(INPUT.replace(b'-15 9', b'7 7'))
+        result = load_cached(self.__path)
+        self.assertEqual(result.destinations.tolist(), [[5, -4], [7, 7]])
@@ -0,0 +1,59 @@
+"""
+This modules contains unit-tests for the Workload.
+"""
+
+import io
+import os
+import tempfile
+from unittest import TestCase
+
+from loader import load_input, to_deliveries
+from snapshot import read_snapshot
+from workload import BLOCK_SIZE, DISTRIBUTIONS, Workload
+
+
+class TestWorkload(TestCase):
+    """
+    Tests for the Workload
+    """
+
+    def test_same_seed_same_text(self):
+        """
+        The same seed gives the same text whatever the chunk size, and the
+        text is loaded as the generated deliveries.
+        """
+        for distribution in DISTRIBUTIONS:
+            workload = Workload(
+                3 * BLOCK_SIZE // 2, 20, seed=4, distribution=distribution,
+                weights='light:3,heavy:1')
+            text = io.BytesIO()
+            workload.write_text(text, 1)
+            other = io.BytesIO()
+            Workload(
+                3 * BLOCK_SIZE // 2, 20, seed=4, distribution=distribution,
+                weights='light:3,heavy:1').write_text(other, 10 * BLOCK_SIZE)
+            self.assertEqual(text.getvalue(), other.getvalue())
+            deliveries, weights = to_deliveries(load_input(text.getvalue()))
+            self.assertEqual(
+                (deliveries, weights), to_deliveries(workload.to_input()))
+            self.assertEqual(len(deliveries), workload.deliveries)
+            self.assertEqual(len(weights), workload.packages)
+            self.assertTrue(all(
+                max(map(abs, delivery.destination)) <= 20 and
+                delivery.destination != (0, 0) for delivery in deliveries))
+
+    def test_write_snapshot(self):
+        """
+        A snapshot written directly has the same deliveries as the text.
+        """
+        workload = Workload(100, 50, seed=1, products=10)
+        text = io.BytesIO()
+        workload.write_text(text)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'deliveries.snapshot')
+            workload.write_snapshot(path)
+            _, input_ = read_snapshot(path)
+            self.assertEqual(
+                to_deliveries(input_), to_deliveries(load_input(
+                    text.getvalue())))
+            self.assertEqual(len(input_.products), 10)
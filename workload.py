@@ -0,0 +1,395 @@
+"""
+This module contains a generator of synthetic deliveries for stress inputs.
+Deliveries are drawn with NumPy by chunks, so inputs with millions of them
+are written without holding them in memory, either in the text format read
+by `reader` or directly as a snapshot.
+
+Every block of `BLOCK_SIZE` deliveries or products draws each quantity from
+its own random stream of the seed, so the same seed gives the same input
+whatever the size of the chunks.
+"""
+
+import numpy
+
+from loader import Input
+from snapshot import SnapshotWriter
+
+
+DISTRIBUTIONS = ('uniform', 'hotspot', 'ring')
+MAX_PACKAGES = 4
+CHUNK_SIZE = 1 << 17
+BLOCK_SIZE = 1 << 14
+
+# Weight classes as uniform ranges, 'gauss' is the classic distribution.
+WEIGHT_CLASSES = {
+    'light': (0, 5),
+    'medium': (5, 20),
+    'heavy': (20, 50),
+}
+MEAN = 5
+STANDARD_DEVIATION = 5
+MAX_WEIGHT = 50
+
+# Independent random streams of the seed.
+STREAMS = ('counts', 'centers', 'destinations', 'products', 'weights')
+
+# Kinds of tokens: their prefix, their minimum number of digits and the byte
+# that follows them.
+PRODUCT, NUMBER, LAST_NUMBER, UNITS, LAST_CENTS = range(5)
+TOKEN_KINDS = (
+    (b'product', 1, b' '),
+    (b'', 1, b' '),
+    (b'', 1, b'\n'),
+    (b'', 1, b'.'),
+    (b'', 2, b'\n'),
+)
+
+
+def parse_mix(text):
+    """
+    Parses a weight mix like 'light:3,heavy:1' into a dict from weight class
+    to fraction. Classes without a share get 1.
+
+    Raises ValueError if any class is unknown or the shares are not positive.
+    """
+    mix = {}
+    for item in text.split(','):
+        name, _, share = item.strip().partition(':')
+        if name != 'gauss' and name not in WEIGHT_CLASSES:
+            raise ValueError('Unknown weight class: {}'.format(name))
+        mix[name] = float(share) if share else 1.0
+    total = sum(mix.values())
+    if total <= 0 or min(mix.values()) < 0:
+        raise ValueError('Invalid weight mix: {}'.format(text))
+    return {name: share / total for name, share in mix.items()}
+
+
+class Workload(object):
+    """
+    Synthetic deliveries of 1 to 4 packages with destinations in
+    -max <= x, y <= max.
+
+    Destinations follow one of the `DISTRIBUTIONS`: uniform, around a few
+    hotspots or on a ring around the depot. The depot itself is never a
+    destination. Every package is a product of its own unless a number of
+    `products` is given, then they are drawn from that catalogue.
+    """
+
+    def __init__(self, deliveries, max_, seed=None, distribution='uniform',
+                 hotspots=8, spread=None, radius=None, products=None,
+                 weights='gauss'):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError('Unknown distribution: {}'.format(distribution))
+        if max_ < 1:
+            raise ValueError('The max coordinate must be positive')
+        self.__n_deliveries = deliveries
+        self.__max = max_
+        self.__distribution = distribution
+        self.__spread = spread if spread is not None else max(max_ / 10, 1)
+        self.__radius = radius if radius is not None else max_ * 0.7
+        self.__mix = parse_mix(weights) if isinstance(weights, str) else (
+            weights)
+        self.__entropy = numpy.random.SeedSequence(seed).entropy
+        # Counts are needed upfront to know the number of packages.
+        self.__counts = numpy.concatenate(
+            [numpy.zeros(0, dtype=numpy.int8)] + [
+                self.__random('counts', block).integers(
+                    1, MAX_PACKAGES + 1, size, dtype=numpy.int8)
+                for block, size in _blocks(0, deliveries)])
+        self.__n_packages = int(self.__counts.sum(dtype=numpy.int64))
+        self.__n_products = (
+            products if products is not None else self.__n_packages)
+        self.__centers = self.__random('centers', 0).integers(
+            -max_, max_ + 1, (hotspots, 2))
+
+    @property
+    def deliveries(self):
+        """
+        Returns the number of deliveries.
+        """
+        return self.__n_deliveries
+
+    @property
+    def packages(self):
+        """
+        Returns the number of packages.
+        """
+        return self.__n_packages
+
+    @property
+    def products(self):
+        """
+        Returns the number of products.
+        """
+        return self.__n_products
+
+    def delivery_chunks(self, chunk_size=CHUNK_SIZE):
+        """
+        Generates the deliveries by chunks of about `chunk_size` deliveries,
+        rounded up to whole blocks.
+
+        Yields the package counts, the destinations and the products of every
+        chunk.
+        """
+        chunk_size = _round_chunk_size(chunk_size)
+        first_product = 0
+        for start in range(0, self.__n_deliveries, chunk_size):
+            stop = min(start + chunk_size, self.__n_deliveries)
+            counts = self.__counts[start:stop]
+            n_packages = int(counts.sum(dtype=numpy.int64))
+            destinations, products = [], []
+            for block, size in _blocks(start, stop):
+                destinations.append(self.__destinations(
+                    self.__random('destinations', block), size))
+                if self.__n_products != self.__n_packages:
+                    block_counts = counts[
+                        block * BLOCK_SIZE - start:][:size]
+                    products.append(self.__random('products', block).integers(
+                        0, self.__n_products,
+                        int(block_counts.sum(dtype=numpy.int64))))
+            if self.__n_products == self.__n_packages:
+                products = [numpy.arange(
+                    first_product, first_product + n_packages)]
+            first_product += n_packages
+            yield counts, numpy.concatenate(destinations), numpy.concatenate(
+                products)
+
+    def weight_chunks(self, chunk_size=CHUNK_SIZE):
+        """
+        Generates the weights of the products by chunks of about
+        `chunk_size` products, rounded up to whole blocks. Weights are
+        rounded to grams.
+        """
+        chunk_size = _round_chunk_size(chunk_size)
+        names = list(self.__mix)
+        shares = [self.__mix[name] for name in names]
+        for start in range(0, self.__n_products, chunk_size):
+            stop = min(start + chunk_size, self.__n_products)
+            weights = []
+            for block, size in _blocks(start, stop):
+                random = self.__random('weights', block)
+                classes = random.choice(len(names), size, p=shares)
+                block_weights = numpy.empty(size)
+                for i, name in enumerate(names):
+                    selected = classes == i
+                    block_weights[selected] = self.__weights(
+                        random, name, int(selected.sum()))
+                weights.append(block_weights)
+            yield numpy.round(numpy.concatenate(weights), 2)
+
+    def to_input(self):
+        """
+        Returns the whole workload as an Input, as loaded by `loader`.
+        """
+        chunks = list(zip(*self.delivery_chunks()))
+        destinations, packages = (
+            numpy.concatenate(chunk) for chunk in chunks[1:]) if chunks else (
+            numpy.zeros((0, 2), dtype=numpy.int64),
+            numpy.zeros(0, dtype=numpy.int64))
+        offsets = numpy.zeros(self.__n_deliveries + 1, dtype=numpy.int64)
+        numpy.cumsum(self.__counts, out=offsets[1:])
+        weights = numpy.concatenate([numpy.zeros(0)] + list(
+            self.weight_chunks()))
+        return Input(
+            product_names(0, self.__n_products), weights,
+            destinations.astype(numpy.int64), packages.astype(numpy.int64),
+            offsets)
+
+    def write_text(self, file_, chunk_size=CHUNK_SIZE):
+        """
+        Writes the workload to the given binary file in the text format.
+        """
+        file_.write(b'%d\n' % self.__n_deliveries)
+        for counts, destinations, products in self.delivery_chunks(
+                chunk_size):
+            file_.write(_delivery_lines(counts, destinations, products))
+        file_.write(b'%d\n' % self.__n_products)
+        start = 0
+        for weights in self.weight_chunks(chunk_size):
+            file_.write(_weight_lines(start, weights))
+            start += len(weights)
+
+    def write_snapshot(self, path, chunk_size=CHUNK_SIZE):
+        """
+        Writes the workload to a snapshot with the given path.
+        """
+        width = product_names(
+            max(self.__n_products - 1, 0), self.__n_products).dtype.itemsize
+        writer = SnapshotWriter(path, Input(
+            products=('S{}'.format(width), (self.__n_products, )),
+            weights=(numpy.float64, (self.__n_products, )),
+            destinations=(numpy.int64, (self.__n_deliveries, 2)),
+            packages=(numpy.int64, (self.__n_packages, )),
+            offsets=(numpy.int64, (self.__n_deliveries + 1, ))))
+        offsets = writer.array('offsets')
+        offsets[0] = 0
+        numpy.cumsum(self.__counts, out=offsets[1:])
+        all_destinations = writer.array('destinations')
+        packages = writer.array('packages')
+        start = 0
+        for counts, destinations, products in self.delivery_chunks(
+                chunk_size):
+            stop = start + len(counts)
+            all_destinations[start:stop] = destinations
+            packages[offsets[start]:offsets[stop]] = products
+            start = stop
+        names = writer.array('products')
+        weights = writer.array('weights')
+        start = 0
+        for chunk in self.weight_chunks(chunk_size):
+            stop = start + len(chunk)
+            names[start:stop] = product_names(start, stop)
+            weights[start:stop] = chunk
+            start = stop
+        del offsets, all_destinations, packages, names, weights
+        writer.close()
+
+    def __random(self, stream, block):
+        """
+        Returns a new generator of the given random stream of the seed for
+        the given block.
+        """
+        return numpy.random.default_rng(numpy.random.SeedSequence(
+            self.__entropy, spawn_key=(STREAMS.index(stream), block)))
+
+    def __destinations(self, random, size):
+        """
+        Draws the given number of destinations, drawing again the ones that
+        fall on the depot.
+        """
+        destinations = self.__draw_destinations(random, size)
+        depot = ~destinations.any(axis=1)
+        while depot.any():
+            destinations[depot] = self.__draw_destinations(
+                random, int(depot.sum()))
+            depot = ~destinations.any(axis=1)
+        return destinations
+
+    def __draw_destinations(self, random, size):
+        """
+        Draws the given number of destinations from the distribution.
+        """
+        if self.__distribution == 'uniform':
+            return random.integers(-self.__max, self.__max + 1, (size, 2))
+        if self.__distribution == 'hotspot':
+            centers = self.__centers[
+                random.integers(0, len(self.__centers), size)]
+            points = centers + random.normal(0, self.__spread, (size, 2))
+        else:
+            angles = random.uniform(0, 2 * numpy.pi, size)
+            radii = self.__radius + random.normal(0, self.__spread, size)
+            points = numpy.stack(
+                (radii * numpy.cos(angles), radii * numpy.sin(angles)),
+                axis=1)
+        return numpy.clip(
+            numpy.rint(points), -self.__max, self.__max).astype(numpy.int64)
+
+    @staticmethod
+    def __weights(random, name, size):
+        """
+        Draws the given number of weights of the given weight class.
+        """
+        if name == 'gauss':
+            return numpy.clip(
+                random.normal(MEAN, STANDARD_DEVIATION, size), 0, MAX_WEIGHT)
+        low, high = WEIGHT_CLASSES[name]
+        return random.uniform(low, high, size)
+
+
+def product_names(start, stop):
+    """
+    Returns the names of the products with indices from `start` to `stop`.
+    """
+    return numpy.char.add(b'product', numpy.arange(start, stop).astype(bytes))
+
+
+def _blocks(start, stop):
+    """
+    Returns the blocks from `start` to `stop`, which are multiples of the
+    block size, and their sizes.
+    """
+    return [
+        (block, min(BLOCK_SIZE, stop - block * BLOCK_SIZE))
+        for block in range(start // BLOCK_SIZE, -(-stop // BLOCK_SIZE))]
+
+
+def _round_chunk_size(chunk_size):
+    """
+    Rounds the given chunk size up to whole blocks.
+    """
+    return max(-(-chunk_size // BLOCK_SIZE), 1) * BLOCK_SIZE
+
+
+def _delivery_lines(counts, destinations, products):
+    """
+    Returns the text lines of the given deliveries.
+    """
+    # Every delivery is its count, its products and its coordinates.
+    sizes = counts.astype(numpy.int64) + 3
+    ends = numpy.cumsum(sizes)
+    starts = ends - sizes
+    values = numpy.empty(len(products) + 3 * len(counts), dtype=numpy.int64)
+    kinds = numpy.full(len(values), PRODUCT, dtype=numpy.int8)
+    values[starts] = counts
+    values[ends - 2] = destinations[:, 0]
+    values[ends - 1] = destinations[:, 1]
+    kinds[starts] = kinds[ends - 2] = NUMBER
+    kinds[ends - 1] = LAST_NUMBER
+    values[kinds == PRODUCT] = products
+    return _format_tokens(values, kinds)
+
+
+def _weight_lines(start, weights):
+    """
+    Returns the text lines of the given weights of the products from
+    `start`, with two decimals.
+    """
+    cents = numpy.rint(weights * 100).astype(numpy.int64)
+    values = numpy.empty(3 * len(weights), dtype=numpy.int64)
+    values[0::3] = numpy.arange(start, start + len(weights))
+    values[1::3] = cents // 100
+    values[2::3] = cents % 100
+    kinds = numpy.tile(
+        numpy.array([PRODUCT, UNITS, LAST_CENTS], dtype=numpy.int8),
+        len(weights))
+    return _format_tokens(values, kinds)
+
+
+def _format_tokens(values, kinds):
+    """
+    Formats the given integers as text, each one as a token of the given
+    kind, digit by digit with array operations.
+    """
+    prefixes = numpy.array([len(kind[0]) for kind in TOKEN_KINDS])[kinds]
+    widths = numpy.array([kind[1] for kind in TOKEN_KINDS])[kinds]
+    separators = numpy.frombuffer(
+        b''.join(kind[2] for kind in TOKEN_KINDS), dtype=numpy.uint8)[kinds]
+    negative = values < 0
+    magnitudes = numpy.abs(values)
+    digits = numpy.ones(len(values), dtype=numpy.int64)
+    power = 10
+    while True:
+        more = magnitudes >= power
+        if not more.any():
+            break
+        digits += more
+        power *= 10
+    digits = numpy.maximum(digits, widths)
+    lengths = prefixes + negative + digits + 1
+    ends = numpy.cumsum(lengths)
+    starts = ends - lengths
+    text = numpy.empty(int(ends[-1]) if len(ends) else 0, dtype=numpy.uint8)
+    for kind, (prefix, _, _) in enumerate(TOKEN_KINDS):
+        selected = starts[kinds == kind]
+        for i, byte in enumerate(prefix):
+            text[selected + i] = byte
+    text[(starts + prefixes)[negative]] = ord('-')
+    text[ends - 1] = separators
+    positions = ends - 2
+    for _ in range(int(digits.max()) if len(digits) else 0):
+        left = digits > 0
+        magnitudes, remainders = numpy.divmod(magnitudes, 10)
+        text[positions[left]] = remainders[left] + ord('0')
+        digits -= 1
+        positions -= 1
+    return text.tobytes()